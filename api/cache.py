@@ -0,0 +1,58 @@
+import threading
+import time
+from collections import OrderedDict
+
+class ResponseCache:
+    """Bounded LRU cache whose entries also expire ``ttl`` seconds after they were stored.
+
+    ``max_size`` 0 disables caching and ``ttl`` 0 disables expiry. Hit, miss,
+    eviction (LRU) and expiration counters are kept for sizing. A lock makes
+    ``clear`` safe to call from the threads that swap models.
+    """
+
+    def __init__(self, max_size=10_000, ttl=300.0, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = self.clears = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """The cached value for ``key``, or None on a miss or an expired entry."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl > 0 and self.clock() >= entry[1]:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, self.clock() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.clears += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"size": len(self), "max_size": self.max_size, "ttl": self.ttl, "hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else None, "evictions": self.evictions,
+                "expirations": self.expirations, "clears": self.clears}
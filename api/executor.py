@@ -0,0 +1,51 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+class ExecutorSaturated(Exception):
+    pass
+
+class ScoringExecutor:
+    """Bounded thread pool for CPU-bound scoring, kept off the event loop.
+
+    At most ``workers`` jobs run at once and at most ``max_queue`` more wait for a
+    thread; beyond that ``run`` raises ``ExecutorSaturated`` instead of queueing.
+    """
+
+    def __init__(self, workers=4, max_queue=64):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='scoring')
+
+    @property
+    def capacity(self):
+        return self.workers + self.max_queue
+
+    async def run(self, fn, *args, **kwargs):
+        """Run ``fn`` in the pool; returns ``(result, timing)`` with queue/compute seconds."""
+        if self.in_flight >= self.capacity:
+            raise ExecutorSaturated()
+        self.in_flight += 1
+        submitted = time.perf_counter()
+        timing = {}
+
+        def job():
+            started = time.perf_counter()
+            timing['queue'] = started - submitted
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                timing['compute'] = time.perf_counter() - started
+
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(self._pool, job)
+        finally:
+            self.in_flight -= 1
+        return result, timing
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+def server_timing(timing):
+    return ', '.join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in timing.items())
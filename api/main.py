@@ -1,44 +1,225 @@
+import asyncio
+import logging
+import os
+import time
 import uvicorn
-from fastapi import FastAPI
-from pydantic import BaseModel
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field
 from contextlib import asynccontextmanager
-from src.recommendation import recommend, build_market_basket_rules, build_similarity_matrix
-from src.data_preprocessing import load_data, items_data
+from src.recommendation import recommend, recommend_many, request_type
+from src.artifacts import load_or_build_model, reload_if_changed
+from src.forecast_registry import build_forecast_models, load_forecast_models, refit_lock, save_forecast_models
+from src.instrumentation import REGISTRY, profiled, sample, span
+from src.utils import data_fingerprint
+from api.executor import ScoringExecutor, ExecutorSaturated, server_timing
+from api.cache import ResponseCache
 
-df=None
-rules = None
-similarity_df = None
-tedf = None
+CF_NEIGHBOURS = int(os.environ.get('CF_NEIGHBOURS', 50))
+CF_BLOCK_SIZE = int(os.environ.get('CF_BLOCK_SIZE', 1024))
+CF_METHOD = os.environ.get('CF_METHOD', 'exact')
+DATA_PATH = os.environ.get('DATA_PATH', 'data/raw/train.csv')
+ARTIFACTS_DIR = os.environ.get('ARTIFACTS_DIR', 'artifacts')
+MODEL_POLL_SECONDS = float(os.environ.get('MODEL_POLL_SECONDS', 30))
+MAX_BATCH_SIZE = int(os.environ.get('MAX_BATCH_SIZE', 1000))
+SCORING_WORKERS = int(os.environ.get('SCORING_WORKERS', 4))
+SCORING_MAX_QUEUE = int(os.environ.get('SCORING_MAX_QUEUE', 64))
+FORECAST_DIR = os.environ.get('FORECAST_DIR', os.path.join(ARTIFACTS_DIR, 'forecast'))
+MAX_FORECAST_MONTHS = int(os.environ.get('MAX_FORECAST_MONTHS', 60))
+RECOMMEND_CACHE_SIZE = int(os.environ.get('RECOMMEND_CACHE_SIZE', 10_000))
+RECOMMEND_CACHE_TTL = float(os.environ.get('RECOMMEND_CACHE_TTL', 300))
+# Opt-in: dump a cProfile of every /recommend call slower than PROFILE_MIN_SECONDS into PROFILE_DIR
+PROFILE_DIR = os.environ.get('PROFILE_DIR') or None
+PROFILE_MIN_SECONDS = float(os.environ.get('PROFILE_MIN_SECONDS', 0.1))
+
+logger = logging.getLogger(__name__)
+
+REQUEST_SECONDS = REGISTRY.histogram('recommend_request_seconds', 'Latency of /recommend by request type and cache outcome.', ['type', 'cache'])
+
+model = None
+executor = None
+response_cache = None
+forecasts = None
+data_version = None
+forecast_refit = None
+
+def reload_model():
+    """Swap in the bundle ``artifacts/CURRENT`` points at, if it is new and valid."""
+    global model
+    new_model = reload_if_changed(model, ARTIFACTS_DIR, DATA_PATH, k=CF_NEIGHBOURS, method=CF_METHOD)
+    if new_model is not None:
+        # Requests already running keep the old model; rebinding the global is atomic
+        model = new_model
+        response_cache.clear()
+    return model
+
+def current_data_version():
+    return data_fingerprint(DATA_PATH) if os.path.exists(DATA_PATH) else None
+
+def refit_forecasts():
+    """Swap in forecast models for the current data, fitting and saving them if the registry has none.
+
+    The registry lock lets one process fit while the other workers wait and then load its result.
+    """
+    global forecasts
+    version = current_data_version()
+    new_forecasts = load_forecast_models(FORECAST_DIR, version) if version is not None else None
+    if new_forecasts is None:
+        with refit_lock(FORECAST_DIR):
+            new_forecasts = load_forecast_models(FORECAST_DIR, version) if version is not None else None
+            if new_forecasts is None:
+                new_forecasts = build_forecast_models(DATA_PATH)
+                save_forecast_models(new_forecasts, FORECAST_DIR)
+    forecasts = new_forecasts
+    return forecasts
+
+def log_refit_failure(task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Forecast refit failed", exc_info=task.exception())
+
+def schedule_forecast_refit():
+    """Start a background refit if the served models are missing or stale and none is running."""
+    global forecast_refit
+    stale = forecasts is None or (data_version is not None and forecasts.version != data_version)
+    if stale and (forecast_refit is None or forecast_refit.done()):
+        # The loop's default executor, not the threadpool serving requests, runs the long fit
+        forecast_refit = asyncio.create_task(asyncio.to_thread(refit_forecasts))
+        forecast_refit.add_done_callback(log_refit_failure)
+    return forecast_refit
+
+async def watch_model():
+    global data_version
+    while True:
+        await asyncio.sleep(MODEL_POLL_SECONDS)
+        await run_in_threadpool(reload_model)
+        data_version = await run_in_threadpool(current_data_version)
+        schedule_forecast_refit()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global df, rules, similarity_df, tedf
-    # Startup logic
-    df = load_data('data/raw/train.csv')
-    items_df = items_data(df)
-    rules = build_market_basket_rules(items_df)
-    similarity_df, tedf = build_similarity_matrix(items_df)
+    global model, executor, response_cache, forecasts, data_version
+    # Startup logic: load the prebuilt bundle, or build from the CSV if there is no valid one
+    with span('lifespan.model'):
+        model = load_or_build_model(ARTIFACTS_DIR, DATA_PATH, k=CF_NEIGHBOURS, block_size=CF_BLOCK_SIZE, method=CF_METHOD)
+    executor = ScoringExecutor(workers=SCORING_WORKERS, max_queue=SCORING_MAX_QUEUE)
+    response_cache = ResponseCache(max_size=RECOMMEND_CACHE_SIZE, ttl=RECOMMEND_CACHE_TTL)
+    # Forecasts start from the registry, even a stale version; missing or stale models are refit in the background
+    with span('lifespan.forecasts'):
+        data_version = current_data_version()
+        forecasts = (load_forecast_models(FORECAST_DIR, data_version) if data_version is not None else None) or load_forecast_models(FORECAST_DIR)
+    schedule_forecast_refit()
+    watcher = asyncio.create_task(watch_model()) if MODEL_POLL_SECONDS > 0 else None
     yield
+    if watcher is not None:
+        watcher.cancel()
+    executor.shutdown()
     
 app = FastAPI(title="Retail Recommendation API", lifespan=lifespan)
 
+@app.exception_handler(ExecutorSaturated)
+async def saturated_handler(request: Request, exc: ExecutorSaturated):
+    return JSONResponse(status_code=429, content={"detail": "Too many concurrent scoring requests"}, headers={"Retry-After": "1"})
+
 class RecommendationRequest(BaseModel):
     customer_name: str
     cart: list[str] | None = None
     category: str | None = None
+    per_category: int = Field(default=2, ge=1, le=20)
+
+def recommendation_key(request, version):
+    # recommend() only looks at the set of cart items, so order and repeats do not change the answer
+    cart = None if request.cart is None else tuple(sorted(set(request.cart)))
+    return (request.customer_name, cart, request.category, request.per_category, version)
+
+def profiled_call(label, fn, *args, **kwargs):
+    with profiled(PROFILE_DIR, label, PROFILE_MIN_SECONDS):
+        return fn(*args, **kwargs)
 
 @app.post("/recommend")
-async def get_recommendations(request: RecommendationRequest):
-    recommendations = recommend(
+async def get_recommendations(request: RecommendationRequest, response: Response):
+    start = time.perf_counter()
+    current = model
+    kind = request_type(request.customer_name, request.cart, request.category, current.engine)
+    key = recommendation_key(request, current.version)
+    cached = response_cache.get(key)
+    if cached is not None:
+        response.headers["Server-Timing"] = 'cache;desc="hit"'
+        REQUEST_SECONDS.observe(time.perf_counter() - start, type=kind, cache='hit')
+        return {"recommendations": list(cached)}
+    recommendations, timing = await executor.run(
+        profiled_call,
+        kind,
+        recommend,
         name=request.customer_name,
-        rules=rules,
-        similarity_df=similarity_df,
-        tedf=tedf,
+        rules=current.rules,
+        engine=current.engine,
         cart=request.cart,
         category=request.category,
-        df=df
+        catalogue=current.catalogue,
+        per_category=request.per_category
     )
+    if model is current:
+        response_cache.put(key, tuple(recommendations))
+    response.headers["Server-Timing"] = server_timing(timing)
+    REQUEST_SECONDS.observe(time.perf_counter() - start, type=kind, cache='miss')
     return {"recommendations": recommendations}
 
+@app.get("/recommend/cache")
+async def get_recommendation_cache():
+    return {"model_version": model.version, **response_cache.stats()}
+
+class BatchRecommendationRequest(BaseModel):
+    requests: list[RecommendationRequest] = Field(max_length=MAX_BATCH_SIZE)
+
+@app.post("/recommend/batch")
+async def get_batch_recommendations(batch: BatchRecommendationRequest, response: Response):
+    current = model
+    results, timing = await executor.run(recommend_many, [r.model_dump() for r in batch.requests], current.rules, current.engine, current.catalogue)
+    response.headers["Server-Timing"] = server_timing(timing)
+    return {"results": [{"recommendations": recommendations} for recommendations in results]}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    cache = response_cache.stats()
+    return (REGISTRY.render()
+            + sample('scoring_in_flight', 'Scoring jobs running or queued.', executor.in_flight)
+            + sample('recommend_cache_entries', 'Entries in the /recommend response cache.', cache['size'])
+            + ''.join(sample(f'recommend_cache_{name}_total', f'/recommend cache {name} since the API started.', cache[name], 'counter')
+                      for name in ['hits', 'misses', 'evictions', 'expirations']))
+
+def model_info():
+    return {"version": model.version, "source_fingerprint": model.source_fingerprint, "path": model.path, "params": model.params}
+
+@app.get("/model")
+async def get_model():
+    return model_info()
+
+@app.post("/model/reload")
+async def post_model_reload():
+    await run_in_threadpool(reload_model)
+    return model_info()
+
+@app.get("/forecast")
+async def get_forecast(months: int = Query(12, ge=1, le=MAX_FORECAST_MONTHS), series: str = 'Total'):
+    current = forecasts
+    if current is None:
+        schedule_forecast_refit()
+        raise HTTPException(status_code=503, detail="Forecast models are being fitted", headers={"Retry-After": "30"})
+    if series not in current:
+        raise HTTPException(status_code=404, detail=f"Unknown series {series!r}; available: {current.series()}")
+    stale = data_version is not None and current.version != data_version
+    if stale:
+        schedule_forecast_refit()
+    predictions = await run_in_threadpool(current.forecast, series, months)
+    return {
+        "series": series,
+        "version": current.version,
+        "fitted_at": current.fitted_at,
+        "stale": stale,
+        "fallback": series in current.fallback,
+        "forecast": [{"month": month.strftime('%Y-%m'), "sales": float(sales)} for month, sales in predictions.items()],
+    }
+
 # if __name__ == "__main__":
-#     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+#     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,63 @@
+"""Cart scoring: subset enumeration over the legacy rules dict vs RuleIndex.
+
+Run from the repository root:  python -m benchmarks.cart_rules
+"""
+import argparse
+import time
+from src.data_preprocessing import load_data, items_data
+from src.recommendation import build_market_basket_rules
+from src.utils import encode_transactions, all_non_empty_subsets
+from mlxtend.frequent_patterns import apriori, association_rules
+
+def legacy_rules(items_df, min_support=0.001, min_lift=1.5):
+    frequent_itemsets = apriori(encode_transactions(items_df['Items'].tolist()), min_support=min_support, use_colnames=True)
+    rules = association_rules(frequent_itemsets, metric='lift', min_threshold=min_lift).sort_values(by='confidence')
+    mba_rules = {}
+    for _, row in rules.iterrows():
+        mba_rules.setdefault(tuple(row['antecedents']), []).append((row['consequents'], row['confidence'], row['lift']))
+    return mba_rules
+
+def legacy_score_cart(rules, cart):
+    cart = set(cart)
+    mba = {}
+    for itemsets in all_non_empty_subsets(cart):
+        for r, c, l in rules.get(itemsets, []):
+            for item in set(r) - cart:
+                mba[item] = mba.get(item, 0) + (c * l)
+    return mba
+
+def best_of(fn, repeats):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--data', default='data/raw/train.csv')
+    parser.add_argument('--max-cart', type=int, default=30)
+    parser.add_argument('--legacy-max-cart', type=int, default=20, help="legacy enumerates 2^n subsets; larger carts are skipped")
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    df = load_data(args.data)
+    items_df = items_data(df)
+    legacy = legacy_rules(items_df)
+    index = build_market_basket_rules(items_df)
+    # Sub-categories first (these can match rules), then product names as filler
+    pool = list(df['Sub-Category'].value_counts().index) + list(df['Product Name'].unique())
+    print(f"{len(index)} rules, longest antecedent {index.max_antecedent_len}")
+    print(f"{'cart':>4} {'legacy ms':>12} {'index ms':>10} {'speedup':>9}")
+    for size in range(1, args.max_cart + 1):
+        cart = pool[:size]
+        new = best_of(lambda: index.score_cart(cart), args.repeats)
+        if size <= args.legacy_max_cart:
+            old = best_of(lambda: legacy_score_cart(legacy, cart), 1 if size > 16 else args.repeats)
+            print(f"{size:>4} {old * 1e3:>12.3f} {new * 1e3:>10.3f} {old / new:>8.0f}x")
+        else:
+            print(f"{size:>4} {'skipped':>12} {new * 1e3:>10.3f} {'-':>9}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Cohort and churn metrics: Period groupbys over order rows vs integer codes and bincount.
+
+Run from the repository root:  python -m benchmarks.cohorts --rows 10000000
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from src.data_preprocessing import cohort_data, customer_table, order_data
+from src.churn_analysis import LOST, churn_rate_by_segment, churn_trend
+
+def synthetic_orders(rows, customers, seed=0):
+    """Order rows over 2015-2018 with a categorical ``Customer ID`` and the columns ``customer_table`` reads."""
+    rng = np.random.default_rng(seed)
+    # Each customer orders uniformly within their own window, so every lifecycle bucket is populated
+    first_day = rng.integers(0, 1461, customers)
+    span = (rng.random(customers) * (1461 - first_day)).astype(np.int64) + 1
+    customer = rng.integers(0, customers, rows)
+    day = first_day[customer] + (rng.random(rows) * span[customer]).astype(np.int64)
+    ids = pd.Categorical.from_codes(customer, [f"C-{i:06d}" for i in range(customers)])
+    segments = pd.Categorical.from_codes(rng.integers(0, 3, customers)[customer], ['Consumer', 'Corporate', 'Home Office'])
+    df = pd.DataFrame({'Customer ID': ids, 'Customer Name': ids, 'Segment': segments,
+                       'Sub-Category': pd.Categorical.from_codes(rng.integers(0, 17, rows), [f"S{i}" for i in range(17)])},
+                      index=pd.DatetimeIndex(np.datetime64('2015-01-01') + day.astype('timedelta64[D]'), name='Order Date'))
+    return df.sort_index()
+
+def legacy_cohort_data(df):
+    df['Year Offset'] = df['Order Year'].dt.year - df['First Purchase Year'].dt.year
+    df_cohorts = df[df['First Purchase Year'].notna()]
+    return df_cohorts.groupby(['First Purchase Year', 'Year Offset'])['Customer ID'].nunique().unstack(fill_value=0).sort_index()
+
+def legacy_churn(order_df, customers):
+    total_customers = order_df.groupby('Segment', observed=True)['Customer ID'].nunique()
+    lost_customers = order_df[order_df['Customer Segment'] == LOST].groupby('Segment', observed=True)['Customer ID'].nunique()
+    churn_rate = (lost_customers / total_customers * 100).sort_index()
+    trend = customers[customers['Customer Segment'] == LOST].groupby('Last Purchase').size()
+    return churn_rate, trend
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10_000_000)
+    parser.add_argument('--customers', type=int, default=100_000)
+    args = parser.parse_args(argv)
+
+    df, seconds = timed(lambda: synthetic_orders(args.rows, args.customers))
+    print(f"{len(df):,} synthetic orders for {args.customers:,} customers in {seconds:.1f}s")
+    customers, table_seconds = timed(lambda: customer_table(df))
+    order_df, join_seconds = timed(lambda: order_data(df, customers=customers))
+    print(f"customer_table {table_seconds:.2f}s, order_data join (legacy input only) {join_seconds:.2f}s")
+
+    old_cohorts, old_cohort_seconds = timed(lambda: legacy_cohort_data(order_df.copy()))
+    new_cohorts, new_cohort_seconds = timed(lambda: cohort_data(df))
+    monthly, monthly_seconds = timed(lambda: cohort_data(df, freq='M'))
+    assert (old_cohorts.to_numpy() == new_cohorts.to_numpy()).all()
+    (old_rate, old_trend), old_churn_seconds = timed(lambda: legacy_churn(order_df, customers))
+    (new_rate, new_trend), new_churn_seconds = timed(lambda: (churn_rate_by_segment(customers), churn_trend(customers)))
+    assert np.allclose(old_rate.fillna(0).to_numpy(), new_rate.to_numpy()) and (new_trend[new_trend > 0] == old_trend).all()
+
+    print(f"{'metric':<16} {'legacy s':>9} {'codes s':>9} {'speedup':>8}")
+    print(f"{'yearly cohorts':<16} {old_cohort_seconds:>9.2f} {new_cohort_seconds:>9.2f} {old_cohort_seconds / new_cohort_seconds:>7.1f}x")
+    print(f"{'churn':<16} {old_churn_seconds:>9.2f} {new_churn_seconds:>9.3f} {old_churn_seconds / new_churn_seconds:>7.0f}x")
+    print(f"{'monthly cohorts':<16} {'-':>9} {monthly_seconds:>9.2f} {'-':>8}  ({monthly.shape[0]} cohorts x {monthly.shape[1]} offsets)")
+
+if __name__ == "__main__":
+    main()
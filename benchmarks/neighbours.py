@@ -0,0 +1,66 @@
+"""Approximate (MinHash/LSH) vs exact cosine neighbours: recall@k and build-time scaling.
+
+Recall is measured on the bundled ``train.csv`` for a grid of signature sizes,
+bands and bucket windows; recall counts an approximate neighbour as a hit when
+its similarity reaches the exact k-th similarity (see ``recall_at_k``). Build
+times come from synthetic data on the ``benchmarks.suite`` ladder; the exact
+index is skipped above ``--max-exact-customers`` since it is O(customers^2).
+
+Run from the repository root:  python -m benchmarks.neighbours --sizes 10x,100x
+"""
+import argparse
+import os
+import tempfile
+import time
+from benchmarks.suite import LADDER
+from src.baskets import BasketStore
+from src.data_preprocessing import load_data
+from src.neighbours import build_minhash_neighbour_index, build_neighbour_index, recall_at_k
+from src.synthetic import write_orders
+
+DATA_PATH = 'data/raw/train.csv'
+# (num_perm, bands, per_bucket)
+GRID = [(64, 16, 32), (64, 32, 8), (64, 32, 32), (128, 64, 32)]
+MAX_EXACT_CUSTOMERS = 100_000
+
+def customer_items(data_path):
+    _, owned = BasketStore.from_orders(load_data(data_path, use_cache=False)).customer_matrix()
+    return owned, list(range(owned.shape[0]))
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10x,100x', help=f"comma-separated rungs of {list(LADDER)}")
+    parser.add_argument('--k', type=int, default=50)
+    parser.add_argument('--max-exact-customers', type=int, default=MAX_EXACT_CUSTOMERS)
+    args = parser.parse_args(argv)
+
+    owned, users = customer_items(DATA_PATH)
+    print(f"recall on {DATA_PATH} ({owned.shape[0]} customers x {owned.shape[1]} items)")
+    print(f"{'num_perm':>8} {'bands':>6} {'per_bucket':>10} {'k':>4} {'recall':>7} {'exact s':>8} {'approx s':>9}")
+    for k in sorted({10, args.k}):
+        exact, exact_seconds = timed(lambda: build_neighbour_index(owned, users, k=k))
+        for num_perm, bands, per_bucket in GRID:
+            approx, seconds = timed(lambda: build_minhash_neighbour_index(owned, users, k=k, num_perm=num_perm, bands=bands, per_bucket=per_bucket))
+            print(f"{num_perm:>8} {bands:>6} {per_bucket:>10} {k:>4} {recall_at_k(approx, exact):>7.3f} {exact_seconds:>8.2f} {seconds:>9.2f}")
+
+    print(f"\nbuild time on synthetic data, k={args.k}, default LSH parameters")
+    print(f"{'size':>6} {'customers':>10} {'exact s':>9} {'approx s':>9} {'recall':>7}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for label in args.sizes.split(','):
+            data_path = os.path.join(tmp, f'orders_{label}.csv')
+            write_orders(data_path, **LADDER[label])
+            owned, users = customer_items(data_path)
+            approx, seconds = timed(lambda: build_minhash_neighbour_index(owned, users, k=args.k))
+            exact_seconds, recall = '-', '-'
+            if owned.shape[0] <= args.max_exact_customers:
+                exact, exact_seconds = timed(lambda: build_neighbour_index(owned, users, k=args.k))
+                exact_seconds, recall = f"{exact_seconds:.1f}", f"{recall_at_k(approx, exact):.3f}"
+            print(f"{label:>6} {owned.shape[0]:>10} {exact_seconds:>9} {seconds:>9.1f} {recall:>7}", flush=True)
+
+if __name__ == "__main__":
+    main()
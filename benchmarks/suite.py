@@ -0,0 +1,164 @@
+"""Scaling benchmarks for the pipeline and serving stages on synthetic data.
+
+For every size on the ladder a synthetic ``train.csv`` is generated
+(``src.synthetic``) and each stage is timed (best of ``--repeats``) and run once
+more under ``tracemalloc`` for its peak allocation. ``recommend`` is timed per
+request type as the mean latency over ``--requests`` calls. Results are written as
+JSON; ``--compare`` reports stages that got slower than a previous results file.
+
+Run from the repository root:  python -m benchmarks.suite --sizes 1x,10x --out bench.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from src.baskets import BasketStore
+from src.data_preprocessing import load_data, order_data, items_data
+from src.forecasting import run_sales_forecast_pipeline
+from src.recommendation import (build_market_basket_rules, build_similarity_matrix, build_cf_engine, build_popular_catalogue,
+                                recommend, request_type)
+from src.synthetic import write_orders
+
+# Orders and customers per rung; 1x is roughly the size of train.csv
+LADDER = {
+    '1x': {'orders': 5_000, 'customers': 800},
+    '10x': {'orders': 50_000, 'customers': 8_000},
+    '100x': {'orders': 500_000, 'customers': 80_000},
+    '1000x': {'orders': 5_000_000, 'customers': 800_000},
+}
+# The dense customer x customer similarity matrix needs 8 * customers^2 bytes
+MAX_DENSE_CUSTOMERS = 20_000
+REQUEST_TYPES = ['cf', 'category_known', 'category_unknown', 'cart_known', 'cart_unknown', 'fallback']
+
+def measure(fn, repeats=1, memory=True):
+    """``(result, best seconds, peak MB)``; the peak comes from one extra traced run."""
+    best, result = float('inf'), None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    peak = None
+    if memory:
+        tracemalloc.start()
+        try:
+            fn()
+            peak = tracemalloc.get_traced_memory()[1] / 2**20
+        finally:
+            tracemalloc.stop()
+    return result, best, peak
+
+def sample_requests(baskets, engine, catalogue, n, seed=0):
+    """``n`` requests of every type in ``REQUEST_TYPES``, built from customers and items in the data."""
+    rng = np.random.default_rng(seed)
+    known = rng.choice(np.array(engine.users, dtype=object), n)
+    carts = [baskets.basket(i) for i in rng.integers(0, len(baskets), n)]
+    categories = rng.choice(np.array(list(catalogue), dtype=object), n)
+    unknown = [f"Synthetic Visitor {i}" for i in range(n)]
+    requests = {
+        'cf': [(name, None, None) for name in known],
+        'category_known': [(name, None, category) for name, category in zip(known, categories)],
+        'category_unknown': [(name, None, category) for name, category in zip(unknown, categories)],
+        'cart_known': [(name, cart, None) for name, cart in zip(known, carts)],
+        'cart_unknown': [(name, cart, None) for name, cart in zip(unknown, carts)],
+        'fallback': [(name, None, None) for name in unknown],
+    }
+    for kind, batch in requests.items():
+        assert all(request_type(name, cart, category, engine) == kind for name, cart, category in batch[:1])
+    return requests
+
+def run_size(label, data_path, repeats=1, requests=200, max_dense_customers=MAX_DENSE_CUSTOMERS):
+    """Result rows for every stage on the CSV at ``data_path``."""
+    rows = []
+
+    def record(stage, fn, memory=True, calls=1, repeat=repeats):
+        result, seconds, peak = measure(fn, repeat, memory)
+        rows.append({'size': label, 'stage': stage, 'seconds': seconds / calls, 'peak_mb': peak, 'calls': calls, 'status': 'ok'})
+        return result
+
+    df = record('load_data', lambda: load_data(data_path, use_cache=False))
+    load_data(data_path)  # write the Parquet cache once so the cached load is measured warm
+    record('load_data_cached', lambda: load_data(data_path))
+    record('order_data', lambda: order_data(df))
+    record('items_data', lambda: items_data(df))
+    # Downstream stages take the basket store, as the pipeline does
+    baskets = record('basket_store', lambda: BasketStore.from_orders(df))
+    rules = record('build_market_basket_rules', lambda: build_market_basket_rules(baskets))
+    customers = df['Customer Name'].nunique()
+    if customers <= max_dense_customers:
+        record('build_similarity_matrix', lambda: build_similarity_matrix(baskets))
+    else:
+        rows.append({'size': label, 'stage': 'build_similarity_matrix', 'seconds': None, 'peak_mb': None, 'calls': 0,
+                     'status': f'skipped: {customers} customers > {max_dense_customers}'})
+    engine = record('build_cf_engine', lambda: build_cf_engine(baskets))
+    catalogue = build_popular_catalogue(df)
+    for kind, batch in sample_requests(baskets, engine, catalogue, requests).items():
+        record(f'recommend[{kind}]', lambda: [recommend(name, rules, cart, category, engine, catalogue) for name, cart, category in batch],
+               memory=False, calls=len(batch))
+    with contextlib.redirect_stdout(io.StringIO()):
+        record('run_sales_forecast_pipeline', lambda: run_sales_forecast_pipeline(df, plots=[]))
+    for row in rows:
+        row.update({'rows': len(df), 'customers': customers})
+    return rows
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'commit': commit, 'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count(),
+            'numpy': np.__version__, 'pandas': pd.__version__, 'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+def compare(results, baseline, threshold=0.2):
+    """Stages at least ``threshold`` slower than in ``baseline``, as ``(size, stage, old, new)``."""
+    old = {(row['size'], row['stage']): row['seconds'] for row in baseline['results'] if row['seconds'] is not None}
+    return [(row['size'], row['stage'], old[row['size'], row['stage']], row['seconds']) for row in results['results']
+            if row['seconds'] is not None and (row['size'], row['stage']) in old
+            and row['seconds'] > old[row['size'], row['stage']] * (1 + threshold)]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='1x,10x', help=f"comma-separated rungs of {list(LADDER)}")
+    parser.add_argument('--repeats', type=int, default=1)
+    parser.add_argument('--requests', type=int, default=200, help="recommend calls per request type")
+    parser.add_argument('--max-dense-customers', type=int, default=MAX_DENSE_CUSTOMERS)
+    parser.add_argument('--out', default='benchmarks/results.json')
+    parser.add_argument('--compare', help="previous results file to check for regressions")
+    parser.add_argument('--threshold', type=float, default=0.2, help="relative slowdown reported as a regression")
+    args = parser.parse_args(argv)
+
+    results = {'environment': environment(), 'ladder': LADDER, 'results': []}
+    with tempfile.TemporaryDirectory() as tmp:
+        for label in args.sizes.split(','):
+            data_path = os.path.join(tmp, f'orders_{label}.csv')
+            start = time.perf_counter()
+            write_orders(data_path, **LADDER[label])
+            print(f"{label}: generated {LADDER[label]} in {time.perf_counter() - start:.1f}s", flush=True)
+            for row in run_size(label, data_path, args.repeats, args.requests, args.max_dense_customers):
+                results['results'].append(row)
+                seconds = '-' if row['seconds'] is None else f"{row['seconds'] * 1e3:.2f}ms"
+                peak = '-' if row['peak_mb'] is None else f"{row['peak_mb']:.1f}MB"
+                print(f"  {row['stage']:<30} {seconds:>12} {peak:>10}  {row['status']}", flush=True)
+    os.makedirs(os.path.dirname(args.out) or '.', exist_ok=True)
+    with open(args.out, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Wrote {len(results['results'])} results to {args.out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for size, stage, old, new in regressions:
+            print(f"REGRESSION {size} {stage}: {old * 1e3:.2f}ms -> {new * 1e3:.2f}ms")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,89 +1,214 @@
-import pandas as pd
-from src.data_preprocessing import load_data, sales_data, order_data, items_data, forecast_data, customer_data, cohort_data
-from src.sales_analysis import analyze_categories, analyze_time_trends, plot_sales_by_region_segment
+from src.data_preprocessing import load_data, sales_data, order_data, customer_data, cohort_data, customer_table
+from src.sales_analysis import analyze_categories, analyze_time_trends, plot_categories, plot_sales_by_region_segment
 from src.customer_analysis import analyze_customer_pattern, analyze_cohorts
 from src.churn_analysis import plot_churn_rate_by_segment, plot_lost_customer_purchase_distribution, plot_churn_trend
 from src.forecasting import run_sales_forecast_pipeline
-from src.basket_analysis import plot_average_basket_with_time, plot_basket_distribution, basket_trend_analysis, plot_association_network
-from src.recommendation import build_market_basket_rules, build_similarity_matrix, recommend
-import matplotlib.pyplot as plt
-plt.style.use('dark_background')
-def main():
-    # Load and preprocess data
-    df = load_data('data/raw/train.csv')
-    summary, category_totals = analyze_categories(df)
-    
+from src.basket_analysis import plot_average_basket_with_time, plot_basket_distribution, basket_trend_analysis, segment_basket_trends, plot_association_network
+from src.baskets import BasketStore
+from src.recommendation import build_market_basket_rules, build_cf_engine, build_popular_catalogue, recommend
+from src.streaming import stream_aggregates
+from src.pipeline import Node, Pipeline, source_fingerprint
+from src.rendering import render
+from src.instrumentation import write_metrics
+from src.utils import data_fingerprint
+import argparse
+import functools
+import glob
+import os
+DATA_PATH = 'data/raw/train.csv'
+
+# Pipeline stages: each takes the outputs of the stages it depends on
+def stage_load(data_path):
+    return load_data(data_path)
+
+def stage_sales(df):
+    plots = []
+    summary, category_totals = analyze_categories(df, plots=plots)
+    monthly_sales = analyze_time_trends(sales_data(df), plots=plots)
+    region_segment_sales = plot_sales_by_region_segment(df, plots=plots)
+    return {'summary': summary, 'category_totals': category_totals, 'monthly_sales': monthly_sales,
+            'region_segment_sales': region_segment_sales, 'plots': plots}
+
+def stage_customers(df):
+    # One per-customer lifecycle table feeds both the order-level and customer-level views
+    return customer_table(df, items=True)
+
+def stage_orders(df, customers):
+    return order_data(df, customers=customers)
+
+def stage_segments(order_df):
+    plots = []
+    return {'seg_dist': analyze_customer_pattern(order_df, plots=plots), 'plots': plots}
+
+def stage_cohorts(df):
+    plots = []
+    return {'retention': analyze_cohorts(cohort_data(df), plots=plots), 'plots': plots}
+
+def stage_churn(customers):
+    plots = []
+    customer_df = customer_data(None, customers=customers)
+    churn_rate = plot_churn_rate_by_segment(customer_df, plots=plots)
+    plot_lost_customer_purchase_distribution(customer_df, plots=plots)
+    plot_churn_trend(customer_df, plots=plots)
+    return {'churn_rate': churn_rate, 'plots': plots}
+
+def stage_forecast(df):
+    plots = []
+    return {'forecast': run_sales_forecast_pipeline(df, months_ahead=36, plots=plots), 'plots': plots}
+
+def stage_items(df):
+    baskets = BasketStore.from_orders(df)
+    # One sparse encoding of the daily baskets is shared by trend mining and the recommender
+    return {'baskets': baskets, 'encoding': baskets.to_encoding()}
+
+def stage_basket(items, customers):
+    plots = []
+    basket_sizes = items['baskets'].summary()
+    plot_basket_distribution(basket_sizes, plots=plots)
+    plot_average_basket_with_time(basket_sizes, plots=plots)
+    customer_df = customer_data(None, customers=customers)
+    # Every lifecycle segment from the shared encoding; the Active segment below is then a cache hit
+    segment_itemsets, segment_rules = segment_basket_trends(customer_df, items['baskets'], encoding=items['encoding'])
+    frequent_items, rules = basket_trend_analysis(customer_df, items['baskets'], encoding=items['encoding'])
+    plot_association_network(rules, plots=plots)
+    return {'rules': rules, 'segment_rules': segment_rules, 'plots': plots}
+
+def stage_recommendation(df, items):
+    rules = build_market_basket_rules(items['baskets'], encoding=items['encoding'])
+    engine = build_cf_engine(items['baskets'])
+    catalogue = build_popular_catalogue(df)
+    sample_user = df['Customer Name'].iloc[0]
+    return sample_user, recommend(name=sample_user, rules=rules, engine=engine, cart=None, category='Binders', catalogue=catalogue)
+
+def stage_render(*outputs, workers=1, style='dark_background'):
+    return render([plot for output in outputs for plot in output['plots']], workers=workers, style=style)
+
+PLOT_STAGES = ['sales', 'segments', 'cohorts', 'churn', 'forecast', 'basket']
+
+def build_pipeline(data_path=DATA_PATH, cache_dir='.cache/pipeline', workers=1):
+    root = os.path.dirname(os.path.abspath(__file__))
+    version = source_fingerprint(glob.glob(os.path.join(root, 'src', '*.py')) + [os.path.join(root, 'main.py')])
+    return Pipeline([
+        Node('load', stage_load, params={'data_path': data_path}, key=data_fingerprint(data_path)),
+        Node('sales', stage_sales, ['load']),
+        Node('customers', stage_customers, ['load']),
+        Node('orders', stage_orders, ['load', 'customers']),
+        Node('segments', stage_segments, ['orders']),
+        Node('cohorts', stage_cohorts, ['load']),
+        Node('churn', stage_churn, ['customers']),
+        Node('forecast', stage_forecast, ['load']),
+        Node('items', stage_items, ['load']),
+        Node('basket', stage_basket, ['items', 'customers']),
+        Node('recommendation', stage_recommendation, ['load', 'items']),
+        # Re-renders only when a plotting stage's output changes; the pool size is not part of the key
+        Node('render', functools.partial(stage_render, workers=workers), PLOT_STAGES),
+    ], cache_dir=cache_dir, version=version)
+
+def main(data_path=DATA_PATH, workers=1, force=False, plots=True):
+    pipeline = build_pipeline(data_path, workers=workers)
+    targets = ['sales', 'segments', 'cohorts', 'churn', 'forecast', 'items', 'basket', 'recommendation'] + (['render'] if plots else [])
+    results = pipeline.run(targets, workers=workers, force=force)
+
     #Sales Analysis
+    sales = results['sales']
     print("Category Sales Analysis")
-    print(category_totals)
+    print(sales['category_totals'])
     print('-'*50)
     print('Product Sales analysis')
-    print(summary)
+    print(sales['summary'])
     print("""\nAnalysis : Here, we see, most sales are in office supplies, while technology sales are low but prices of products are high
 in tech, copiers are most expensive and ofc underperforming, while in office supplies, most selling is paper and binders.
 Highest revenue contribution is Technology, mostly from phones, and 2nd highest nis chairs from furniture""")
     print('-'*50)
-    
-    sales_df = sales_data(df)
-    monthly_sales = analyze_time_trends(sales_df)
-    print(monthly_sales)
+    print(sales['monthly_sales'])
     print('\nMonthly Sales analysis : march, september, novemember and december have sales peak')
     print('-'*50)
-    region_segment_sales = plot_sales_by_region_segment(df)
-    print("Region-Segment Sales:\n", region_segment_sales)
+    print("Region-Segment Sales:\n", sales['region_segment_sales'])
     print('\nAnalysis : Consumers in east and west are main revenue contributors')
     print('-'*50)
-    
+
     #Customer Analysis
-    order_df = order_data(df)
-    seg_dist = analyze_customer_pattern(order_df)
-    print(seg_dist)
+    print(results['segments']['seg_dist'])
     print('Analysis : 8%% of customers have been lost')
     print('-'*50)
-    cohort_counts = cohort_data(order_df)
-    retention = analyze_cohorts(cohort_counts)
     print("Retention - Customer Joined to Next Years")
-    print(retention)
+    print(results['cohorts']['retention'])
     print('-'*50)
-    
+
     # Customer Churn Analysis
-    
-    churn_rate = plot_churn_rate_by_segment(order_df)
-    print(churn_rate)
+    print(results['churn']['churn_rate'])
     print('Analysis : around 14%% from home office and 13%% from corporte are lost')
     print('-'*50)
-    customer_df = customer_data(order_df)
-    plot_lost_customer_purchase_distribution(customer_df)
     print('Analysis of churn customer purchase patterns : Lost customers mostly bought 5-10 purchases before churning')
     print('-'*50)
-    plot_churn_trend(customer_df)
     print('Analysis of churn trend plot : Churned spiked up recently indicating many customers have not purchased for a long time again')
     print('-'*50)
 
     # Forecasting
-    forecast_results = run_sales_forecast_pipeline(df, months_ahead=36)
-    print(forecast_results.tail(12)[['Pred', 'MoM Growth %']])
+    print(results['forecast']['forecast'].tail(12)[['Pred', 'MoM Growth %']])
     print('-'*50)
     # Basket Analysis
-    items_df = items_data(df)
-    print(items_df.head())
-    plot_basket_distribution(items_df)
-    plot_average_basket_with_time(items_df)
+    print(results['items']['baskets'].subset(range(5)).to_frame())
     print("""Analysis of basket plot : Average basket size has declined over time. Mostly small basket purchases are done now, while there are few large baskets we can promote sales by giving offers if you buy 4-5 items together to increase basket size
 to increase large basket purchases, we can give special discounts to bulk buyers""")
     print('-'*50)
     print('Trending Basket Variations')
-    frequent_items, rules = basket_trend_analysis(customer_df, items_df)
-    print(rules.head())
-    plot_association_network(rules)
+    print(results['basket']['rules'].head())
+    print('Basket rules per customer segment:\n', results['basket']['segment_rules'].groupby('Customer Segment', observed=True).size())
     print('-'*50)
-    
+
     # # Recommendation System
-    rules = build_market_basket_rules(items_df)
-    similarity_df, tedf = build_similarity_matrix(items_df)
-    sample_user = df['Customer Name'].iloc[0]
-    recommendations = recommend(name=sample_user, rules=rules, similarity_df=similarity_df, tedf=tedf, cart=None, category='Binders', df=df)
+    sample_user, recommendations = results['recommendation']
     print(f"Recommendations for {sample_user}:\n", recommendations)
 
+    ran = {name: seconds for name, seconds in pipeline.status.items() if seconds != 'cached'}
+    cached = [name for name, seconds in pipeline.status.items() if seconds == 'cached']
+    print('-'*50)
+    print('Stages run: ' + (', '.join(f"{name} {seconds:.1f}s" for name, seconds in ran.items()) or 'none'))
+    print('Stages from cache: ' + (', '.join(cached) or 'none'))
+
+def main_streaming(data_path=DATA_PATH, chunksize=100_000, workers=1, plots=True):
+    # Only the analyses that run on aggregates; the row-level customer and churn sections need load_data
+    aggregates = stream_aggregates(data_path, chunksize=chunksize)
+    print(f"Streamed {aggregates.rows} rows in chunks of {chunksize}")
+    specs = []
+    summary, category_totals = aggregates.category_summary()
+    plot_categories(summary, category_totals, plots=specs)
+    print("Category Sales Analysis")
+    print(category_totals)
+    print('-'*50)
+    print('Product Sales analysis')
+    print(summary)
+    print('-'*50)
+
+    sales_df = aggregates.sales_data()
+    monthly_sales = analyze_time_trends(sales_df.copy(), plots=specs)
+    print(monthly_sales)
+    print('-'*50)
+
+    forecast_results = run_sales_forecast_pipeline(sales_df.rename(columns={'sales': 'Sales'}), months_ahead=36, plots=specs)
+    print(forecast_results.tail(12)[['Pred', 'MoM Growth %']])
+    print('-'*50)
+
+    items_df = aggregates.baskets().summary()
+    print(items_df.head())
+    plot_basket_distribution(items_df, plots=specs)
+    plot_average_basket_with_time(items_df, plots=specs)
+    if plots:
+        render(specs, workers=workers, style='dark_background')
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--stream', action='store_true', help="read the CSV in chunks and run the aggregate-based analyses only")
+    parser.add_argument('--chunksize', type=int, default=100_000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="processes for independent pipeline stages and plot rendering")
+    parser.add_argument('--force', action='store_true', help="ignore cached stage outputs and rerun every stage")
+    parser.add_argument('--no-plots', action='store_true', help="skip rendering the figures; only compute and print the results")
+    parser.add_argument('--metrics', help="write stage timings to this file in the Prometheus text format")
+    args = parser.parse_args()
+    if args.stream:
+        main_streaming(chunksize=args.chunksize, workers=args.workers, plots=not args.no_plots)
+    else:
+        main(workers=args.workers, force=args.force, plots=not args.no_plots)
+    if args.metrics:
+        write_metrics(args.metrics)
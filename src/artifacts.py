@@ -0,0 +1,202 @@
+import argparse
+import inspect
+import json
+import os
+import tempfile
+import time
+import uuid
+import warnings
+import numpy as np
+from scipy import sparse
+from .baskets import BasketStore
+from .data_preprocessing import load_data
+from .instrumentation import span
+from .neighbours import NEIGHBOUR_METHODS, NeighbourIndex, index_dtype, neighbour_index
+from .recommendation import CFEngine, PopularCatalogue, RuleIndex, build_market_basket_rules, build_popular_catalogue, encode_customer_items
+from .utils import data_fingerprint
+
+FORMAT_VERSION = 2
+MANIFEST = 'manifest.json'
+CURRENT = 'CURRENT'
+ARRAY_FILES = ['users', 'items', 'neighbours_indptr', 'neighbours_indices', 'neighbours_data', 'owned_indptr', 'owned_indices', 'owned_data']
+
+class ModelBundle:
+    """Everything ``recommend`` needs, built from one version of the source data.
+
+    ``version`` changes whenever the model does: it is the bundle name for a loaded
+    bundle and the source fingerprint for a model built straight from the CSV.
+    ``path`` is the bundle directory, or None when built in process.
+    """
+
+    def __init__(self, rules, engine, catalogue, version, source_fingerprint, params=None, path=None):
+        self.rules = rules
+        self.engine = engine
+        self.catalogue = catalogue
+        self.version = version
+        self.source_fingerprint = source_fingerprint
+        self.params = params or {}
+        self.path = path
+
+def build_model(data_path, k=50, block_size=1024, min_support=0.001, min_lift=1.5, method='exact'):
+    fingerprint = data_fingerprint(data_path)
+    with span('build_model.load'):
+        df = load_data(data_path, columns=['Customer Name', 'Sub-Category', 'Product Name'])
+        baskets = BasketStore.from_orders(df)
+    with span('build_model.rules'):
+        rules = build_market_basket_rules(baskets, min_support=min_support, min_lift=min_lift)
+    with span('build_model.neighbours'):
+        tedf = encode_customer_items(baskets)
+        neighbours = neighbour_index(tedf.to_numpy(), tedf.index, method, k=k, block_size=block_size)
+        engine = CFEngine.from_neighbours(neighbours, tedf)
+    with span('build_model.catalogue'):
+        catalogue = build_popular_catalogue(df, version=fingerprint)
+    params = {'k': k, 'block_size': block_size, 'min_support': min_support, 'min_lift': min_lift, 'method': method}
+    return ModelBundle(rules, engine, catalogue, version=fingerprint, source_fingerprint=fingerprint, params=params)
+
+BUILD_DEFAULTS = {name: p.default for name, p in inspect.signature(build_model).parameters.items() if p.default is not p.empty}
+
+def save_bundle(model, output_dir='artifacts'):
+    """Write ``model`` to ``output_dir/<version>`` and point ``CURRENT`` at it; safe with concurrent writers."""
+    # The random suffix keeps two builds of the same data in the same second apart
+    version = f"{model.source_fingerprint}-{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    bundle_dir = os.path.join(output_dir, version)
+    os.makedirs(output_dir, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=f'.{version}.', dir=output_dir)
+    os.chmod(tmp_dir, 0o755)
+    engine = model.engine
+    similarity = sparse.csr_matrix(engine.similarity)
+    arrays = {
+        'users': np.array(engine.users, dtype=str),
+        'items': np.array(engine.items, dtype=str),
+        'neighbours_indptr': similarity.indptr.astype(index_dtype(similarity.nnz)),
+        'neighbours_indices': similarity.indices.astype(np.int32),
+        'neighbours_data': similarity.data.astype(np.float32),
+        'owned_indptr': engine.owned.indptr.astype(index_dtype(engine.owned.nnz)),
+        'owned_indices': engine.owned.indices.astype(np.int32),
+        'owned_data': engine.owned.data.astype(np.float32),
+    }
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp_dir, f'{name}.npy'), array)
+    np.savez_compressed(os.path.join(tmp_dir, 'rules.npz'), **model.rules.to_arrays())
+    with open(os.path.join(tmp_dir, 'catalogue.json'), 'w') as f:
+        json.dump({sub_cat: list(products) for sub_cat, products in model.catalogue.ranked().items()}, f)
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'version': version,
+        'source_fingerprint': model.source_fingerprint,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'params': model.params,
+        'per_category': model.catalogue.per_category,
+    }
+    with open(os.path.join(tmp_dir, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_dir, bundle_dir)
+    _write_pointer(output_dir, version)
+    return bundle_dir
+
+def _write_pointer(output_dir, version):
+    fd, tmp_path = tempfile.mkstemp(prefix=CURRENT + '.', suffix='.tmp', dir=output_dir)
+    with os.fdopen(fd, 'w') as f:
+        f.write(version)
+    os.replace(tmp_path, os.path.join(output_dir, CURRENT))
+
+def current_bundle(output_dir='artifacts'):
+    try:
+        with open(os.path.join(output_dir, CURRENT)) as f:
+            return os.path.join(output_dir, f.read().strip())
+    except FileNotFoundError:
+        return None
+
+def read_manifest(bundle_dir, fingerprint=None):
+    """Return the bundle manifest, or None if the bundle is incomplete, outdated or stale."""
+    try:
+        with open(os.path.join(bundle_dir, MANIFEST)) as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if manifest.get('format_version') != FORMAT_VERSION:
+        return None
+    if fingerprint is not None and manifest.get('source_fingerprint') != fingerprint:
+        return None
+    required = [f'{name}.npy' for name in ARRAY_FILES] + ['rules.npz', 'catalogue.json']
+    if not all(os.path.exists(os.path.join(bundle_dir, name)) for name in required):
+        return None
+    return manifest
+
+def load_bundle(bundle_dir, fingerprint=None, mmap=True):
+    """Load a bundle, or return None if it is not valid for ``fingerprint``.
+
+    With ``mmap`` the neighbour and ownership arrays stay memory-mapped read-only,
+    so every worker process that loads the same bundle shares one physical copy
+    through the page cache.
+    """
+    manifest = read_manifest(bundle_dir, fingerprint)
+    if manifest is None:
+        return None
+    mmap_mode = 'r' if mmap else None
+    arrays = {name: np.load(os.path.join(bundle_dir, f'{name}.npy'), mmap_mode=mmap_mode) for name in ARRAY_FILES}
+    users, items = np.asarray(arrays['users']), np.asarray(arrays['items'])
+    neighbours = NeighbourIndex(arrays['neighbours_indptr'], arrays['neighbours_indices'], arrays['neighbours_data'], users)
+    owned = sparse.csr_matrix((arrays['owned_data'], arrays['owned_indices'], arrays['owned_indptr']), shape=(len(users), len(items)), copy=False)
+    engine = CFEngine(neighbours.matrix, owned, users, items)
+    with np.load(os.path.join(bundle_dir, 'rules.npz')) as rule_arrays:
+        rules = RuleIndex(**rule_arrays)
+    with open(os.path.join(bundle_dir, 'catalogue.json')) as f:
+        catalogue = PopularCatalogue(json.load(f), per_category=manifest['per_category'], version=manifest['source_fingerprint'])
+    return ModelBundle(rules, engine, catalogue, version=manifest['version'], source_fingerprint=manifest['source_fingerprint'],
+                       params=manifest['params'], path=os.path.abspath(bundle_dir))
+
+def params_mismatch(model, params):
+    """Requested settings that ``model`` was not built with, as ``{name: (built, requested)}``.
+
+    Only settings given in ``params`` are compared; ``block_size`` trades memory
+    for speed and never changes the model. Bundles from before a setting existed
+    count as built with its default.
+    """
+    built = {**BUILD_DEFAULTS, **model.params}
+    return {name: (built.get(name), value) for name, value in params.items()
+            if name != 'block_size' and built.get(name) != value}
+
+def load_or_build_model(artifacts_dir, data_path, **params):
+    """Load the current bundle if it matches ``data_path`` and ``params``; otherwise build from the CSV."""
+    fingerprint = data_fingerprint(data_path) if os.path.exists(data_path) else None
+    bundle_dir = current_bundle(artifacts_dir)
+    if bundle_dir is not None:
+        model = load_bundle(bundle_dir, fingerprint)
+        if model is not None:
+            mismatch = params_mismatch(model, params)
+            if not mismatch:
+                return model
+            warnings.warn(f"{bundle_dir} was built with other settings {mismatch} (built, requested); building from {data_path}")
+    return build_model(data_path, **params)
+
+def reload_if_changed(model, artifacts_dir, data_path, **params):
+    """Return the bundle ``CURRENT`` points at if it differs from ``model`` and matches ``params``, else None."""
+    bundle_dir = current_bundle(artifacts_dir)
+    if bundle_dir is None or (model is not None and model.path == os.path.abspath(bundle_dir)):
+        return None
+    fingerprint = data_fingerprint(data_path) if os.path.exists(data_path) else None
+    new_model = load_bundle(bundle_dir, fingerprint)
+    if new_model is not None and params_mismatch(new_model, params):
+        warnings.warn(f"not swapping in {bundle_dir}: built with other settings {params_mismatch(new_model, params)} (built, requested)")
+        return None
+    return new_model
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the recommendation model artifact bundle.")
+    parser.add_argument('command', choices=['build'])
+    parser.add_argument('--data', default='data/raw/train.csv')
+    parser.add_argument('--out', default='artifacts')
+    parser.add_argument('--neighbours', type=int, default=50)
+    parser.add_argument('--block-size', type=int, default=1024)
+    parser.add_argument('--method', choices=sorted(NEIGHBOUR_METHODS), default='exact', help="exact cosine or MinHash/LSH approximate neighbours")
+    parser.add_argument('--min-support', type=float, default=0.001)
+    parser.add_argument('--min-lift', type=float, default=1.5)
+    args = parser.parse_args(argv)
+    start = time.perf_counter()
+    model = build_model(args.data, k=args.neighbours, block_size=args.block_size, min_support=args.min_support, min_lift=args.min_lift, method=args.method)
+    bundle_dir = save_bundle(model, args.out)
+    print(f"Wrote {bundle_dir} in {time.perf_counter() - start:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Rolling-origin backtests and grid search for the STL + ARIMA forecaster.
+
+For every cutoff the monthly series is cut at the cutoff and decomposed with STL
+on the training window only. ARIMA is fit on the training residual and the
+polynomial trend on the training trend, and the next ``horizon`` months are
+predicted with ``forecasting.predict_months``. Every
+(ARIMA order, cutoff) pair is one job in a process pool. Trend degrees are
+cheap and are all scored inside the job that fit the ARIMA model they share.
+Fitted ARIMA models are pickled under ``cache_dir``, keyed by a hash of the
+training window, order and cutoff. Usage::
+
+    python -m src.backtesting --workers 4 --max-seconds 300
+"""
+import argparse
+import hashlib
+import os
+import pickle
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import product
+import numpy as np
+import pandas as pd
+from numpy.polynomial.polynomial import Polynomial
+from statsmodels.tsa.arima.model import ARIMA
+from .data_preprocessing import decompose_monthly, load_data, monthly_sales
+from .forecasting import evaluate_forecast, predict_months
+
+DEFAULT_ORDERS = [(1, 0, 0), (2, 0, 2), (4, 0, 4)]
+DEFAULT_TREND_DEGS = [1, 2, 3]
+MIN_TRAIN_MONTHS = 24
+
+def series_hash(series):
+    digest = hashlib.sha1()
+    digest.update(np.ascontiguousarray(series.index.asi8).tobytes())
+    digest.update(np.ascontiguousarray(series.to_numpy(dtype='float64')).tobytes())
+    return digest.hexdigest()[:16]
+
+def default_cutoffs(series, n_cutoffs=3, horizon=6):
+    """The last ``n_cutoffs`` month ends that leave ``horizon`` months to test, ``horizon`` apart."""
+    positions = [len(series) - 1 - horizon * (i + 1) for i in range(n_cutoffs)]
+    return [series.index[p] for p in sorted(positions) if p + 1 >= MIN_TRAIN_MONTHS]
+
+def _model_path(cache_dir, key, order, cutoff):
+    return os.path.join(cache_dir, f"{key}-arima{''.join(map(str, order))}-{cutoff:%Y%m}.pkl")
+
+def fit_residual_model(train_df, order, cache_path=None):
+    """ARIMA on the training residual; returns ``(model, cached)``."""
+    if cache_path is not None and os.path.exists(cache_path):
+        with open(cache_path, 'rb') as f:
+            return pickle.load(f), True
+    model = ARIMA(train_df['Resid'].dropna(), order=order, freq='ME').fit()
+    if cache_path is not None:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = cache_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(model, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    return model, False
+
+def forecast_frame(train_df, actual, arima_model, poly_model):
+    """``actual`` sales and the forecast for the same months, which must directly follow ``train_df``."""
+    months = pd.date_range(train_df.index[-1], periods=len(actual) + 1, freq='ME')[1:]
+    if not months.equals(actual.index):
+        raise ValueError(f"actual months {list(actual.index)} do not follow the training window ending {train_df.index[-1]}")
+    pred = predict_months(train_df, arima_model, poly_model, len(actual))
+    return pd.DataFrame({'Sales': actual.to_numpy(), 'Pred': pred}, index=months)
+
+def backtest_job(series, cutoff, order, trend_degs, horizon=6, cache_dir=None):
+    """Score every trend degree for one (order, cutoff); returns one row per degree."""
+    start = time.perf_counter()
+    train = series[:cutoff]
+    train_df = decompose_monthly(train)
+    actual = series[series.index > cutoff].iloc[:horizon]
+    # Keyed on the training window only, so months appended later keep earlier cutoffs' fits valid
+    cache_path = None if cache_dir is None else _model_path(cache_dir, series_hash(train), order, cutoff)
+    arima_model, cached = fit_residual_model(train_df, order, cache_path)
+    seconds = time.perf_counter() - start
+    rows = []
+    for trend_deg in trend_degs:
+        poly_model = Polynomial.fit(np.arange(len(train_df)), train_df['Trend'], deg=trend_deg)
+        r2, mape, rmse = evaluate_forecast(forecast_frame(train_df, actual, arima_model, poly_model), verbose=False)
+        rows.append({'order': order, 'trend_deg': trend_deg, 'cutoff': cutoff, 'r2': r2, 'mape': mape, 'rmse': rmse,
+                     'cached': cached, 'seconds': seconds})
+    return rows
+
+def run_backtests(series, orders=DEFAULT_ORDERS, trend_degs=DEFAULT_TREND_DEGS, cutoffs=None, horizon=6,
+                  workers=1, cache_dir='.cache/forecast_models', max_seconds=None):
+    """Per-cutoff scores for the whole grid, and the (order, cutoff) jobs skipped by ``max_seconds``.
+
+    Jobs still queued when the time budget runs out are cancelled rather than
+    awaited, so a run takes roughly ``max_seconds`` plus the fits in flight.
+    """
+    cutoffs = default_cutoffs(series, horizon=horizon) if cutoffs is None else list(cutoffs)
+    jobs = list(product(orders, cutoffs))
+    deadline = None if max_seconds is None else time.monotonic() + max_seconds
+    rows, skipped = [], []
+    if workers <= 1:
+        for order, cutoff in jobs:
+            if deadline is not None and time.monotonic() > deadline:
+                skipped.append((order, cutoff))
+                continue
+            rows.extend(backtest_job(series, cutoff, order, trend_degs, horizon, cache_dir))
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        try:
+            futures = {pool.submit(backtest_job, series, cutoff, order, trend_degs, horizon, cache_dir): (order, cutoff)
+                       for order, cutoff in jobs}
+            pending = set(futures)
+            while pending:
+                timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+                done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    rows.extend(future.result())
+                if not done:
+                    skipped.extend(futures[future] for future in pending)
+                    break
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+    columns = ['order', 'trend_deg', 'cutoff', 'r2', 'mape', 'rmse', 'cached', 'seconds']
+    return pd.DataFrame(rows, columns=columns), skipped
+
+def leaderboard(scores):
+    """Mean R2, MAPE and RMSE per (order, trend degree) over the cutoffs, best RMSE first."""
+    board = (
+        scores.groupby(['order', 'trend_deg'])
+        .agg(r2=('r2', 'mean'), mape=('mape', 'mean'), rmse=('rmse', 'mean'), cutoffs=('cutoff', 'nunique'))
+        .reset_index()
+        .sort_values(['rmse', 'mape'])
+        .reset_index(drop=True)
+    )
+    return board
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rolling-origin backtest of the STL + ARIMA sales forecaster.")
+    parser.add_argument('--data', default='data/raw/train.csv')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--horizon', type=int, default=6)
+    parser.add_argument('--cutoffs', type=int, default=3, help="number of rolling origins")
+    parser.add_argument('--max-seconds', type=float, default=None, help="time budget; unfinished jobs are skipped")
+    parser.add_argument('--cache-dir', default='.cache/forecast_models')
+    args = parser.parse_args(argv)
+    series = monthly_sales(load_data(args.data, columns=['Sales']))
+    start = time.perf_counter()
+    scores, skipped = run_backtests(series, cutoffs=default_cutoffs(series, args.cutoffs, args.horizon), horizon=args.horizon,
+                                    workers=args.workers, cache_dir=args.cache_dir, max_seconds=args.max_seconds)
+    print(leaderboard(scores).to_string(index=False))
+    print(f"{len(scores)} scores ({int(scores['cached'].sum())} from cached models) in {time.perf_counter() - start:.1f}s"
+          + (f", {len(skipped)} jobs skipped by the time budget" if skipped else ""))
+
+if __name__ == "__main__":
+    main()
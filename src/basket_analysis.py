@@ -1,71 +1,165 @@
+import argparse
+import time
 import networkx as nx
 import pandas as pd
-from mlxtend.frequent_patterns import apriori, association_rules
-from mlxtend.preprocessing import TransactionEncoder
+from .baskets import BasketStore, as_baskets
+from .data_preprocessing import customer_data, load_data
+from .mining import DEFAULT_ALGORITHM, mine_rules
 import seaborn as sns
-import matplotlib.pyplot as plt
 import os
+from concurrent.futures import ProcessPoolExecutor
+from matplotlib import colormaps
+from .rendering import Plot, emit
+from .utils import replacing_dir
 
-def basket_trend_analysis(customer_df, df, segment='Active (0-3 months)', min_support=0.002, min_confidence=0.6, output_path='data/processed'):
+# Item-set columns of mined itemsets and rules; stored as sorted lists in Parquet
+ITEMSET_COLUMNS = ['itemsets', 'antecedents', 'consequents']
+
+def _trend_rules(encoding, min_support, min_confidence, algorithm):
+    frequent_itemsets, rules = mine_rules(encoding, min_support, metric="confidence", min_threshold=min_confidence, algorithm=algorithm)
+    rules =  rules[(rules['confidence']>0.6)&(rules['lift']>2)].sort_values(by='support', ascending=False)
+    return frequent_itemsets, rules
+
+def basket_trend_analysis(customer_df, df, segment='Active (0-3 months)', min_support=0.002, min_confidence=0.6, output_path='data/processed', encoding=None, algorithm=DEFAULT_ALGORITHM):
     os.makedirs(output_path, exist_ok=True)
+    baskets = as_baskets(df)
+    if encoding is None:
+        encoding = baskets.to_encoding()
     segment_ids = customer_df[customer_df['Customer Segment'] == segment]['Customer Name'].unique()
-    segment_orders = df[df['Customer Name'].isin(segment_ids)].copy()
-    transactions = segment_orders['Items'].dropna().tolist()
-    te = TransactionEncoder()
-    te_ary = te.fit(transactions).transform(transactions)
-    transaction_df = pd.DataFrame(te_ary, columns=te.columns_)
-    frequent_itemsets = apriori(transaction_df, min_support=min_support, use_colnames=True)
-    rules = association_rules(frequent_itemsets, metric="confidence", min_threshold=min_confidence)
-    rules =  rules[(rules['confidence']>0.6)&(rules['lift']>2)].sort_values(by='support', ascending=False)
+    mask = baskets.keys['Customer Name'].isin(segment_ids)
+    frequent_itemsets, rules = _trend_rules(encoding.subset(mask.to_numpy()), min_support, min_confidence, algorithm)
     frequent_itemsets.to_csv(f"{output_path}/frequent_itemsets_{segment}.csv", index=False)
     rules.to_csv(f"{output_path}/basket_rules_{segment}.csv", index=False)
     return frequent_itemsets, rules
 
-def plot_association_network(rules, output_path='docs/visualizations', top_n=10):
-    top_rules = rules.sort_values(by='confidence', ascending=False).head(top_n)
+# The encoding every pool worker slices, sent once per worker by the pool initializer rather than once per group
+_shared_encoding = None
+
+def _share_encoding(encoding):
+    global _shared_encoding
+    _shared_encoding = encoding
+
+def _mine_group(rows, min_support, min_confidence, algorithm):
+    return _trend_rules(_shared_encoding.subset(rows), min_support, min_confidence, algorithm)
+
+def _with_keys(frames, keys, by):
+    frames = [frame.assign(**dict(zip(by, key)))[by + list(frame.columns)] for frame, key in zip(frames, keys)]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=by)
+
+def write_partitioned(frame, path, by):
+    """Write ``frame`` as a Parquet dataset partitioned by the ``by`` columns, replacing ``path`` atomically (see ``replacing_dir``)."""
+    frame = frame.assign(**{col: frame[col].map(sorted) for col in ITEMSET_COLUMNS if col in frame})
+    with replacing_dir(path) as tmp_path:
+        if len(frame):
+            frame.to_parquet(tmp_path, partition_cols=by, index=False, basename_template='part-{i}.parquet')
+
+def segment_basket_trends(customer_df, df, by=('Customer Segment',), min_support=0.002, min_confidence=0.6,
+                          output_path='data/processed/basket_trends', encoding=None, algorithm=DEFAULT_ALGORITHM, workers=1):
+    """``basket_trend_analysis`` for every group of baskets in one call: each lifecycle segment by default.
+
+    ``by`` columns come from the basket keys (e.g. ``Region`` from
+    ``BasketStore.from_orders(df, key_cols=['Region'])``) or per customer from
+    ``customer_df``. One encoding is sliced with each group's rows, and groups
+    are mined in a pool of ``workers`` processes. Itemsets and rules are written
+    to ``output_path/frequent_itemsets`` and ``output_path/rules`` as Parquet
+    datasets partitioned by ``by``. Returns both with the ``by`` columns.
+    """
+    baskets = as_baskets(df)
+    if encoding is None:
+        encoding = baskets.to_encoding()
+    by = list(by)
+    per_customer = customer_df.drop_duplicates('Customer Name').set_index('Customer Name')
+    groups = pd.DataFrame({col: baskets.keys[col] if col in baskets.keys else baskets.keys['Customer Name'].map(per_customer[col])
+                           for col in by})
+    jobs = [(key if isinstance(key, tuple) else (key,), rows) for key, rows in groups.groupby(by, observed=True, sort=True).indices.items()]
+    if workers <= 1:
+        results = [_trend_rules(encoding.subset(rows), min_support, min_confidence, algorithm) for _, rows in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_share_encoding, initargs=(encoding,)) as pool:
+            # Largest groups first, so a big segment does not start last
+            futures = {key: pool.submit(_mine_group, rows, min_support, min_confidence, algorithm)
+                       for key, rows in sorted(jobs, key=lambda job: -len(job[1]))}
+            results = [futures[key].result() for key, _ in jobs]
+    keys = [key for key, _ in jobs]
+    frequent_itemsets = _with_keys([itemsets for itemsets, _ in results], keys, by)
+    rules = _with_keys([rules for _, rules in results], keys, by)
+    write_partitioned(frequent_itemsets, os.path.join(output_path, 'frequent_itemsets'), by)
+    write_partitioned(rules, os.path.join(output_path, 'rules'), by)
+    return frequent_itemsets, rules
+
+def load_basket_trends(output_path='data/processed/basket_trends', dataset='rules', filters=None):
+    """Read back a dataset written by ``segment_basket_trends``; ``filters`` (pyarrow style) prune partitions."""
+    frame = pd.read_parquet(os.path.join(output_path, dataset), filters=filters)
+    return frame.assign(**{col: frame[col].map(frozenset) for col in ITEMSET_COLUMNS if col in frame})
+
+def _draw_association_network(ax, edges, title):
     G = nx.DiGraph()
-    for _, row in top_rules.iterrows():
-        for antecedent in row['antecedents']:
-            for consequent in row['consequents']:
-                G.add_edge(antecedent, consequent, weight=row['lift'])
-    plt.figure(figsize=(12, 8))
+    for antecedent, consequent, lift in edges:
+        G.add_edge(antecedent, consequent, weight=lift)
     pos = nx.spring_layout(G, k=1.2, seed=42)
 
     # Node and edge settings
     node_sizes = [3000 for _ in G.nodes()]  # Bigger node circles
     edge_weights = [G[u][v]['weight'] for u, v in G.edges()]
 
-    nx.draw_networkx_edges(G, pos, edge_color=edge_weights, edge_cmap=plt.cm.Blues, width=2.5)
-    nx.draw_networkx_nodes(G, pos, node_size=node_sizes, node_color='skyblue', alpha=0.9)
+    nx.draw_networkx_edges(G, pos, edge_color=edge_weights, edge_cmap=colormaps['Blues'], width=2.5, ax=ax)
+    nx.draw_networkx_nodes(G, pos, node_size=node_sizes, node_color='skyblue', alpha=0.9, ax=ax)
 
     # Draw node labels with better font and offset
     labels = {node: str(node) for node in G.nodes()}
-    nx.draw_networkx_labels(G, pos, labels, font_size=10, font_weight='bold')
-
-    plt.title("Top Association Rules Network (by Confidence)", fontsize=14)
-    plt.axis('off')
-    plt.tight_layout()
-    plt.savefig(f"{output_path}/association_rules_network.png", dpi=300)
-    plt.close()
-
-def plot_basket_distribution(df, output_path='docs/visualizations/basket_distribution.png'):
-    plt.figure(figsize=(8,6))
-    sns.histplot(df['Count'], bins=20, kde=True,)
-    plt.title("Basket Size Distribution", fontsize=16)
-    plt.xlabel("Number of Items in Basket", fontsize=14)
-    plt.ylabel("Frequency", fontsize=14)
-    plt.savefig(output_path)
-    plt.close()
-
-def plot_average_basket_with_time(df, output_path='docs/visualizations/average_basket.png'):
+    nx.draw_networkx_labels(G, pos, labels, font_size=10, font_weight='bold', ax=ax)
+
+    ax.set_title(title, fontsize=14)
+    ax.axis('off')
+
+def plot_association_network(rules, output_path='docs/visualizations', top_n=10, plots=None):
+    top_rules = rules.sort_values(by='confidence', ascending=False).head(top_n)
+    edges = [(antecedent, consequent, row['lift'])
+             for _, row in top_rules.iterrows()
+             for antecedent in row['antecedents']
+             for consequent in row['consequents']]
+    emit(plots, Plot(f"{output_path}/association_rules_network.png", _draw_association_network, figsize=(12, 8), dpi=300,
+                     edges=edges, title="Top Association Rules Network (by Confidence)"))
+
+def _draw_basket_distribution(ax, counts):
+    sns.histplot(counts, bins=20, kde=True, ax=ax)
+    ax.set_title("Basket Size Distribution", fontsize=16)
+    ax.set_xlabel("Number of Items in Basket", fontsize=14)
+    ax.set_ylabel("Frequency", fontsize=14)
+
+def plot_basket_distribution(df, output_path='docs/visualizations/basket_distribution.png', plots=None):
+    emit(plots, Plot(output_path, _draw_basket_distribution, figsize=(8, 6), tight_layout=False, counts=df['Count']))
+
+def _draw_average_basket(ax, monthly_basket_size):
+    sns.lineplot(data=monthly_basket_size, x='Month', y='Count', marker='o', ax=ax)
+    ax.set_title("Average Basket Size Over Time", fontsize=16)
+    ax.set_xlabel("Month", fontsize=14)
+    ax.set_ylabel("Average Basket Size", fontsize=14)
+    ax.tick_params(axis='x', labelrotation=45)
+
+def plot_average_basket_with_time(df, output_path='docs/visualizations/average_basket.png', plots=None):
     df['Month']=df['Order Date'].dt.to_period('M')
     monthly_basket_size = df.groupby(df['Month'])['Count'].mean().reset_index()
     monthly_basket_size['Month'] = monthly_basket_size['Month'].dt.to_timestamp()
-    plt.figure(figsize=(10, 6))
-    sns.lineplot(data=monthly_basket_size, x='Month', y='Count', marker='o')
-    plt.title("Average Basket Size Over Time", fontsize=16)
-    plt.xlabel("Month", fontsize=14)
-    plt.ylabel("Average Basket Size", fontsize=14)
-    plt.xticks(rotation=45)
-    plt.savefig(output_path)
-    plt.close()
\ No newline at end of file
+    emit(plots, Plot(output_path, _draw_average_basket, figsize=(10, 6), tight_layout=False, monthly_basket_size=monthly_basket_size))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Basket trend rules for every customer segment, or segment x order column.")
+    parser.add_argument('--data', default='data/raw/train.csv')
+    parser.add_argument('--by', default='Customer Segment', help="comma-separated grouping columns, e.g. 'Region,Customer Segment'")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--min-support', type=float, default=0.002)
+    parser.add_argument('--out', default='data/processed/basket_trends')
+    args = parser.parse_args(argv)
+    by = args.by.split(',')
+    df = load_data(args.data)
+    customer_df = customer_data(df)
+    # Columns the customer table lacks are per order, so they become basket keys
+    baskets = BasketStore.from_orders(df, key_cols=[col for col in by if col not in customer_df.columns])
+    start = time.perf_counter()
+    frequent_itemsets, rules = segment_basket_trends(customer_df, baskets, by=by, min_support=args.min_support, output_path=args.out, workers=args.workers)
+    print(f"Wrote {len(frequent_itemsets)} itemsets and {len(rules)} rules under {args.out} in {time.perf_counter() - start:.1f}s")
+    print(rules.groupby(by, observed=True).size().rename('rules').to_string())
+
+if __name__ == "__main__":
+    main()
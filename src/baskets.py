@@ -0,0 +1,138 @@
+"""Baskets as integer item codes plus offsets (CSR layout) over a shared vocabulary.
+
+A ``BasketStore`` holds one row per basket key (order date and customer, as in
+``items_data``), an ``indptr`` array of offsets and the item codes of every
+order line. The item vocabulary is a sorted ``pd.Index`` (sub-categories by
+default, or product names). Stores built with the same vocabulary share codes,
+so encodings and per-customer matrices line up column for column. Basket
+sizes, per-customer rollups and sparse matrices come straight from the codes;
+Python lists are only built by ``lists``/``to_frame`` for legacy consumers.
+"""
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from .mining import TransactionEncoding
+
+def vocabulary(values):
+    """Sorted item vocabulary of ``values`` (categories of a categorical, else the distinct labels)."""
+    values = pd.Series(values)
+    labels = values.cat.categories if isinstance(values.dtype, pd.CategoricalDtype) else values.dropna().unique()
+    return pd.Index(np.sort(np.asarray(labels, dtype=str)), name='Item')
+
+def item_codes(values, items):
+    """Codes of ``values`` in the vocabulary ``items``, -1 for labels outside it."""
+    values = pd.Series(values)
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        lookup = np.append(items.get_indexer(values.cat.categories.astype(str)), -1)
+        return lookup[values.cat.codes.to_numpy()].astype(np.int32)
+    return items.get_indexer(values.astype(str)).astype(np.int32)
+
+class BasketStore:
+    def __init__(self, keys, indptr, codes, items):
+        self.keys = keys
+        self.indptr = indptr
+        self.codes = codes
+        self.items = items
+
+    @classmethod
+    def from_orders(cls, df, item_col='Sub-Category', customer_col='Customer Name', items=None, key_cols=()):
+        """Daily baskets of ``df`` (date index): one per (date, customer), in ``items_data`` order.
+
+        Lines keep their file order within a basket. ``items`` fixes the
+        vocabulary, e.g. to share codes with another store; labels outside it
+        are dropped. ``key_cols`` are order columns (e.g. ``Region``) added to
+        the keys, taken from each basket's first line.
+        """
+        items = vocabulary(df[item_col]) if items is None else pd.Index(items)
+        customer, customers = pd.factorize(df[customer_col], sort=True)
+        dates = df.index.asi8
+        order = np.lexsort((customer, dates))
+        customer, dates = customer[order], dates[order]
+        codes = item_codes(df[item_col], items)[order]
+        new_basket = np.ones(len(order), dtype=bool)
+        new_basket[1:] = (dates[1:] != dates[:-1]) | (customer[1:] != customer[:-1])
+        starts = np.flatnonzero(new_basket)
+        keys = pd.DataFrame({'Order Date': pd.DatetimeIndex(dates[starts]),
+                             customer_col: pd.Categorical.from_codes(customer[starts], customers),
+                             **{col: df[col].iloc[order[starts]].reset_index(drop=True) for col in key_cols}})
+        return cls(keys, np.append(starts, len(order)).astype(np.int64), codes, items).drop_unknown()
+
+    @classmethod
+    def from_items(cls, items_df, customer_col='Customer Name', items_col='Items', items=None):
+        """Store for an ``items_data``-style frame of item lists."""
+        lists = items_df[items_col].tolist()
+        sizes = np.fromiter((len(basket) for basket in lists), dtype=np.int64, count=len(lists))
+        flat = np.array([item for basket in lists for item in basket], dtype=str)
+        items = pd.Index(np.unique(flat), name='Item') if items is None else pd.Index(items)
+        keys = items_df.drop(columns=[items_col, 'Count'], errors='ignore').reset_index(drop=True)
+        indptr = np.zeros(len(lists) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=indptr[1:])
+        return cls(keys, indptr, item_codes(flat, items), items).drop_unknown()
+
+    def drop_unknown(self):
+        """The store without lines whose item is not in the vocabulary (code -1)."""
+        known = self.codes >= 0
+        if known.all():
+            return self
+        line_basket = np.repeat(np.arange(len(self)), self.sizes())
+        indptr = np.zeros(len(self) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(line_basket[known], minlength=len(self)), out=indptr[1:])
+        return BasketStore(self.keys, indptr, self.codes[known], self.items)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def sizes(self):
+        """Lines per basket (the ``Count`` column of ``items_data``)."""
+        return np.diff(self.indptr)
+
+    def basket(self, i):
+        return list(self.items[self.codes[self.indptr[i]:self.indptr[i + 1]]])
+
+    def subset(self, rows):
+        """Store of the selected baskets (boolean mask or positions), same vocabulary."""
+        rows = np.flatnonzero(rows) if np.asarray(rows).dtype == bool else np.asarray(rows, dtype=np.int64)
+        sizes = self.sizes()[rows]
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=indptr[1:])
+        lines = np.repeat(self.indptr[rows] - indptr[:-1], sizes) + np.arange(indptr[-1])
+        return BasketStore(self.keys.iloc[rows].reset_index(drop=True), indptr, self.codes[lines], self.items)
+
+    def to_sparse(self, binary=True):
+        """Baskets x items CSR matrix of line counts, or of presence with ``binary``."""
+        # copy: sum_duplicates sorts the index arrays in place, and they are the store's own
+        matrix = sparse.csr_matrix((np.ones(len(self.codes), dtype=np.int32), self.codes, self.indptr), shape=(len(self), len(self.items)), copy=True)
+        matrix.sum_duplicates()
+        return (matrix > 0).astype(bool) if binary else matrix
+
+    def to_encoding(self):
+        """One-hot ``TransactionEncoding`` for the miners, without building item lists."""
+        return TransactionEncoding(self.to_sparse(), self.items)
+
+    def customer_matrix(self, customer_col='Customer Name', binary=True):
+        """``(customers, matrix)``: sorted customer labels and a customers x items CSR rollup of their baskets."""
+        customer, customers = pd.factorize(self.keys[customer_col], sort=True)
+        line_customer = np.repeat(customer, self.sizes())
+        matrix = sparse.csr_matrix((np.ones(len(self.codes), dtype=np.int32), (line_customer, self.codes)),
+                                   shape=(len(customers), len(self.items)))
+        customers = pd.Index(np.asarray(customers, dtype=object), name=customer_col)
+        return customers, (matrix > 0).astype(bool) if binary else matrix
+
+    def summary(self):
+        """Basket keys with their ``Count``, for plots that need sizes but not items."""
+        return self.keys.assign(Count=self.sizes())
+
+    def lists(self):
+        items = np.asarray(self.items, dtype=object)[self.codes]
+        return [list(basket) for basket in np.split(items, self.indptr[1:-1])]
+
+    def to_frame(self):
+        """``items_data``-style frame with an ``Items`` list column and plain string keys."""
+        keys = self.keys.astype({column: object for column, dtype in self.keys.dtypes.items() if isinstance(dtype, pd.CategoricalDtype)})
+        return keys.assign(Items=self.lists(), Count=self.sizes())
+
+def as_baskets(items, customer_col='Customer Name', items_col='Items'):
+    """``items`` as a ``BasketStore``, converting an ``items_data``-style frame if needed."""
+    if isinstance(items, BasketStore):
+        return items
+    return BasketStore.from_items(items, customer_col, items_col)
@@ -0,0 +1,100 @@
+"""Offline bulk scoring of a JSONL file of recommendation requests.
+
+Each input line is a request object (``customer_name``, optional ``cart``,
+``category`` and ``per_category``); each output line is ``{"customer_name": ...,
+"recommendations": [...]}`` in input order. Usage::
+
+    python -m src.batch_scoring requests.jsonl -o results.jsonl --workers 4
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from .artifacts import load_bundle, load_or_build_model, save_bundle
+from .recommendation import recommend_many
+
+_model = None
+
+def read_requests(lines):
+    for line in lines:
+        line = line.strip()
+        if line:
+            request = json.loads(line)
+            if 'customer_name' not in request:
+                raise ValueError(f"request without customer_name: {line}")
+            yield request
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+def score_chunk(requests, model=None):
+    model = model or _model
+    results = recommend_many(requests, model.rules, model.engine, model.catalogue)
+    return [{'customer_name': r['customer_name'], 'recommendations': rec} for r, rec in zip(requests, results)]
+
+def _init_worker(bundle_dir):
+    global _model
+    _model = load_bundle(bundle_dir)
+
+def score_file(lines, out, model, workers=1, chunk_size=2000):
+    """Stream scored results for ``lines`` to ``out``; returns the number of requests."""
+    chunks = chunked(read_requests(lines), chunk_size)
+    if workers <= 1:
+        results = (score_chunk(chunk, model) for chunk in chunks)
+        return _write(results, out)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Workers share the model through a memory-mapped bundle instead of each rebuilding it
+        bundle_dir = model.path or save_bundle(model, tmp_dir)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(bundle_dir,)) as pool:
+            return _write(_in_order(pool, chunks, window=2 * workers), out)
+
+def _in_order(pool, chunks, window):
+    """Scored chunks in input order, with at most ``window`` submitted ahead; ``pool.map`` would read all input up front."""
+    pending = deque()
+    for chunk in chunks:
+        if len(pending) >= window:
+            yield pending.popleft().result()
+        pending.append(pool.submit(score_chunk, chunk))
+    while pending:
+        yield pending.popleft().result()
+
+def _write(results, out):
+    count = 0
+    for chunk in results:
+        for result in chunk:
+            out.write(json.dumps(result) + '\n')
+        count += len(chunk)
+    return count
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a JSONL file of recommendation requests.")
+    parser.add_argument('input', help="JSONL file of requests, or - for stdin")
+    parser.add_argument('-o', '--output', default='-', help="JSONL output file, or - for stdout")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--chunk-size', type=int, default=2000)
+    parser.add_argument('--data', default='data/raw/train.csv')
+    parser.add_argument('--artifacts', default='artifacts')
+    args = parser.parse_args(argv)
+    model = load_or_build_model(args.artifacts, args.data)
+    start = time.perf_counter()
+    src = sys.stdin if args.input == '-' else open(args.input)
+    out = sys.stdout if args.output == '-' else open(args.output, 'w')
+    try:
+        count = score_file(src, out, model, workers=args.workers, chunk_size=args.chunk_size)
+    finally:
+        if src is not sys.stdin:
+            src.close()
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.perf_counter() - start
+    print(f"Scored {count} requests in {elapsed:.2f}s ({count / max(elapsed, 1e-9):.0f}/s)", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -1,43 +1,58 @@
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
 import seaborn as sns
 import os
+from .data_preprocessing import LIFECYCLE_LABELS
+from .rendering import Plot, draw_frame, emit
 
-def plot_churn_rate_by_segment(df, output_path='docs/visualizations'):
-    total_customers = df.groupby('Segment')['Customer ID'].nunique()
-    lost_customers = df[df['Customer Segment'] == 'Lost (>12 months)'].groupby('Segment')['Customer ID'].nunique()
-    churn_rate = (lost_customers / total_customers * 100).sort_index()
-    plt.figure(figsize=(8, 5))
-    sns.barplot(x=churn_rate.index, y=churn_rate.values, palette='Reds_d', hue=churn_rate.index, legend=False)
-    plt.title("Churn Rate by Segment (Lost >12 Months)")
-    plt.ylabel("Churn Rate (%)")
-    plt.xlabel("Customer Segment")
-    plt.ylim(0, churn_rate.max() * 1.2)
-    plt.tight_layout()
-    filename = os.path.join(output_path, 'churn_rate_by_segment.png')
-    plt.savefig(filename)
-    plt.close()
+LOST = LIFECYCLE_LABELS[-1]
+
+def lost_mask(customers):
+    lifecycle = customers['Customer Segment'].cat
+    return lifecycle.codes.to_numpy() == lifecycle.categories.get_loc(LOST)
+
+def churn_rate_by_segment(customers):
+    """Percentage of each segment's customers that are lost, from a per-customer table."""
+    segment = customers['Segment'].cat
+    codes = segment.codes.to_numpy()
+    total = np.bincount(codes, minlength=len(segment.categories))
+    lost = np.bincount(codes, weights=lost_mask(customers), minlength=len(segment.categories))
+    observed = total > 0
+    return pd.Series(lost[observed] / total[observed] * 100, index=pd.Index(segment.categories[observed], name='Segment'))
+
+def churn_trend(customers):
+    """Lost customers per month of their last purchase, zero-filled between the first and last such month."""
+    months = customers['Last Purchase'].array.asi8[lost_mask(customers)]
+    if len(months) == 0:
+        return pd.Series(dtype='int64', index=pd.PeriodIndex([], freq='M', name='Last Purchase'))
+    counts = np.bincount(months - months.min())
+    index = pd.PeriodIndex.from_ordinals(np.arange(len(counts)) + months.min(), freq='M')
+    return pd.Series(counts, index=index.rename('Last Purchase'))
+
+def _draw_churn_rate(ax, churn_rate):
+    sns.barplot(x=churn_rate.index, y=churn_rate.values, palette='Reds_d', hue=churn_rate.index, legend=False, ax=ax)
+    ax.set_title("Churn Rate by Segment (Lost >12 Months)")
+    ax.set_ylabel("Churn Rate (%)")
+    ax.set_xlabel("Customer Segment")
+    ax.set_ylim(0, churn_rate.max() * 1.2)
+
+def plot_churn_rate_by_segment(customers, output_path='docs/visualizations', plots=None):
+    churn_rate = churn_rate_by_segment(customers)
+    emit(plots, Plot(os.path.join(output_path, 'churn_rate_by_segment.png'), _draw_churn_rate, figsize=(8, 5), churn_rate=churn_rate))
     return churn_rate
 
+def _draw_purchase_distribution(ax, purchases):
+    sns.histplot(purchases, bins=20, kde=True, color='red', ax=ax)
+    ax.set_title("Distribution of Purchase Counts for Lost Customers")
+    ax.set_xlabel("Number of Purchases (before churn)")
+    ax.set_ylabel("Number of Customers")
+
+def plot_lost_customer_purchase_distribution(df, output_path='docs/visualizations', plots=None):
+    lost_df = df[lost_mask(df)]
+    emit(plots, Plot(f"{output_path}/lost_customers_purchase_distribution.png", _draw_purchase_distribution, figsize=(8, 5),
+                     purchases=lost_df['No of Purchases']))
 
-def plot_lost_customer_purchase_distribution(df, output_path='docs/visualizations'):
-    lost_df = df[df['Customer Segment'] == 'Lost (>12 months)']
-    plt.figure(figsize=(8, 5))
-    sns.histplot(lost_df['No of Purchases'], bins=20, kde=True, color='red')
-    plt.title("Distribution of Purchase Counts for Lost Customers")
-    plt.xlabel("Number of Purchases (before churn)")
-    plt.ylabel("Number of Customers")
-    plt.tight_layout()
-
-    plt.savefig(f"{output_path}/lost_customers_purchase_distribution.png")
-    plt.close()
-def plot_churn_trend(df, output_path='docs/visualizations'):
-    churn_trend = df[df['Customer Segment']=='Lost (>12 months)'].groupby('Last Purchase').size()
-    plt.figure(figsize=(8, 5))
-    churn_trend.plot(title='Churned Customers Over Time')
-    plt.title("Churn with time")
-    plt.xlabel("Time")
-    plt.ylabel("Number of Customers churned")
-    plt.tight_layout()
-    plt.savefig(f"{output_path}/churn_trend.png")
-    plt.close()
\ No newline at end of file
+def plot_churn_trend(df, output_path='docs/visualizations', plots=None):
+    trend = churn_trend(df)
+    emit(plots, Plot(f"{output_path}/churn_trend.png", draw_frame, figsize=(8, 5), frame=trend,
+                     title="Churn with time", xlabel="Time", ylabel="Number of Customers churned"))
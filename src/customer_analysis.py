@@ -1,30 +1,29 @@
 import pandas as pd
-import matplotlib.pyplot as plt
 import seaborn as sns
 import os
+from .rendering import Plot, emit
 
-def analyze_customer_pattern(df, output_path='docs/visualizations'):
+def _draw_segment_distribution(ax, seg_dist):
+    sns.barplot(x=seg_dist.index, y=seg_dist.values, palette='Blues_d', hue=seg_dist.index, legend=False, ax=ax)
+    ax.set_title("Customer Lifecycle Segment Distribution")
+    ax.set_ylabel("Percentage of Customers (%)")
+    ax.set_xlabel("Customer Segment")
+    ax.tick_params(axis='x', labelrotation=15)
+
+def analyze_customer_pattern(df, output_path='docs/visualizations', plots=None):
     seg_dist = df['Customer Segment'].value_counts(normalize=True).sort_index() * 100
-    plt.figure(figsize=(8, 5))
-    sns.barplot(x=seg_dist.index, y=seg_dist.values, palette='Blues_d', hue=seg_dist.index, legend=False)
-    plt.title("Customer Lifecycle Segment Distribution")
-    plt.ylabel("Percentage of Customers (%)")
-    plt.xlabel("Customer Segment")
-    plt.xticks(rotation=15)
-    plt.tight_layout()
-    file_path = os.path.join(output_path, 'customer_segment_distribution.png')
-    plt.savefig(file_path)
-    plt.close()
+    emit(plots, Plot(os.path.join(output_path, 'customer_segment_distribution.png'), _draw_segment_distribution, figsize=(8, 5), seg_dist=seg_dist))
     return seg_dist
 
-    
-def analyze_cohorts(cohort_counts, output_path='docs/visualizations/retention.png'):
+def _draw_retention(ax, retention, annot=True, ylabel="Cohort Year (First Purchase)", xlabel="Year Offset"):
+    sns.heatmap(retention, annot=annot, fmt=".0%", cmap="YlGnBu", ax=ax)
+    ax.set_title("Customer Retention by Cohort")
+    ax.set_ylabel(ylabel)
+    ax.set_xlabel(xlabel)
+
+def analyze_cohorts(cohort_counts, output_path='docs/visualizations/retention.png', plots=None):
+    """Retention per cohort from ``cohort_data`` counts (yearly, or monthly without cell labels)."""
     retention = cohort_counts.divide(cohort_counts[0], axis=0)
-    plt.figure(figsize=(10, 6))
-    sns.heatmap(retention, annot=True, fmt=".0%", cmap="YlGnBu")
-    plt.title("Customer Retention by Cohort")
-    plt.ylabel("Cohort Year (First Purchase)")
-    plt.xlabel("Year Offset")
-    plt.savefig(output_path)
-    plt.close()
+    labels = {} if cohort_counts.columns.name != 'Month Offset' else {'annot': False, 'ylabel': "Cohort Month (First Purchase)", 'xlabel': "Month Offset"}
+    emit(plots, Plot(output_path, _draw_retention, figsize=(10, 6), tight_layout=False, retention=retention, **labels))
     return retention
@@ -1,74 +1,176 @@
+import glob
+import os
+import numpy as np
 import pandas as pd
+from scipy import sparse
 from statsmodels.tsa.seasonal import STL
 from datetime import timedelta, datetime
-from .utils import encode_transactions
+from .baskets import BasketStore
 
-def load_data(file_path):
-    """Load and preprocess the retail dataset."""
-    df = pd.read_csv(file_path)
-    df['Order Date'] = pd.to_datetime(df['Order Date'], format='%d/%m/%Y')
+CATEGORICAL_COLUMNS = ['Segment', 'Region', 'Category', 'Sub-Category', 'Ship Mode', 'State', 'City']
+SCHEMA = {
+    **{column: 'category' for column in CATEGORICAL_COLUMNS},
+    'Row ID': 'int32',
+    'Postal Code': 'float32',
+    'Sales': 'float32',
+}
+DATE_FORMAT = '%d/%m/%Y'
+SCHEMA_VERSION = 1
+
+def _cache_path(file_path):
+    stat = os.stat(file_path)
+    cache_dir = os.path.join(os.path.dirname(os.path.abspath(file_path)), '.cache')
+    return os.path.join(cache_dir, f"{os.path.basename(file_path)}.v{SCHEMA_VERSION}.{stat.st_size}-{stat.st_mtime_ns}.parquet")
+
+def _read_csv(file_path, columns=None):
+    usecols = None if columns is None else ['Order Date', *columns]
+    df = pd.read_csv(file_path, usecols=usecols, dtype={k: v for k, v in SCHEMA.items() if usecols is None or k in usecols})
+    if usecols is not None:
+        df = df[usecols]
+    df['Order Date'] = pd.to_datetime(df['Order Date'], format=DATE_FORMAT)
     df.set_index('Order Date', inplace=True)
     df.sort_index(inplace=True)
     return df
 
+def _write_cache(df, cache_path):
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    for stale in glob.glob(cache_path.rsplit('.v', 1)[0] + '.v*.parquet'):
+        os.remove(stale)
+    tmp_path = cache_path + '.tmp'
+    df.reset_index().to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, cache_path)
+
+def load_data(file_path, columns=None, use_cache=True):
+    """Load and preprocess the retail dataset.
+
+    Columns are typed up front (categoricals for the low-cardinality labels, float32
+    Sales). ``columns`` restricts the load to what the caller needs; ``Order Date``
+    is always read and becomes the index. The full typed frame is cached as Parquet
+    in a ``.cache`` directory next to the CSV and reused until the CSV changes.
+    """
+    if not use_cache:
+        return _read_csv(file_path, columns)
+    cache_path = _cache_path(file_path)
+    if os.path.exists(cache_path):
+        df = pd.read_parquet(cache_path, columns=None if columns is None else ['Order Date', *columns])
+        return df.set_index('Order Date')
+    df = _read_csv(file_path)
+    _write_cache(df, cache_path)
+    return df if columns is None else df[list(columns)]
+
 def sales_data(df):
-    return pd.DataFrame({'sales':df.groupby(level=0)['Sales'].sum()})
-
-def order_data(df):
-    df['Order Year'] = df.index.to_period('Y')
-    first_purchase = df.groupby('Customer ID')['Order Year'].min().reset_index()
-    first_purchase.rename(columns={'Order Year':'First Purchase Year'}, inplace=True)
-    df2 = df.reset_index().copy()
-    df2 = df2.merge(first_purchase, on='Customer ID', how='left')
-    df2.set_index(keys='Order Date',inplace=True)
-    df['Order Month'] = df.index.to_period('M')
-    last_purchase = df.groupby('Customer ID')['Order Month'].max().reset_index()
-    last_purchase.rename(columns={'Order Month':'Last Purchase'}, inplace=True)
-    df2.reset_index(inplace=True)
-    df2 = df2.merge(last_purchase, on='Customer ID', how='left')
-    df2.set_index(keys='Order Date',inplace=True)
-    ref_date = pd.to_datetime('2019-1')
-    df2['Time passed'] = (ref_date.year - df2['Last Purchase'].dt.year) * 12 + (ref_date.month - df2['Last Purchase'].dt.month)
-    df2['No of purchases'] = df2.groupby('Customer ID')['Order ID'].transform('count')
-    bins = [0, 3, 6, 12, df2['Time passed'].max()]
-    labels = ['Active (0-3 months)', 'At Risk (3-6 months)', 'Churning (6-12 months)', 'Lost (>12 months)']
-    df2['Customer Segment'] = pd.cut(df2['Time passed'], bins=bins, labels=labels)
-    return df2
-
-def cohort_data(df):
-    df['Year Offset'] = df['Order Year'].dt.year - df['First Purchase Year'].dt.year
-    df_cohorts = df[df['First Purchase Year'].notna()]
-    cohort_counts = df_cohorts.groupby(['First Purchase Year', 'Year Offset'])['Customer ID'].nunique().unstack(fill_value=0)
-    cohort_counts = cohort_counts.sort_index()
+    return pd.DataFrame({'sales':df['Sales'].astype('float64').groupby(level=0).sum()})
+
+REF_DATE = '2019-01'
+LIFECYCLE_LABELS = ['Active (0-3 months)', 'At Risk (3-6 months)', 'Churning (6-12 months)', 'Lost (>12 months)']
+LIFECYCLE_COLUMNS = ['First Purchase Year', 'Last Purchase', 'Time passed', 'No of purchases', 'Customer Segment']
+
+def lifecycle(customers, ref_date=REF_DATE):
+    """Add lifecycle columns to a per-customer frame with ``First Purchase``/``Last Purchase`` dates."""
+    ref_date = pd.Period(ref_date, freq='M')
+    customers = customers.copy()
+    customers['First Purchase Year'] = customers.pop('First Purchase').dt.to_period('Y')
+    customers['Last Purchase'] = customers['Last Purchase'].dt.to_period('M')
+    customers['Time passed'] = (ref_date.year - customers['Last Purchase'].dt.year) * 12 + (ref_date.month - customers['Last Purchase'].dt.month)
+    bins = [0, 3, 6, 12, float('inf')]
+    # include_lowest: a purchase in the reference month itself (0 months) is Active
+    customers['Customer Segment'] = pd.cut(customers['Time passed'], bins=bins, labels=LIFECYCLE_LABELS, include_lowest=True)
+    return customers
+
+def customer_table(df, ref_date=REF_DATE, items=False):
+    """One row per customer from a single groupby pass over the orders.
+
+    Columns are name, segment, first purchase year, last purchase month, months
+    since the last purchase as of ``ref_date``, purchase count and lifecycle
+    bucket; with ``items`` also the list of purchased sub-categories.
+    """
+    orders = pd.DataFrame({'Order Date': df.index, **{c: df[c].to_numpy() for c in ['Customer ID', 'Customer Name', 'Segment', 'Sub-Category']}})
+    aggregations = {
+        'Customer Name': ('Customer Name', 'first'),
+        'Segment': ('Segment', 'first'),
+        'First Purchase': ('Order Date', 'min'),
+        'Last Purchase': ('Order Date', 'max'),
+        'No of purchases': ('Order Date', 'size'),
+    }
+    if items:
+        aggregations['Sub-Category'] = ('Sub-Category', list)
+    customers = orders.groupby('Customer ID', observed=True).agg(**aggregations)
+    customers['Segment'] = customers['Segment'].astype(df['Segment'].dtype)
+    return lifecycle(customers, ref_date)
+
+def order_data(df, ref_date=REF_DATE, customers=None):
+    """Order rows with ``Order Year`` and the customer's lifecycle columns; ``df`` is not modified."""
+    if customers is None:
+        customers = customer_table(df, ref_date)
+    orders = df.assign(**{'Order Year': df.index.to_period('Y')})
+    return orders.join(customers[LIFECYCLE_COLUMNS], on='Customer ID')
+
+COHORT_FREQS = {'Y': ('First Purchase Year', 'Year Offset'), 'M': ('First Purchase Month', 'Month Offset')}
+
+def period_codes(dates, freq='Y'):
+    """Integer period ordinals (as in ``Period.ordinal``) of datetimes, yearly or monthly."""
+    return pd.DatetimeIndex(dates).to_period(freq).asi8
+
+def cohort_data(df, freq='Y'):
+    """Distinct active customers per (first-purchase cohort, periods since the cohort), yearly or monthly.
+
+    Works on any order frame with a date index and ``Customer ID``. Customers
+    and periods become integer codes; the distinct (customer, period) pairs
+    come from a sparse matrix and the cohort counts from one ``bincount``.
+    """
+    if freq not in COHORT_FREQS:
+        raise ValueError(f"Unknown cohort frequency {freq!r}, expected one of {list(COHORT_FREQS)}")
+    cohort_name, offset_name = COHORT_FREQS[freq]
+    customer, _ = pd.factorize(df['Customer ID'])
+    period = period_codes(df.index, freq)
+    start = period.min()
+    period = period - start
+    active = sparse.csr_matrix((np.ones(len(period), dtype=np.int32), (customer, period)), shape=(customer.max() + 1, period.max() + 1))
+    active.sort_indices()
+    # Each customer's row holds their active periods in ascending order, so the first stored one is the cohort
+    first = active.indices[active.indptr[:-1]].astype(np.int64)
+    pair_customer, pair_period = active.nonzero()
+    cohort = first[pair_customer]
+    n = active.shape[1]
+    counts = np.bincount(cohort * n + (pair_period - cohort), minlength=n * n).reshape(n, n)
+    cohorts = np.flatnonzero(counts[:, 0])
+    offsets = np.arange(n - cohorts.min())
+    cohort_counts = pd.DataFrame(counts[np.ix_(cohorts, offsets)], index=pd.PeriodIndex.from_ordinals(cohorts + start, freq=freq), columns=offsets)
+    cohort_counts.index.name, cohort_counts.columns.name = cohort_name, offset_name
     return cohort_counts
 
-def customer_data(df):
-    df_customer = df.groupby('Customer ID')['Sub-Category'].agg(list).reset_index()
-    df_customer=df_customer.set_index(keys='Customer ID')
-    df_customer['No of Purchases']= df.groupby('Customer ID').size()
-    df_customer = df_customer.merge(df[['Customer Name', 'Segment','Customer Segment','Time passed','First Purchase Year','Last Purchase']].drop_duplicates(), 
-                                    on=df_customer.index, 
-                                    how='left')
-    df_customer=df_customer.rename(columns={'key_0':'Customer ID'})
-    df_customer=df_customer.set_index(keys='Customer ID')
-    return df_customer
+def customer_data(df, ref_date=REF_DATE, customers=None):
+    """Per-customer purchases and lifecycle; ``customers`` is a ``customer_table(..., items=True)``."""
+    if customers is None:
+        customers = customer_table(df, ref_date, items=True)
+    customers = customers.rename(columns={'No of purchases': 'No of Purchases'})
+    return customers[['Sub-Category', 'No of Purchases', 'Customer Name', 'Segment', 'Customer Segment', 'Time passed', 'First Purchase Year', 'Last Purchase']]
 
-def forecast_data(df):
-    sales_df = df.groupby(level=0)['Sales'].sum().resample('ME').sum().reset_index()
-    sales_df.set_index(keys='Order Date',inplace=True)
-    stl = STL(sales_df)
+def decompose_monthly(sales):
+    """STL trend/seasonal/residual and the 12-month seasonal difference of a monthly ``Sales`` series."""
+    sales_df = pd.DataFrame({'Sales': sales})
+    stl = STL(sales_df['Sales'])
     r = stl.fit()
     sales_df['Trend']=r.trend
     sales_df['Seasonal']=r.seasonal
     sales_df['Resid']=r.resid
     sales_df['Sales_S1'] = sales_df['Sales'].diff(12)
+    return sales_df
+
+def monthly_sales(df):
+    return df['Sales'].astype('float64').groupby(level=0).sum().resample('ME').sum()
+
+def monthly_sales_decomposition(df):
+    """Monthly sales with their STL trend/seasonal/residual and the 12-month seasonal difference."""
+    return decompose_monthly(monthly_sales(df))
+
+def forecast_data(df):
+    sales_df = monthly_sales_decomposition(df)
     train_df = sales_df[:datetime(2016,12,31)].copy()
     test_df = sales_df[datetime(2016,12,31)+timedelta(days=1):].copy()
     return train_df, test_df
 
 def items_data(df):
-    items_df=df.groupby([df.index,'Customer Name'])['Sub-Category'].agg(list).reset_index()
-    items_df = items_df.rename(columns={'Sub-Category':'Items'})
-    items_df['Count'] = items_df['Items'].apply(lambda x:len(x))
-    return items_df
+    """Daily baskets with an ``Items`` list column; ``BasketStore.from_orders`` skips building the lists."""
+    return BasketStore.from_orders(df).to_frame()
     
\ No newline at end of file
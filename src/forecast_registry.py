@@ -0,0 +1,146 @@
+"""Fitted sales forecast models, persisted per data version.
+
+One STL + ARIMA residual + polynomial trend model is fit per series on the
+full history, for the total and every aggregate level of ``hierarchical``
+(category, sub-category, region, segment, region x segment). A series the
+model cannot fit falls back to a seasonal naive forecast, as in
+``hierarchical``, and is listed under ``fallback`` in the manifest. Each
+registry version is a directory named after the data fingerprint, holding the
+pickled models and a manifest. ``LATEST`` points at the most recently written one, so
+a server can keep answering from the previous version while it refits.
+"""
+import fcntl
+import json
+import os
+import pickle
+import tempfile
+import time
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+from numpy.polynomial.polynomial import Polynomial
+from statsmodels.tsa.arima.model import ARIMA
+from .data_preprocessing import decompose_monthly, load_data
+from .forecasting import predict_months
+from .hierarchical import ALL, DIMENSIONS, FIT_ERRORS, LEVELS, bottom_series, seasonal_naive, summing_matrix
+from .utils import data_fingerprint, replacing_dir
+
+FORMAT_VERSION = 1
+MANIFEST = 'manifest.json'
+LATEST = 'LATEST'
+REFIT_LOCK = 'refit.lock'
+SERIES_LEVELS = [level for level in LEVELS if level != tuple(DIMENSIONS)]
+
+class SeriesModel:
+    def __init__(self, history, arima_model, poly_model):
+        self.history = history
+        self.arima_model = arima_model
+        self.poly_model = poly_model
+
+    def forecast(self, months):
+        index = pd.date_range(self.history.index[-1], periods=months + 1, freq='ME')[1:]
+        return pd.Series(predict_months(self.history, self.arima_model, self.poly_model, months), index=index)
+
+class SeasonalNaiveModel:
+    """Stand-in for a series that could not be fit: repeats its last 12 months of sales."""
+
+    def __init__(self, sales):
+        self.sales = sales
+
+    def forecast(self, months):
+        index = pd.date_range(self.sales.index[-1], periods=months + 1, freq='ME')[1:]
+        return pd.Series(seasonal_naive(self.sales.to_numpy(), months), index=index)
+
+class ForecastModels:
+    """Series name -> fitted ``SeriesModel`` (or ``SeasonalNaiveModel``), for one version of the source data."""
+
+    def __init__(self, models, version, params=None, fitted_at=None, fallback=None):
+        self.models = models
+        self.version = version
+        self.params = params or {}
+        self.fitted_at = fitted_at
+        self.fallback = fallback or {}
+
+    def __contains__(self, series):
+        return series in self.models
+
+    def series(self):
+        return list(self.models)
+
+    def forecast(self, series, months):
+        return self.models[series].forecast(months)
+
+def series_name(key):
+    """'Total', or the non-aggregated labels joined by '/', e.g. 'Technology/Phones' or 'West/Consumer'."""
+    labels = [key[d] for d in DIMENSIONS if key[d] != ALL]
+    return '/'.join(labels) or 'Total'
+
+def fit_forecast_models(df, version, levels=SERIES_LEVELS, order=(4, 0, 4), trend_deg=2):
+    bottom = bottom_series(df)
+    keys, S = summing_matrix(bottom.columns, levels)
+    series = bottom.to_numpy() @ S.T
+    models, fallback = {}, {}
+    for i, key in enumerate(keys.to_dict('records')):
+        name = series_name(key)
+        sales = pd.Series(series[:, i], index=bottom.index)
+        try:
+            history = decompose_monthly(sales)
+            arima_model = ARIMA(history['Resid'], order=order, freq='ME').fit()
+            poly_model = Polynomial.fit(np.arange(len(history)), history['Trend'], deg=trend_deg)
+            models[name] = SeriesModel(history, arima_model, poly_model)
+        except FIT_ERRORS as e:
+            models[name] = SeasonalNaiveModel(sales)
+            fallback[name] = type(e).__name__
+    params = {'order': list(order), 'trend_deg': trend_deg, 'levels': ['/'.join(level) or 'Total' for level in levels]}
+    return ForecastModels(models, version, params, fitted_at=time.strftime('%Y-%m-%dT%H:%M:%S'), fallback=fallback)
+
+def build_forecast_models(data_path, **params):
+    df = load_data(data_path, columns=DIMENSIONS + ['Sales'])
+    return fit_forecast_models(df, data_fingerprint(data_path), **params)
+
+def save_forecast_models(models, output_dir):
+    """Write ``models`` to ``output_dir/<version>`` and point ``LATEST`` at it; safe with concurrent writers."""
+    version_dir = os.path.join(output_dir, models.version)
+    with replacing_dir(version_dir) as tmp_dir:
+        with open(os.path.join(tmp_dir, 'models.pkl'), 'wb') as f:
+            pickle.dump(models.models, f, protocol=pickle.HIGHEST_PROTOCOL)
+        manifest = {'format_version': FORMAT_VERSION, 'version': models.version, 'fitted_at': models.fitted_at,
+                    'params': models.params, 'series': models.series(), 'fallback': models.fallback}
+        with open(os.path.join(tmp_dir, MANIFEST), 'w') as f:
+            json.dump(manifest, f, indent=2)
+    fd, tmp_path = tempfile.mkstemp(prefix=LATEST + '.', suffix='.tmp', dir=output_dir)
+    with os.fdopen(fd, 'w') as f:
+        f.write(models.version)
+    os.replace(tmp_path, os.path.join(output_dir, LATEST))
+    return version_dir
+
+@contextmanager
+def refit_lock(output_dir):
+    """Hold an exclusive lock on ``output_dir``'s refits, waiting for any other process or thread that has it."""
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, REFIT_LOCK), 'w') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def load_forecast_models(output_dir, version=None):
+    """Models for data ``version`` (default: the latest written), or None if there are none."""
+    if version is None:
+        try:
+            with open(os.path.join(output_dir, LATEST)) as f:
+                version = f.read().strip()
+        except FileNotFoundError:
+            return None
+    version_dir = os.path.join(output_dir, version)
+    try:
+        with open(os.path.join(version_dir, MANIFEST)) as f:
+            manifest = json.load(f)
+        if manifest.get('format_version') != FORMAT_VERSION:
+            return None
+        with open(os.path.join(version_dir, 'models.pkl'), 'rb') as f:
+            models = pickle.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    return ForecastModels(models, manifest['version'], manifest['params'], manifest['fitted_at'], manifest.get('fallback'))
@@ -3,21 +3,14 @@ from numpy.polynomial.polynomial import Polynomial
 import numpy as np
 from datetime import datetime, timedelta
 import pandas as pd
-from statsmodels.tsa.seasonal import STL
 from sklearn.metrics import r2_score, mean_absolute_percentage_error, mean_squared_error
-import matplotlib.pyplot as plt
 import warnings
+from .data_preprocessing import monthly_sales_decomposition
+from .rendering import Plot, draw_frame, emit
 warnings.filterwarnings('ignore')
 
 def preprocess_sales_data(df):
-    sales_df = df.groupby(level=0)['Sales'].sum().resample('ME').sum().reset_index()
-    sales_df.set_index('Order Date', inplace=True)
-    stl = STL(sales_df['Sales'])
-    result = stl.fit()
-    sales_df['Trend'] = result.trend
-    sales_df['Seasonal'] = result.seasonal
-    sales_df['Resid'] = result.resid
-    sales_df['Sales_S1'] = sales_df['Sales'].diff(12)
+    sales_df = monthly_sales_decomposition(df)
     train_df = sales_df[:datetime(2016, 12, 31)].copy()
     test_df = sales_df[datetime(2017, 1, 1):].copy()
     return sales_df, train_df, test_df
@@ -43,33 +36,36 @@ def forecast_future(sales_df, train_df, arima_model, poly_model, months_ahead=36
     future_df = pd.DataFrame({'Pred': pred}, index=future_dates)
     return future_df
 
-def evaluate_forecast(test_df):
+def predict_months(train_df, arima_model, poly_model, steps):
+    """Forecast for the ``steps`` months after ``train_df`` as an array: trend + residual + last year's seasonal."""
+    pred_res = np.asarray(arima_model.forecast(steps=steps))
+    pred_seasonal = np.resize(train_df['Seasonal'].to_numpy()[-12:], steps)
+    pred_trend = poly_model(np.arange(len(train_df), len(train_df) + steps))
+    return pred_trend + pred_res + pred_seasonal
+
+def evaluate_forecast(test_df, verbose=True):
     true = test_df.dropna()['Sales']
     pred = test_df.dropna()['Pred']
     r2 = r2_score(true, pred)
     mape = mean_absolute_percentage_error(true, pred)
     rmse = np.sqrt(mean_squared_error(true, pred))
-    print(f"R2 Score: {r2:.4f}")
-    print(f"100 - MAPE: {100 - mape * 100:.2f}")
-    print(f"RMSE: {rmse:.2f}")
+    if verbose:
+        print(f"R2 Score: {r2:.4f}")
+        print(f"100 - MAPE: {100 - mape * 100:.2f}")
+        print(f"RMSE: {rmse:.2f}")
     return r2, mape, rmse
 
-def plot_forecast(df, columns=['Sales', 'Pred'], title='Sales Forecast', save_path='docs/visualizations/forecast.png'):
-    df[columns].plot(figsize=(12,6))
-    plt.title(title)
-    plt.xlabel("Date")
-    plt.ylabel("Sales")
-    plt.grid(True)
-    plt.savefig(save_path)
-    plt.close()
-    
-def run_sales_forecast_pipeline(df, months_ahead=36, plot_path='sales_forecast.png'):
+def plot_forecast(df, columns=['Sales', 'Pred'], title='Sales Forecast', save_path='docs/visualizations/forecast.png', plots=None):
+    emit(plots, Plot(save_path, draw_frame, figsize=(12, 6), tight_layout=False, frame=df[columns],
+                     title=title, xlabel="Date", ylabel="Sales", grid=True))
+
+def run_sales_forecast_pipeline(df, months_ahead=36, plot_path='sales_forecast.png', plots=None):
     sales_df, train_df, test_df = preprocess_sales_data(df)
     test_df, arima_model, poly_model = train_arima_trend_model(train_df, test_df)
     evaluate_forecast(test_df)
-    plot_forecast(test_df, title="Backtest Forecast vs Actual", save_path='docs/visualizations/'+plot_path)
+    plot_forecast(test_df, title="Backtest Forecast vs Actual", save_path='docs/visualizations/'+plot_path, plots=plots)
     future_df = forecast_future(sales_df, train_df, arima_model, poly_model, months_ahead=months_ahead)
     combined_df = pd.concat([sales_df, future_df])
-    plot_forecast(combined_df, title="Future Sales Forecast", save_path=f"docs/visualizations/future_{plot_path}")
+    plot_forecast(combined_df, title="Future Sales Forecast", save_path=f"docs/visualizations/future_{plot_path}", plots=plots)
     future_df['MoM Growth %'] = future_df['Pred'].pct_change() * 100
     return future_df
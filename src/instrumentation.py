@@ -0,0 +1,137 @@
+"""Timers, latency histograms and opt-in profiling for the hot paths.
+
+``span(name)`` times a block into the ``span_seconds`` histogram under a
+``span`` label, so nested steps (``recommend.score_cart`` inside
+``recommend.cart_known``) each get their own series. Histograms live in a process-wide
+``REGISTRY`` and render in the Prometheus text exposition format, without
+depending on ``prometheus_client``. Observing takes one lock and a bucket
+search, cheap next to the millisecond-scale work it wraps. ``profiled``
+wraps a block in cProfile and dumps the stats only when the block was slow.
+"""
+import bisect
+import cProfile
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# Seconds; spans from sub-millisecond scoring steps up to pipeline stages
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+def _labels(pairs):
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}' if pairs else ''
+
+class Histogram:
+    def __init__(self, name, documentation, labels=(), buckets=BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(map(labels.__getitem__, self.labels))
+        bucket = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bucket] += 1
+            series[1] += value
+
+    def count(self, **labels):
+        """Observations so far for one label combination."""
+        series = self._series.get(tuple(map(labels.__getitem__, self.labels)))
+        return 0 if series is None else sum(series[0])
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((tuple(map(str, key)), list(counts), total) for key, (counts, total) in self._series.items())
+        for key, counts, total in series:
+            pairs = list(zip(self.labels, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(pairs + [('le', bound)])} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(pairs)} {total}")
+            lines.append(f"{self.name}_count{_labels(pairs)} {cumulative}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+
+    def histogram(self, name, documentation, labels=(), buckets=BUCKETS):
+        """The histogram called ``name``, created on first use."""
+        if name not in self.metrics:
+            self.metrics[name] = Histogram(name, documentation, labels, buckets)
+        return self.metrics[name]
+
+    def render(self):
+        return '\n'.join(line for metric in self.metrics.values() for line in metric.render()) + '\n'
+
+REGISTRY = Registry()
+SPAN_SECONDS = REGISTRY.histogram('span_seconds', 'Wall-clock seconds spent in instrumented blocks.', ['span'])
+
+class span:
+    """Context manager timing its block into ``SPAN_SECONDS``; a class because a generator costs several times more per use."""
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        SPAN_SECONDS.observe(time.perf_counter() - self.start, span=self.name)
+
+def sample(name, documentation, value, metric_type='gauge', **labels):
+    """Prometheus text lines for one sample of a gauge or counter kept elsewhere."""
+    return f"# HELP {name} {documentation}\n# TYPE {name} {metric_type}\n{name}{_labels(list(labels.items()))} {value}\n"
+
+def write_metrics(path, registry=REGISTRY):
+    """Write the registry to ``path`` atomically, e.g. for node_exporter's textfile collector."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        f.write(registry.render())
+    os.replace(tmp_path, path)
+
+# One profiler at a time: on Python 3.12+ cProfile hooks sys.monitoring, which is interpreter-wide
+_profiler_lock = threading.Lock()
+
+@contextmanager
+def profiled(directory, label, min_seconds=0.0):
+    """Profile the block with cProfile and dump ``<directory>/<time>-<label>-<ms>ms-<id>.prof`` if it took ``min_seconds`` or more.
+
+    Does nothing when ``directory`` is None. Only one block is profiled at a
+    time; blocks that start while another is being profiled run unprofiled.
+    On Python 3.12+ the profiler sees every thread, so a dump can include work
+    from requests running concurrently with the profiled one.
+    """
+    if directory is None or not _profiler_lock.acquire(blocking=False):
+        yield
+        return
+    try:
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            seconds = time.perf_counter() - start
+            if seconds >= min_seconds:
+                os.makedirs(directory, exist_ok=True)
+                name = f"{time.strftime('%Y%m%dT%H%M%S')}-{label}-{seconds * 1000:.0f}ms-{uuid.uuid4().hex[:8]}.prof"
+                profiler.dump_stats(os.path.join(directory, name))
+    finally:
+        _profiler_lock.release()
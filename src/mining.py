@@ -0,0 +1,197 @@
+import hashlib
+import warnings
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from mlxtend.frequent_patterns import apriori, fpgrowth, association_rules
+
+ALGORITHMS = {'apriori': apriori, 'fpgrowth': fpgrowth}
+# Both find the same itemsets; FP-Growth is faster on the sparse daily baskets
+DEFAULT_ALGORITHM = 'fpgrowth'
+CACHE_SIZE = 32
+
+_itemset_cache = OrderedDict()
+
+class TransactionEncoding:
+    """One-hot transactions as a sparse boolean transactions x items matrix.
+
+    ``version`` is a content hash, so frequent itemsets mined from equal encodings
+    share a cache entry no matter where the encoding was built.
+    """
+
+    def __init__(self, matrix, columns):
+        self.matrix = sparse.csr_matrix(matrix, dtype=bool)
+        self.columns = [str(column) for column in columns]
+        digest = hashlib.sha1()
+        for array in (self.matrix.indptr, self.matrix.indices):
+            digest.update(np.ascontiguousarray(array, dtype=np.int64).tobytes())
+        digest.update('\x1f'.join(self.columns).encode())
+        self.version = digest.hexdigest()[:16]
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def subset(self, rows):
+        """Encoding of the selected transactions (boolean mask or positions), same columns."""
+        return TransactionEncoding(self.matrix[np.asarray(rows)], self.columns)
+
+    def reindex(self, columns):
+        """Same transactions over ``columns``, which must contain every current column."""
+        positions = {item: j for j, item in enumerate(columns)}
+        mapping = np.array([positions[item] for item in self.columns], dtype=np.int64)
+        matrix = sparse.csr_matrix((self.matrix.data, mapping[self.matrix.indices], self.matrix.indptr), shape=(len(self), len(columns)))
+        matrix.sort_indices()
+        return TransactionEncoding(matrix, columns)
+
+    def to_frame(self):
+        """Sparse boolean DataFrame in the layout mlxtend's miners expect."""
+        with warnings.catch_warnings():
+            # pandas warns about the implicit False fill value of a boolean SparseDtype
+            warnings.simplefilter('ignore', FutureWarning)
+            return pd.DataFrame.sparse.from_spmatrix(self.matrix, columns=self.columns)
+
+def encode_transactions(transactions):
+    """Sparse one-hot encoding of a list of item lists, columns sorted like TransactionEncoder."""
+    lengths = np.fromiter((len(t) for t in transactions), dtype=np.int64, count=len(transactions))
+    flat = np.array([item for t in transactions for item in t], dtype=object)
+    columns, codes = np.unique(flat.astype(str), return_inverse=True) if len(flat) else (np.array([], dtype=str), np.array([], dtype=np.int64))
+    indptr = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=indptr[1:])
+    matrix = sparse.csr_matrix((np.ones(len(codes), dtype=bool), codes, indptr), shape=(len(lengths), len(columns)))
+    matrix.sum_duplicates()
+    return TransactionEncoding(matrix, columns)
+
+def mine_frequent_itemsets(encoding, min_support, algorithm=DEFAULT_ALGORITHM):
+    """Frequent itemsets of ``encoding``, cached per (encoding version, min_support, algorithm)."""
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"Unknown algorithm {algorithm!r}, expected one of {sorted(ALGORITHMS)}")
+    key = (encoding.version, float(min_support), algorithm)
+    if key in _itemset_cache:
+        _itemset_cache.move_to_end(key)
+        return _itemset_cache[key].copy()
+    frequent_itemsets = ALGORITHMS[algorithm](encoding.to_frame(), min_support=min_support, use_colnames=True)
+    _itemset_cache[key] = frequent_itemsets
+    if len(_itemset_cache) > CACHE_SIZE:
+        _itemset_cache.popitem(last=False)
+    return frequent_itemsets.copy()
+
+def mine_rules(encoding, min_support, metric='lift', min_threshold=1.0, algorithm=DEFAULT_ALGORITHM):
+    """Frequent itemsets and the association rules derived from them."""
+    frequent_itemsets = mine_frequent_itemsets(encoding, min_support, algorithm)
+    if frequent_itemsets.empty:
+        return frequent_itemsets, pd.DataFrame(columns=['antecedents', 'consequents', 'support', 'confidence', 'lift'])
+    rules = association_rules(frequent_itemsets, metric=metric, min_threshold=min_threshold)
+    return frequent_itemsets, rules
+
+def concat_encodings(first, second):
+    columns = sorted(set(first.columns) | set(second.columns))
+    return TransactionEncoding(sparse.vstack([first.reindex(columns).matrix, second.reindex(columns).matrix], format='csr'), columns)
+
+def count_itemsets(encoding, itemsets, block_size=65536):
+    """Number of transactions in ``encoding`` containing each itemset (an iterable of item sets)."""
+    itemsets = list(itemsets)
+    positions = {item: j for j, item in enumerate(encoding.columns)}
+    sizes = np.array([len(itemset) for itemset in itemsets], dtype=np.int64)
+    rows, cols = [], []
+    for i, itemset in enumerate(itemsets):
+        for item in itemset:
+            rows.append(i)
+            # Items the encoding has never seen map to a dummy column no transaction contains
+            cols.append(positions.get(item, len(encoding.columns)))
+    members = sparse.csr_matrix((np.ones(len(rows), dtype=np.int32), (rows, cols)), shape=(len(itemsets), len(encoding.columns) + 1))
+    members_t = members.T.tocsr()
+    counts = np.zeros(len(itemsets), dtype=np.int64)
+    matrix = sparse.hstack([encoding.matrix, sparse.csr_matrix((len(encoding), 1), dtype=bool)], format='csr').astype(np.int32)
+    for start in range(0, len(encoding), block_size):
+        overlap = (matrix[start:start + block_size] @ members_t).tocsr()
+        contained = overlap.indices[overlap.data == sizes[overlap.indices]]
+        counts += np.bincount(contained, minlength=len(itemsets))
+    return counts
+
+class IncrementalItemsets:
+    """Frequent itemsets of a growing transaction history, updated without re-mining.
+
+    Keeps the history encoding and the support count of every frequent itemset.
+    ``update`` counts the stored itemsets in the new transactions only. An itemset
+    that was infrequent in the history can only become frequent overall if it is
+    frequent within the new transactions, so those are mined from the increment,
+    and only the ones not already tracked are counted against the history. The
+    result is identical to mining history + increment from scratch.
+    """
+
+    def __init__(self, encoding, itemsets, counts, min_support):
+        self.encoding = encoding
+        self.itemsets = list(itemsets)
+        self.counts = np.asarray(counts, dtype=np.int64)
+        self.min_support = min_support
+        self.last_update = {}
+
+    @classmethod
+    def mine(cls, encoding, min_support, algorithm=DEFAULT_ALGORITHM):
+        itemsets = list(mine_frequent_itemsets(encoding, min_support, algorithm)['itemsets'])
+        counts = count_itemsets(encoding, itemsets)
+        # Same threshold as update() and as apriori: support >= min_support
+        frequent = counts / max(len(encoding), 1) >= min_support
+        return cls(encoding, [itemset for itemset, keep in zip(itemsets, frequent) if keep], counts[frequent], min_support)
+
+    def __len__(self):
+        return len(self.itemsets)
+
+    @property
+    def n_transactions(self):
+        return len(self.encoding)
+
+    def update(self, new_encoding, algorithm=DEFAULT_ALGORITHM):
+        """Return the state after appending ``new_encoding``'s transactions."""
+        if len(new_encoding) == 0:
+            return self
+        combined = concat_encodings(self.encoding, new_encoding)
+        counts = self.counts + count_itemsets(new_encoding, self.itemsets)
+        tracked = set(self.itemsets)
+        candidates = [itemset for itemset in mine_frequent_itemsets(new_encoding, self.min_support, algorithm)['itemsets']
+                      if itemset not in tracked]
+        itemsets = self.itemsets + candidates
+        if candidates:
+            counts = np.concatenate([counts, count_itemsets(combined, candidates)])
+        frequent = counts / len(combined) >= self.min_support
+        state = IncrementalItemsets(combined, [itemset for itemset, keep in zip(itemsets, frequent) if keep], counts[frequent], self.min_support)
+        state.last_update = {'new_transactions': len(new_encoding), 'candidates': len(candidates),
+                             'added': int(frequent[len(self.itemsets):].sum()), 'dropped': int((~frequent[:len(self.itemsets)]).sum())}
+        return state
+
+    def frequent_itemsets(self):
+        """Frequent itemsets in mlxtend's ``support``/``itemsets`` layout."""
+        return pd.DataFrame({'support': self.counts / self.n_transactions, 'itemsets': self.itemsets})
+
+    def rules(self, metric='lift', min_threshold=1.0):
+        frequent_itemsets = self.frequent_itemsets()
+        if frequent_itemsets.empty:
+            return pd.DataFrame(columns=['antecedents', 'consequents', 'support', 'confidence', 'lift'])
+        return association_rules(frequent_itemsets, metric=metric, min_threshold=min_threshold)
+
+    def save(self, path):
+        items = [sorted(itemset) for itemset in self.itemsets]
+        np.savez_compressed(
+            path,
+            columns=np.array(self.encoding.columns, dtype=str),
+            indptr=self.encoding.matrix.indptr,
+            indices=self.encoding.matrix.indices,
+            itemset_indptr=np.cumsum([0] + [len(itemset) for itemset in items]),
+            itemset_items=np.array([item for itemset in items for item in itemset], dtype=str),
+            counts=self.counts,
+            min_support=self.min_support,
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as arrays:
+            columns = [str(column) for column in arrays['columns']]
+            indptr = arrays['indptr']
+            matrix = sparse.csr_matrix((np.ones(len(arrays['indices']), dtype=bool), arrays['indices'], indptr), shape=(len(indptr) - 1, len(columns)))
+            bounds, items = arrays['itemset_indptr'], arrays['itemset_items']
+            itemsets = [frozenset(str(item) for item in items[bounds[i]:bounds[i + 1]]) for i in range(len(bounds) - 1)]
+            return cls(TransactionEncoding(matrix, columns), itemsets, arrays['counts'], float(arrays['min_support']))
+
+def clear_cache():
+    _itemset_cache.clear()
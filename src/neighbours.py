@@ -0,0 +1,263 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+class NeighbourIndex:
+    """Top-K most similar customers per customer, stored as CSR arrays.
+
+    ``indptr``/``indices``/``data`` follow scipy's CSR layout over customer codes:
+    the neighbours of customer ``i`` are ``indices[indptr[i]:indptr[i + 1]]`` with
+    similarities ``data[indptr[i]:indptr[i + 1]]``, sorted by descending similarity.
+    """
+
+    def __init__(self, indptr, indices, data, users):
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.users = pd.Index(users)
+        self.matrix = sparse.csr_matrix((data, indices, indptr), shape=(len(self.users), len(self.users)), copy=False)
+
+    def __len__(self):
+        return len(self.users)
+
+    @property
+    def k(self):
+        return int(np.diff(self.indptr).max(initial=0))
+
+    def neighbours(self, user):
+        row = self.users.get_loc(user)
+        start, end = self.indptr[row], self.indptr[row + 1]
+        return pd.Series(self.data[start:end], index=self.users[self.indices[start:end]])
+
+def index_dtype(nnz):
+    """int32 CSR offsets when they fit, matching what scipy would pick without copying."""
+    return np.int32 if nnz < np.iinfo(np.int32).max else np.int64
+
+def normalize_rows(owned):
+    owned = sparse.csr_matrix(owned, dtype=np.float32)
+    norms = np.sqrt(np.asarray(owned.multiply(owned).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sparse.diags(1 / norms).astype(np.float32) @ owned
+
+def _select_top_k(sims, k):
+    """Per-row top-k (column, value) of a dense block, sorted by descending value then column.
+
+    Ties at the k-th value go to the lowest columns, so the selection does not
+    depend on how ``argpartition`` happens to order equal values.
+    """
+    if k == 0:
+        empty = np.zeros((sims.shape[0], 0), dtype=np.int64)
+        return empty, empty.astype(sims.dtype)
+    if k < sims.shape[1]:
+        cols = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+    else:
+        cols = np.broadcast_to(np.arange(sims.shape[1]), sims.shape)
+    vals = np.take_along_axis(sims, cols, axis=1)
+    if k < sims.shape[1]:
+        kth = vals.min(axis=1)
+        tied = np.flatnonzero((sims >= kth[:, None]).sum(axis=1) > k)
+        if len(tied):
+            # Rows with more than k values at or above the k-th: re-rank all of them by (value, column)
+            rows, candidates = np.nonzero(sims[tied] >= kth[tied, None])
+            values = sims[tied[rows], candidates]
+            order = np.lexsort((candidates, -values, rows))
+            rows, candidates, values = rows[order], candidates[order], values[order]
+            first = np.searchsorted(rows, np.arange(len(tied)))
+            take = first[:, None] + np.arange(k)
+            cols, vals = cols.copy(), vals.copy()
+            cols[tied], vals[tied] = candidates[take], values[take]
+    order = np.lexsort((cols, -vals), axis=1)
+    return np.take_along_axis(cols, order, axis=1), np.take_along_axis(vals, order, axis=1)
+
+def build_neighbour_index(owned, users, k=50, block_size=1024):
+    """Exact cosine top-k neighbours, computed ``block_size`` customers at a time.
+
+    Peak memory is one dense ``block_size x n_customers`` float32 block instead of
+    the full customer x customer matrix.
+    """
+    X = normalize_rows(owned)
+    XT = X.T.tocsr()
+    n = X.shape[0]
+    k = max(min(k, n - 1), 0)
+    counts, indices, data = [], [], []
+    for start in range(0, n, block_size):
+        stop = min(start + block_size, n)
+        sims = (X[start:stop] @ XT).toarray()
+        sims[np.arange(stop - start), np.arange(start, stop)] = -np.inf
+        cols, vals = _select_top_k(sims, k)
+        keep = vals > 0
+        counts.append(keep.sum(axis=1))
+        indices.append(cols[keep].astype(np.int32))
+        data.append(vals[keep].astype(np.float32))
+    counts = np.concatenate(counts) if counts else np.zeros(0, dtype=np.int64)
+    indptr = np.zeros(n + 1, dtype=index_dtype(counts.sum()))
+    np.cumsum(counts, out=indptr[1:])
+    indices = np.concatenate(indices) if indices else np.zeros(0, dtype=np.int32)
+    data = np.concatenate(data) if data else np.zeros(0, dtype=np.float32)
+    return NeighbourIndex(indptr, indices, data, users)
+
+# Hash functions are (a * item + b) mod a Mersenne prime
+MERSENNE_PRIME = (1 << 31) - 1
+
+def minhash_signatures(owned, num_perm=64, seed=0, block_size=65536):
+    """MinHash signature (``num_perm`` uint32 values) of every row's item set.
+
+    Rows without items keep the maximum uint32 in every position. Rows are done
+    ``block_size`` at a time, so the per-line hash values never exist for all rows at once.
+    """
+    owned = sparse.csr_matrix(owned, dtype=bool)
+    owned.eliminate_zeros()
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, MERSENNE_PRIME, num_perm, dtype=np.int64)
+    b = rng.integers(0, MERSENNE_PRIME, num_perm, dtype=np.int64)
+    item_hashes = ((np.arange(owned.shape[1], dtype=np.int64)[:, None] * a + b) % MERSENNE_PRIME).astype(np.uint32)
+    signatures = np.full((owned.shape[0], num_perm), np.iinfo(np.uint32).max, dtype=np.uint32)
+    indptr, indices = owned.indptr, owned.indices
+    for start in range(0, owned.shape[0], block_size):
+        stop = min(start + block_size, owned.shape[0])
+        rows = start + np.flatnonzero(np.diff(indptr[start:stop + 1]))
+        if len(rows):
+            lines = item_hashes[indices[indptr[start]:indptr[stop]]]
+            signatures[rows] = np.minimum.reduceat(lines, indptr[rows] - indptr[start], axis=0)
+    return signatures
+
+class LSHBuckets:
+    """Rows sorted into buckets once per band, so each row's bucket-mates are a slice around its position.
+
+    Each band hashes ``num_perm / bands`` signature values to a bucket key.
+    Within a bucket, rows that also share the next two bands' buckets sit
+    together (then in random order), so the nearest positions hold the likeliest
+    neighbours. ``members[band]`` is the sorted row order, ``keys[band]`` the
+    bucket keys in that order and ``position[band, row]`` where a row sits (-1
+    for rows left out).
+    """
+
+    def __init__(self, signatures, bands=32, seed=0, rows=None):
+        n, num_perm = signatures.shape
+        if num_perm % bands:
+            raise ValueError(f"num_perm {num_perm} is not divisible into {bands} bands")
+        width = num_perm // bands
+        rows = np.arange(n) if rows is None else np.asarray(rows)
+        rng = np.random.default_rng(seed)
+        multipliers = rng.integers(1, np.iinfo(np.int64).max, width, dtype=np.int64).astype(np.uint64) | np.uint64(1)
+        band_keys = np.stack([signatures[rows, band * width:(band + 1) * width].astype(np.uint64) @ multipliers for band in range(bands)])
+        self.n = n
+        self.members = np.empty((bands, len(rows)), dtype=np.int32)
+        self.keys = np.empty((bands, len(rows)), dtype=np.uint64)
+        self.position = np.full((bands, n), -1, dtype=np.int32)
+        for band in range(bands):
+            order = np.lexsort((rng.random(len(rows)), band_keys[(band + 2) % bands], band_keys[(band + 1) % bands], band_keys[band]))
+            self.members[band], self.keys[band] = rows[order], band_keys[band, order]
+            self.position[band, rows[order]] = np.arange(len(rows))
+
+    def candidates(self, block, per_bucket=32):
+        """Distinct ``(row, candidate)`` pairs for the rows in ``block``: up to ``per_bucket`` bucket-mates on either side, per band."""
+        offsets = np.concatenate([np.arange(-per_bucket, 0), np.arange(1, per_bucket + 1)])
+        codes = []
+        for members, keys, position in zip(self.members, self.keys, self.position):
+            pos = position[block]
+            rows, pos = block[pos >= 0], pos[pos >= 0]
+            near = pos[:, None] + offsets
+            inside = (near >= 0) & (near < len(members))
+            near = np.where(inside, near, pos[:, None])
+            same = inside & (keys[near] == keys[pos][:, None])
+            codes.append(np.repeat(rows.astype(np.int64), same.sum(axis=1)) * self.n + members[near[same]])
+        codes = np.unique(np.concatenate(codes)) if codes else np.zeros(0, dtype=np.int64)
+        return codes // self.n, codes % self.n
+
+# Above this many bytes the normalized rows stay sparse for re-scoring
+DENSE_ROWS_BYTES = 256 * 2**20
+
+def _pair_cosines(X, first, second):
+    """Dot products of customer rows for each pair, from a CSR ``X`` or a dense items x customers array.
+
+    Products are added one item at a time in column order, the float32
+    arithmetic of the sparse product in ``build_neighbour_index``, so both
+    builders get bit-identical similarities and break ties the same way.
+    """
+    sims = np.zeros(len(first), dtype=np.float32)
+    if isinstance(X, np.ndarray):
+        # Adding the zero products of items the pair does not share leaves the sum unchanged
+        for item in X:
+            sims += item[first] * item[second]
+        return sims
+    products = sparse.csr_matrix(X[first].multiply(X[second]), dtype=np.float32)
+    products.sort_indices()
+    lengths = np.diff(products.indptr)
+    for t in range(lengths.max(initial=0)):
+        rows = np.flatnonzero(lengths > t)
+        sims[rows] += products.data[products.indptr[rows] + t]
+    return sims
+
+def _top_k_pairs(first, second, sims, k):
+    """The k best pairs per row, ordered by row, descending similarity and column like ``_select_top_k``.
+
+    ``first``/``second`` must be sorted by row then column, as ``LSHBuckets.candidates`` returns them.
+    """
+    sims = sims.astype(np.float32)
+    # Positive float32s order like their bit patterns, so (row, -similarity) fits one int64 key;
+    # the stable sort keeps the column order for ties
+    key = (first << 31) | (np.int64(2**31 - 1) - sims.view(np.int32))
+    order = np.argsort(key, kind='stable')
+    first, second, sims = first[order], second[order], sims[order]
+    counts = np.bincount(first - first[0], minlength=1) if len(first) else np.zeros(0, dtype=np.int64)
+    top = np.arange(len(first)) - np.repeat(np.cumsum(counts) - counts, counts) < k
+    return first[top], second[top], sims[top]
+
+def build_minhash_neighbour_index(owned, users, k=50, block_size=1024, num_perm=64, bands=32, per_bucket=32, seed=0):
+    """Approximate cosine top-k neighbours: MinHash/LSH candidates re-scored with exact cosine.
+
+    A drop-in for ``build_neighbour_index``: same ``NeighbourIndex`` layout and
+    tie-breaking, but each customer is only scored against its LSH bucket-mates
+    (at most ``2 * per_bucket * bands``), so the cost grows with customers
+    rather than customers^2. More ``bands`` (fewer signature values per band)
+    or a larger ``per_bucket`` find more of the true neighbours for more work.
+    Customers are processed ``block_size`` at a time.
+    """
+    X = normalize_rows(owned)
+    n = X.shape[0]
+    k = max(min(k, n - 1), 0)
+    buckets = LSHBuckets(minhash_signatures(X, num_perm, seed), bands, seed, rows=np.flatnonzero(np.diff(X.indptr)))
+    rows = X.T.toarray() if X.shape[0] * X.shape[1] * 4 <= DENSE_ROWS_BYTES else X
+    counts, indices, data = [], [], []
+    for start in range(0, n, block_size):
+        block = np.arange(start, min(start + block_size, n))
+        first, second = buckets.candidates(block, per_bucket)
+        sims = _pair_cosines(rows, first, second)
+        keep = sims > 0
+        first, second, sims = _top_k_pairs(first[keep], second[keep], sims[keep], k)
+        counts.append(np.bincount(first - start, minlength=len(block)))
+        indices.append(second.astype(np.int32))
+        data.append(sims)
+    counts = np.concatenate(counts) if counts else np.zeros(0, dtype=np.int64)
+    indptr = np.zeros(n + 1, dtype=index_dtype(counts.sum()))
+    np.cumsum(counts, out=indptr[1:])
+    indices = np.concatenate(indices) if indices else np.zeros(0, dtype=np.int32)
+    data = np.concatenate(data) if data else np.zeros(0, dtype=np.float32)
+    return NeighbourIndex(indptr, indices, data, users)
+
+NEIGHBOUR_METHODS = {'exact': build_neighbour_index, 'minhash': build_minhash_neighbour_index}
+
+def neighbour_index(owned, users, method='exact', **params):
+    """Top-k neighbour index from the builder named ``method``; ``params`` go to the builder."""
+    if method not in NEIGHBOUR_METHODS:
+        raise ValueError(f"Unknown neighbour method {method!r}, expected one of {sorted(NEIGHBOUR_METHODS)}")
+    return NEIGHBOUR_METHODS[method](owned, users, **params)
+
+def recall_at_k(approx, exact, k=None):
+    """Mean share of each customer's exact top-k that the approximate index matches.
+
+    Ties make neighbour identities arbitrary, so an approximate neighbour counts
+    as a hit when its similarity reaches the customer's k-th exact similarity.
+    Customers without exact neighbours are skipped.
+    """
+    k = exact.k if k is None else k
+    hits, total = 0, 0
+    for row in range(len(exact)):
+        exact_sims = exact.data[exact.indptr[row]:exact.indptr[row + 1]][:k]
+        if not len(exact_sims):
+            continue
+        approx_sims = approx.data[approx.indptr[row]:approx.indptr[row + 1]][:k]
+        hits += min(int((approx_sims >= exact_sims[-1] - 1e-6).sum()), len(exact_sims))
+        total += len(exact_sims)
+    return hits / total if total else 1.0
@@ -1,70 +1,283 @@
+import numpy as np
 import pandas as pd
-from mlxtend.frequent_patterns import apriori, association_rules
-from mlxtend.preprocessing import TransactionEncoder
+from scipy import sparse
 from sklearn.metrics.pairwise import cosine_similarity
-from itertools import chain, combinations
-
-def build_market_basket_rules(items_df, min_support=0.001, min_lift=1.5):
-    transactions = items_df['Items'].tolist()
-    te = TransactionEncoder()
-    te_ary = te.fit(transactions).transform(transactions)
-    transaction_df = pd.DataFrame(te_ary, columns=te.columns_)
-    frequent_itemsets = apriori(transaction_df, min_support=min_support, use_colnames=True)
-    rules = association_rules(frequent_itemsets, metric='lift', min_threshold=min_lift)
+from itertools import combinations
+from math import comb
+from collections.abc import Mapping
+from types import MappingProxyType
+from .baskets import as_baskets
+from .instrumentation import span
+from .neighbours import neighbour_index
+from .mining import DEFAULT_ALGORITHM, IncrementalItemsets, mine_rules
+
+class RuleIndex:
+    """Association rules keyed by canonical (sorted, integer-coded) antecedents.
+
+    Rules are stored as flat CSR-style arrays over an item vocabulary. For lookup,
+    every antecedent is a row of a sparse antecedent x item matrix holding the summed
+    ``confidence * lift`` it contributes to each consequent item. A cart only probes antecedents that can match: subsets of its
+    items up to the longest antecedent in the rule set, or, when fewer, the rules
+    listed under the cart's items in an inverted index.
+    """
+
+    def __init__(self, items, ante_indptr, ante_codes, cons_indptr, cons_codes, confidence, lift):
+        self.items = np.asarray(items)
+        self.ante_indptr, self.ante_codes = np.asarray(ante_indptr), np.asarray(ante_codes)
+        self.cons_indptr, self.cons_codes = np.asarray(cons_indptr), np.asarray(cons_codes)
+        self.confidence, self.lift = np.asarray(confidence), np.asarray(lift)
+        self._codes = {str(item): i for i, item in enumerate(self.items)}
+        weights = {}
+        for i, weight in enumerate(self.confidence * self.lift):
+            key = tuple(sorted(int(c) for c in self.ante_codes[self.ante_indptr[i]:self.ante_indptr[i + 1]]))
+            target = weights.setdefault(key, {})
+            for c in self.cons_codes[self.cons_indptr[i]:self.cons_indptr[i + 1]]:
+                target[int(c)] = target.get(int(c), 0) + weight
+        self._rules = {key: row for row, key in enumerate(weights)}
+        rows = [row for row, w in enumerate(weights.values()) for _ in w]
+        cols = [c for w in weights.values() for c in w]
+        vals = [v for w in weights.values() for v in w.values()]
+        self._weights = sparse.csr_matrix((vals, (rows, cols)), shape=(len(weights), len(self.items)), dtype=np.float64)
+        self._by_first = {}
+        for key in self._rules:
+            self._by_first.setdefault(key[0], []).append(key)
+        self.max_antecedent_len = max((len(key) for key in self._rules), default=0)
+
+    @classmethod
+    def from_frame(cls, rules):
+        vocab = sorted(set().union(*rules['antecedents'], *rules['consequents'])) if len(rules) else []
+        codes = {item: i for i, item in enumerate(vocab)}
+        ante = [sorted(codes[item] for item in itemset) for itemset in rules['antecedents']]
+        cons = [sorted(codes[item] for item in itemset) for itemset in rules['consequents']]
+        return cls(np.array(vocab, dtype=str),
+                   np.cumsum([0] + [len(a) for a in ante]), np.array([c for a in ante for c in a], dtype=np.int32),
+                   np.cumsum([0] + [len(c) for c in cons]), np.array([c for cs in cons for c in cs], dtype=np.int32),
+                   rules['confidence'].to_numpy(dtype=np.float64), rules['lift'].to_numpy(dtype=np.float64))
+
+    def to_arrays(self):
+        return {'items': self.items, 'ante_indptr': self.ante_indptr, 'ante_codes': self.ante_codes,
+                'cons_indptr': self.cons_indptr, 'cons_codes': self.cons_codes,
+                'confidence': self.confidence, 'lift': self.lift}
+
+    def __len__(self):
+        return len(self.confidence)
+
+    def encode(self, items):
+        return sorted({self._codes[item] for item in items if item in self._codes})
+
+    def matching_antecedents(self, codes):
+        """Antecedent keys fully contained in the sorted item codes ``codes``."""
+        max_len = min(self.max_antecedent_len, len(codes))
+        n_probes = sum(comb(len(codes), r) for r in range(1, max_len + 1))
+        n_candidates = sum(len(self._by_first.get(c, ())) for c in codes)
+        if n_probes <= n_candidates:
+            return [key for r in range(1, max_len + 1) for key in combinations(codes, r) if key in self._rules]
+        present = set(codes)
+        return [key for c in codes for key in self._by_first.get(c, ()) if present.issuperset(key)]
+
+    def score_cart(self, cart):
+        """Summed ``confidence * lift`` of every item recommended by a rule matching ``cart``."""
+        codes = self.encode(cart)
+        matched = self._weights[[self._rules[key] for key in self.matching_antecedents(codes)]]
+        scores = np.asarray(matched.sum(axis=0)).ravel()
+        hit = np.zeros(len(self.items), dtype=bool)
+        hit[matched.indices] = True
+        hit[codes] = False
+        return {str(self.items[j]): float(scores[j]) for j in np.flatnonzero(hit)}
+
+def build_market_basket_rules(items_df, min_support=0.001, min_lift=1.5, algorithm=DEFAULT_ALGORITHM, encoding=None):
+    """``items_df`` is a ``BasketStore`` or an ``items_data`` frame."""
+    if encoding is None:
+        encoding = as_baskets(items_df).to_encoding()
+    _, rules = mine_rules(encoding, min_support, metric='lift', min_threshold=min_lift, algorithm=algorithm)
     rules = rules.sort_values(by='confidence')
-    
-    mba_rules = {}
-    for _, row in rules.iterrows():
-        key = tuple(row['antecedents'])
-        if key not in mba_rules:
-            mba_rules[key] = []
-        mba_rules[key].append((row['consequents'], row['confidence'], row['lift']))
-    return mba_rules
-
-def build_popular_catalogue(df):
-    popular_catalogue = {}
-    for sub_cat in df['Sub-Category'].value_counts().index:
-        popular_catalogue[sub_cat] = df[df['Sub-Category'] == sub_cat].groupby('Product Name').size().nlargest(2).index.to_list()
-    return popular_catalogue
+    return RuleIndex.from_frame(rules)
+
+def build_incremental_rules(items_df, min_support=0.001, algorithm=DEFAULT_ALGORITHM):
+    """Itemset support counts for ``items_df``, to be extended with ``update_market_basket_rules``."""
+    return IncrementalItemsets.mine(as_baskets(items_df).to_encoding(), min_support, algorithm)
+
+def update_market_basket_rules(state, new_items_df, min_lift=1.5, algorithm=DEFAULT_ALGORITHM):
+    """Fold the baskets of ``new_items_df`` (whole new days from ``items_data``) into ``state``.
+
+    Returns the new state and its RuleIndex, equal to what ``build_market_basket_rules``
+    gives for the full history.
+    """
+    state = state.update(as_baskets(new_items_df).to_encoding(), algorithm)
+    rules = state.rules(metric='lift', min_threshold=min_lift).sort_values(by='confidence')
+    return state, RuleIndex.from_frame(rules)
+
+class PopularCatalogue(Mapping):
+    """Read-only sub-category -> best-selling product names.
+
+    The full per-sub-category ranking is kept; lookups return the top
+    ``per_category`` names. ``version`` identifies the source data it was built from.
+    """
+
+    def __init__(self, ranked, per_category=2, version=None):
+        self._ranked = ranked if isinstance(ranked, MappingProxyType) else MappingProxyType({k: tuple(v) for k, v in ranked.items()})
+        self.per_category = per_category
+        self.version = version
+
+    def __getitem__(self, sub_cat):
+        return list(self._ranked[sub_cat][:self.per_category])
+
+    def __iter__(self):
+        return iter(self._ranked)
+
+    def __len__(self):
+        return len(self._ranked)
+
+    def top(self, sub_cat, n=None, default=None):
+        if sub_cat not in self._ranked:
+            return [] if default is None else default
+        return list(self._ranked[sub_cat][:self.per_category if n is None else n])
+
+    def with_top_n(self, n):
+        if n == self.per_category:
+            return self
+        return PopularCatalogue(self._ranked, per_category=n, version=self.version)
+
+    def ranked(self):
+        return self._ranked
+
+def build_popular_catalogue(df, per_category=2, version=None):
+    counts = df.groupby(['Sub-Category', 'Product Name'], observed=True).size().rename('Orders').reset_index()
+    counts = counts.sort_values('Orders', ascending=False, kind='stable')
+    ranked = counts.groupby('Sub-Category', sort=False, observed=True)['Product Name'].agg(tuple)
+    order = df['Sub-Category'].value_counts().index
+    return PopularCatalogue({sub_cat: ranked[sub_cat] for sub_cat in order}, per_category=per_category, version=version)
+
+def encode_customer_items(items_df, customer_col='Customer Name', items_col='Items'):
+    """Customers x items boolean frame of everything each customer bought, from a ``BasketStore`` rollup."""
+    baskets = as_baskets(items_df, customer_col, items_col)
+    customers, owned = baskets.customer_matrix(customer_col)
+    bought = np.flatnonzero(owned.getnnz(axis=0))
+    return pd.DataFrame(owned[:, bought].toarray(), columns=list(baskets.items[bought]), index=customers)
 
 def build_similarity_matrix(items_df, customer_col='Customer Name', items_col='Items'):
-    cust_df = items_df.groupby(customer_col)[items_col].sum().reset_index()
-    tras = cust_df['Items'].to_list()
-    te = TransactionEncoder()
-    te_ary = te.fit(tras).transform(tras)
-    tedf = pd.DataFrame(te_ary, columns=te.columns_, index=cust_df['Customer Name'])
+    tedf = encode_customer_items(items_df, customer_col, items_col)
     similarity_matrix = cosine_similarity(tedf)
-    similarity_df = pd.DataFrame(similarity_matrix, index=cust_df['Customer Name'], columns=cust_df['Customer Name'])
+    similarity_df = pd.DataFrame(similarity_matrix, index=tedf.index, columns=tedf.index)
     return similarity_df, tedf
 
-def recommend_cf(target_user, similarity_df, tedf, top_n=6):
-    if target_user not in similarity_df.index:
-        return {}
-    similar_users = similarity_df[target_user].drop(target_user)
-    recommendations = {}
-    for similar_user in similar_users.index:
-        similarity_score = similar_users.loc[similar_user]
-        for item in tedf.columns:
-            if not tedf.loc[target_user, item] and tedf.loc[similar_user, item]:
-                recommendations[item] = recommendations.get(item, 0) + similarity_score
-    sorted_recommendations = sorted(recommendations.items(), key=lambda x: x[1], reverse=True)
-    return {item[0]: float(item[1]) for item in sorted_recommendations[:top_n]}
-
-def all_non_empty_subsets(s):
-    return [tuple(subset) for subset in chain.from_iterable(combinations(s, r) for r in range(1, len(s) + 1))]
-
-def recommend(name, rules, cart=None, category=None, similarity_df=None, tedf=None, df=None):
-    user_known = name in tedf.index
-    popular_catalogue = build_popular_catalogue(df)
+class CFEngine:
+    """Collaborative filtering over a sparse customer x sub-category ownership matrix.
+
+    Rows of ``similarity`` and ``owned`` are addressed by integer customer codes,
+    columns of ``owned`` by integer item codes. Scoring a customer is one
+    product of its similarity row with ``owned``, masked by what it already owns.
+    ``similarity`` is either a dense customer x customer array or the sparse
+    top-K matrix of a ``NeighbourIndex``.
+    """
+
+    def __init__(self, similarity, owned, users, items):
+        self.similarity = similarity
+        # CSR input (e.g. memory-mapped arrays from a bundle) is used as is, without copying
+        self.owned = owned if sparse.isspmatrix_csr(owned) else sparse.csr_matrix(owned, dtype=np.float32)
+        self.users = pd.Index(users)
+        self.items = pd.Index(items)
+        self._rows = {user: i for i, user in enumerate(self.users)}
+        self.item_counts = np.diff(self.owned.indptr)
+        # The first two owners of every item (in customer order) reproduce the
+        # insertion order the original dict-based scorer used to break ties.
+        owners = self.owned.tocsc()
+        owners.sort_indices()
+        n_owners = np.diff(owners.indptr)
+        start = owners.indptr[:-1]
+        padded = np.append(owners.indices, [len(self.users), len(self.users)])
+        self._first_owner = np.where(n_owners > 0, padded[start], len(self.users))
+        self._second_owner = np.where(n_owners > 1, padded[start + 1], len(self.users))
+
+    @classmethod
+    def from_frames(cls, similarity_df, tedf):
+        if not similarity_df.index.equals(tedf.index):
+            raise ValueError("similarity_df and tedf must share the same customer index")
+        return cls(similarity_df.to_numpy(), tedf.to_numpy(), tedf.index, tedf.columns)
+
+    @classmethod
+    def from_neighbours(cls, neighbours, tedf):
+        if not neighbours.users.equals(tedf.index):
+            raise ValueError("neighbour index and tedf must share the same customer index")
+        return cls(neighbours.matrix, tedf.to_numpy(), tedf.index, tedf.columns)
+
+    def __contains__(self, user):
+        return user in self._rows
+
+    def row(self, user):
+        return self._rows[user]
+
+    def item_count(self, user):
+        return int(self.item_counts[self._rows[user]])
+
+    def score_rows(self, rows):
+        """Return (scores, owned) dense arrays of shape (len(rows), n_items)."""
+        sim = self.similarity[rows]
+        scores = sim @ self.owned
+        if sparse.issparse(scores):
+            scores = scores.toarray()
+        return np.asarray(scores, dtype=np.float64), self.owned[rows].toarray() > 0
+
+    def _top_k(self, row, scores, owned, top_n):
+        first_other = np.where(self._first_owner == row, self._second_owner, self._first_owner)
+        idx = np.flatnonzero(~owned & (first_other < len(self.users)))
+        if len(idx) > top_n:
+            s = scores[idx]
+            kth = s[np.argpartition(-s, top_n - 1)[top_n - 1]]
+            idx = idx[s >= kth]
+        order = np.lexsort((idx, first_other[idx], -scores[idx]))[:top_n]
+        return {self.items[j]: float(scores[j]) for j in idx[order]}
+
+    def recommend(self, user, top_n=6):
+        if user not in self._rows:
+            return {}
+        row = self._rows[user]
+        scores, owned = self.score_rows([row])
+        return self._top_k(row, scores[0], owned[0], top_n)
+
+    def recommend_batch(self, users, top_n=6, block_size=1024):
+        results = {user: {} for user in users}
+        known = [user for user in results if user in self._rows]
+        for start in range(0, len(known), block_size):
+            block = known[start:start + block_size]
+            rows = [self._rows[user] for user in block]
+            scores, owned = self.score_rows(rows)
+            for i, (user, row) in enumerate(zip(block, rows)):
+                results[user] = self._top_k(row, scores[i], owned[i], top_n)
+        return results
+
+def build_cf_engine(items_df, k=50, block_size=1024, customer_col='Customer Name', items_col='Items', method='exact', **params):
+    """CF engine over top-k neighbours; ``method='minhash'`` swaps exact cosine for the MinHash/LSH approximation."""
+    tedf = encode_customer_items(items_df, customer_col, items_col)
+    neighbours = neighbour_index(tedf.to_numpy(), tedf.index, method, k=k, block_size=block_size, **params)
+    return CFEngine.from_neighbours(neighbours, tedf)
+
+def recommend_cf(target_user, engine, top_n=6):
+    return engine.recommend(target_user, top_n)
+
+def recommend_cf_batch(users, engine, top_n=6):
+    return engine.recommend_batch(users, top_n)
+
+def recommend(name, rules, cart=None, category=None, engine=None, catalogue=None, per_category=2, cf=None):
+    # Timed per branch under span 'recommend.<request type>', with the costly steps as child spans
+    with span(f'recommend.{request_type(name, cart, category, engine)}'):
+        return _recommend(name, rules, cart, category, engine, catalogue, per_category, cf)
+
+def _recommend(name, rules, cart, category, engine, catalogue, per_category, cf):
+    user_known = name in engine
+    if user_known and cf is None:
+        with span('recommend.cf'):
+            cf = recommend_cf(name, engine)
+    popular_catalogue = catalogue.with_top_n(per_category)
     if cart is None and category is None and user_known:
-        recom = recommend_cf(name, similarity_df, tedf)
-        return [item for sublist in [popular_catalogue.get(i[0], [i[0]]) for i in recom][:4] for item in sublist]
+        recom = cf
+        return [item for sublist in [popular_catalogue.get(i, [i]) for i in list(recom)[:4]] for item in sublist]
 
     if cart is None and category is not None and not user_known:
         return popular_catalogue.get(category, [])
 
     if cart is None and category is not None and user_known:
-        recom = recommend_cf(name, similarity_df, tedf)
+        recom = cf
         filtered = [item for sublist in [popular_catalogue.get(i, []) for i in recom] for item in sublist][:4]
         extra = popular_catalogue.get(category, [])
         filtered.extend(extra)
@@ -72,31 +285,43 @@ def recommend(name, rules, cart=None, category=None, similarity_df=None, tedf=No
 
     if cart is not None:
         if user_known:
-            item_count = tedf.loc[name].sum()
+            item_count = engine.item_count(name)
             alpha = 0.7 if item_count > 5 else 0.3
         else:
             alpha = 0
         beta = 1 - alpha
-        cart = set(cart)
         recommendations = {}
-        mba={}
         cf_n={}
-        for itemsets in all_non_empty_subsets(cart):
-            for r, c, l in rules.get(itemsets, []):  
-                filtered_r = set(r) - cart 
-                for item in filtered_r:
-                    mba[item] = mba.get(item, 0) + (c * l)
-        if(name in tedf.index):
-            cf = recommend_cf(name,similarity_df,tedf)
-            cf_max = max(cf.values(),default=1)
-            cf_n = {item[0]:item[1]/cf_max for item in cf.items()}
-        mba_max = max(mba.values(),default=1)  
-        mba_n = {item[0]:item[1]/mba_max for item in mba.items()}
-        for item in set(cf_n.keys()).union(set(mba_n.keys())):
-            recommendations[item] = alpha * cf_n.get(item, 0) + beta * mba_n.get(item, 0)
-        sorted_recommendations = sorted(recommendations.items(), key=lambda x: x[1], reverse=True)
-        rec = [popular_catalogue.get(i[0], [i[0]]) for i in sorted_recommendations][:4]
+        with span('recommend.score_cart'):
+            mba = rules.score_cart(cart)
+        with span('recommend.rank'):
+            if user_known:
+                cf_max = max(cf.values(),default=0) or 1
+                cf_n = {item[0]:item[1]/cf_max for item in cf.items()}
+            mba_max = max(mba.values(),default=1)
+            mba_n = {item[0]:item[1]/mba_max for item in mba.items()}
+            for item in sorted(set(cf_n.keys()).union(set(mba_n.keys()))):
+                recommendations[item] = alpha * cf_n.get(item, 0) + beta * mba_n.get(item, 0)
+            sorted_recommendations = sorted(recommendations.items(), key=lambda x: x[1], reverse=True)
+            rec = [popular_catalogue.get(i[0], [i[0]]) for i in sorted_recommendations][:4]
         return [item for sublist in rec for item in sublist]
 
     # Default fallback
     return [item for sublist in list(popular_catalogue.values())[:4] for item in sublist[:1]]
+
+def request_type(name, cart=None, category=None, engine=None):
+    known = 'known' if name in engine else 'unknown'
+    if cart is not None:
+        return f'cart_{known}'
+    if category is not None:
+        return f'category_{known}'
+    return 'cf' if known == 'known' else 'fallback'
+
+def recommend_many(requests, rules, engine, catalogue):
+    """Score a list of request dicts; CF for every known customer runs as one batch."""
+    cf_users = {r['customer_name'] for r in requests if r['customer_name'] in engine}
+    with span('recommend_many.cf'):
+        cf = engine.recommend_batch(sorted(cf_users))
+    return [recommend(r['customer_name'], rules, r.get('cart'), r.get('category'), engine, catalogue,
+                      per_category=r.get('per_category') or 2, cf=cf.get(r['customer_name']))
+            for r in requests]
@@ -0,0 +1,65 @@
+"""Headless plot rendering, decoupled from the analyses that produce the data.
+
+Analysis functions describe each figure as a ``Plot``: the output path, a
+module-level ``draw(ax, **data)`` function and the data it needs. Specs are
+plain picklable objects, so ``render`` can draw them in a process pool. Drawing
+uses Agg ``Figure`` objects directly and never touches pyplot's global state.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+import matplotlib.style
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+class Plot:
+    def __init__(self, path, draw, figsize=(6.4, 4.8), dpi=100, tight_layout=True, **data):
+        self.path = path
+        self.draw = draw
+        self.figsize = figsize
+        self.dpi = dpi
+        self.tight_layout = tight_layout
+        self.data = data
+
+    def __repr__(self):
+        return f"Plot({self.path!r})"
+
+def draw_frame(ax, frame, title=None, xlabel=None, ylabel=None, legend_title=None, grid=False, **kwargs):
+    """Draw a Series/DataFrame with pandas plotting; ``kwargs`` go to ``.plot``."""
+    frame.plot(ax=ax, **kwargs)
+    if title is not None:
+        ax.set_title(title)
+    if xlabel is not None:
+        ax.set_xlabel(xlabel)
+    if ylabel is not None:
+        ax.set_ylabel(ylabel)
+    if legend_title is not None:
+        ax.legend(title=legend_title)
+    if grid:
+        ax.grid(True)
+
+def render_plot(plot, style=None):
+    with matplotlib.style.context(style or {}):
+        figure = Figure(figsize=plot.figsize)
+        FigureCanvasAgg(figure)
+        plot.draw(figure.add_subplot(), **plot.data)
+        if plot.tight_layout:
+            figure.tight_layout()
+        figure.savefig(plot.path, dpi=plot.dpi)
+    return plot.path
+
+def render(plots, workers=1, style=None):
+    """Render ``plots`` (in a pool of ``workers`` processes) and return the written paths."""
+    plots = list(plots)
+    for directory in {os.path.dirname(plot.path) for plot in plots} - {''}:
+        os.makedirs(directory, exist_ok=True)
+    if workers <= 1 or len(plots) <= 1:
+        return [render_plot(plot, style) for plot in plots]
+    with ProcessPoolExecutor(max_workers=min(workers, len(plots))) as pool:
+        return list(pool.map(render_plot, plots, [style] * len(plots)))
+
+def emit(plots, *specs):
+    """Queue ``specs`` on the ``plots`` collector, or render them right away when there is none."""
+    if plots is None:
+        render(specs)
+    else:
+        plots.extend(specs)
@@ -1,87 +1,70 @@
 import pandas as pd
-import matplotlib.pyplot as plt
 import os
+from .rendering import Plot, draw_frame, emit
 dark_colors = [
     '#1f2f3f', '#2e3b4e', '#3c4a5d', '#4b596c', '#5a687b',
     '#6a798c', '#7b8c9f', '#8c9fb2', '#9eb2c5', '#b1c6d9'
 ]
-def analyze_categories(df, output_dir = 'docs/visualizations'):
+def summarize_categories(df):
+    # Sales is stored as float32; totals are accumulated in float64
+    df = df[['Category', 'Sub-Category', 'Sales']].astype({'Sales': 'float64'})
     summary = (
-        df.groupby(['Category', 'Sub-Category'])
+        df.groupby(['Category', 'Sub-Category'], observed=True)
         .agg(Total_Sales=('Sales', 'sum'), Count=('Sales', 'count'))
         .reset_index()
     )
     category_totals = (
-        df.groupby('Category')
+        df.groupby('Category', observed=True)
         .agg(Total_Sales=('Sales', 'sum'), Count=('Sales', 'count'))
         .reset_index()
     )
-    plt.figure(figsize=(6, 6))
-    plt.pie(category_totals['Total_Sales'], labels=category_totals['Category'], autopct='%1.1f%%', startangle=140, colors=dark_colors[:len(category_totals)])
-    plt.title('Total Sales by Category')
-    plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, 'sales_by_category.png'))
-    plt.close()
+    return summary, category_totals
+
+def _draw_pie(ax, values, labels, title, colors):
+    ax.pie(values, labels=labels, autopct='%1.1f%%', startangle=140, colors=colors)
+    ax.set_title(title)
 
+def plot_categories(summary, category_totals, output_dir='docs/visualizations', plots=None):
+    specs = [Plot(os.path.join(output_dir, 'sales_by_category.png'), _draw_pie, figsize=(6, 6),
+                  values=category_totals['Total_Sales'], labels=category_totals['Category'],
+                  title='Total Sales by Category', colors=dark_colors[:len(category_totals)])]
     for category in summary['Category'].unique():
         sub_df = summary[summary['Category'] == category]
-        plt.figure(figsize=(6, 6))
-        plt.pie(sub_df['Total_Sales'], labels=sub_df['Sub-Category'], autopct='%1.1f%%', startangle=140, colors=dark_colors[:len(sub_df)])
-        plt.title(f'Total Sales in {category}')
-        plt.tight_layout()
         filename = f'sales_by_subcategory_in_{category.lower().replace(" ", "_")}.png'
-        plt.savefig(os.path.join(output_dir, filename))
-        plt.close()
+        specs.append(Plot(os.path.join(output_dir, filename), _draw_pie, figsize=(6, 6),
+                          values=sub_df['Total_Sales'], labels=sub_df['Sub-Category'],
+                          title=f'Total Sales in {category}', colors=dark_colors[:len(sub_df)]))
+    emit(plots, *specs)
 
+def analyze_categories(df, output_dir = 'docs/visualizations', plots=None):
+    summary, category_totals = summarize_categories(df)
+    plot_categories(summary, category_totals, output_dir, plots)
     return summary, category_totals
 
-def analyze_time_trends(daily_sales: pd.DataFrame, output_dir='docs/visualizations'):
+def analyze_time_trends(daily_sales: pd.DataFrame, output_dir='docs/visualizations', plots=None):
     daily_sales['30_day_avg'] = daily_sales['sales'].rolling(window=30).mean()
-    
-    plt.figure(figsize=(12,6))
-    daily_sales['sales'].plot(title='Daily Sales')
-    plt.ylabel('Sales')
-    plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, 'daily_sales.png'))
-    plt.close()
-    
-    plt.figure(figsize=(12,6))
-    daily_sales['30_day_avg'].plot(title='30-Day Rolling Average of Sales', color='orange')
-    plt.ylabel('Sales')
-    plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, 'rolling_avg_30_day.png'))
-    plt.close()
-    
     monthly_mean = daily_sales['sales'].resample('ME').sum()
-    plt.figure(figsize=(12,6))
-    monthly_mean.plot(title='Monthly Sales Total', color='purple')
-    plt.ylabel('Sales')
-    plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, 'monthly_sales_every_year.png'))
-    plt.close()
-    
     daily_sales['month'] = daily_sales.index.month_name()
     monthly_avg = daily_sales.groupby('month')['sales'].mean()
     monthly_avg = monthly_avg.reindex([
         'January', 'February', 'March', 'April', 'May', 'June',
         'July', 'August', 'September', 'October', 'November', 'December'
     ])
-    plt.figure(figsize=(12,6))
-    monthly_avg.plot(kind='bar', color='purple', title='Average Monthly Sales Across Years')
-    plt.ylabel('Average Sales')
-    plt.tight_layout()
-    plt.savefig(os.path.join(output_dir,'monthly_average.png'))
-    plt.close()
+    emit(
+        plots,
+        Plot(os.path.join(output_dir, 'daily_sales.png'), draw_frame, figsize=(12, 6),
+             frame=daily_sales['sales'], title='Daily Sales', ylabel='Sales'),
+        Plot(os.path.join(output_dir, 'rolling_avg_30_day.png'), draw_frame, figsize=(12, 6),
+             frame=daily_sales['30_day_avg'], title='30-Day Rolling Average of Sales', ylabel='Sales', color='orange'),
+        Plot(os.path.join(output_dir, 'monthly_sales_every_year.png'), draw_frame, figsize=(12, 6),
+             frame=monthly_mean, title='Monthly Sales Total', ylabel='Sales', color='purple'),
+        Plot(os.path.join(output_dir, 'monthly_average.png'), draw_frame, figsize=(12, 6),
+             frame=monthly_avg, title='Average Monthly Sales Across Years', ylabel='Average Sales', kind='bar', color='purple'),
+    )
     return monthly_avg
 
-def plot_sales_by_region_segment(df, output_path='docs/visualizations/region_segment_sales.png'):
-    sales_pivot = df.groupby(['Region', 'Segment'])['Sales'].sum().unstack()
-    ax = sales_pivot.plot(kind='barh', figsize=(10, 6), colormap='Set2')
-    plt.title('Sales by Region and Segment')
-    plt.xlabel('Total Sales')
-    plt.ylabel('Region')
-    plt.legend(title='Segment')
-    plt.tight_layout()
-    plt.savefig(output_path)
-    plt.close()
-    return sales_pivot
\ No newline at end of file
+def plot_sales_by_region_segment(df, output_path='docs/visualizations/region_segment_sales.png', plots=None):
+    sales_pivot = df[['Region', 'Segment', 'Sales']].astype({'Sales': 'float64'}).groupby(['Region', 'Segment'], observed=True)['Sales'].sum().unstack()
+    emit(plots, Plot(output_path, draw_frame, figsize=(10, 6), frame=sales_pivot, kind='barh', colormap='Set2',
+                     title='Sales by Region and Segment', xlabel='Total Sales', ylabel='Region', legend_title='Segment'))
+    return sales_pivot
@@ -0,0 +1,155 @@
+"""Chunked ingestion of the raw CSV for histories that do not fit in memory.
+
+The CSV is read ``chunksize`` rows at a time and folded into the aggregates the
+analyses consume, so peak memory is one chunk plus the aggregates themselves
+(one row per day, per customer and per sub-category). Baskets cannot be folded
+the same way: the CSV is not date-ordered, so no day is ever complete. Each
+chunk's baskets are spilled to a temporary directory in ``BasketStore`` layout
+instead, as (day, customer) codes and sizes per basket plus one int32 item code
+per line, and ``baskets`` merges them into a memory-mapped store. Each accessor
+returns the same frame as its in-memory counterpart in ``data_preprocessing`` /
+``sales_analysis``.
+"""
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from .baskets import BasketStore
+from .data_preprocessing import DATE_FORMAT, REF_DATE, lifecycle
+
+# Baskets gathered per block when merging the spilled item codes
+MERGE_BLOCK = 1 << 16
+COLUMNS = ['Order Date', 'Order ID', 'Customer ID', 'Customer Name', 'Segment', 'Category', 'Sub-Category', 'Sales']
+
+def read_chunks(file_path, chunksize=100_000):
+    """Yield typed chunks of the CSV with ``Order Date`` parsed, in file order."""
+    # Labels stay plain strings: per-chunk categoricals would not share categories
+    for chunk in pd.read_csv(file_path, usecols=COLUMNS, dtype={'Sales': 'float32'}, chunksize=chunksize):
+        chunk['Order Date'] = pd.to_datetime(chunk['Order Date'], format=DATE_FORMAT)
+        yield chunk
+
+class StreamingAggregates:
+    def __init__(self, spill_dir=None):
+        self.rows = 0
+        self.daily_sales = pd.Series(dtype='float64')
+        self.category_sales = None
+        self.customers = None
+        # Labels get codes in order of first appearance; baskets hold codes only
+        self.customer_codes = {}
+        self.item_codes = {}
+        # Removed with the aggregates; stores from ``baskets`` keep their mapping open
+        self.spill = tempfile.TemporaryDirectory(prefix='baskets-', dir=spill_dir)
+        self.basket_chunks = 0
+        self.lines = 0
+
+    def update(self, chunk):
+        self.rows += len(chunk)
+        sales = chunk['Sales'].astype('float64')
+        daily = sales.groupby(chunk['Order Date']).sum()
+        self.daily_sales = self.daily_sales.add(daily, fill_value=0)
+
+        categories = sales.groupby([chunk['Category'], chunk['Sub-Category']]).agg(Total_Sales='sum', Count='count')
+        self.category_sales = categories if self.category_sales is None else self.category_sales.add(categories, fill_value=0)
+
+        customers = chunk.groupby('Customer ID').agg(**{
+            'Customer Name': ('Customer Name', 'first'),
+            'Segment': ('Segment', 'first'),
+            'First Purchase': ('Order Date', 'min'),
+            'Last Purchase': ('Order Date', 'max'),
+            'No of purchases': ('Order ID', 'count'),
+        })
+        if self.customers is not None:
+            customers = pd.concat([self.customers, customers]).groupby(level=0).agg({
+                'Customer Name': 'first', 'Segment': 'first', 'First Purchase': 'min', 'Last Purchase': 'max', 'No of purchases': 'sum',
+            })
+        self.customers = customers
+
+        # A (day, customer) basket can be split across chunks; the parts are merged in ``baskets``
+        customer = _codes(self.customer_codes, chunk['Customer Name'])
+        item = _codes(self.item_codes, chunk['Sub-Category'])
+        dates = chunk['Order Date'].to_numpy().astype(np.int64)
+        order = np.lexsort((customer, dates))
+        dates, customer = dates[order], customer[order]
+        new_basket = np.ones(len(order), dtype=bool)
+        new_basket[1:] = (dates[1:] != dates[:-1]) | (customer[1:] != customer[:-1])
+        starts = np.flatnonzero(new_basket)
+        np.savez(self._spilled(f'{self.basket_chunks}.npz'), dates=dates[starts], customer=customer[starts],
+                 sizes=np.diff(np.append(starts, len(order))).astype(np.int32))
+        with open(self._spilled('codes.i32'), 'ab') as f:
+            f.write(item[order].tobytes())
+        self.basket_chunks += 1
+        self.lines += len(order)
+        return self
+
+    def _spilled(self, name):
+        return os.path.join(self.spill.name, name)
+
+    def sales_data(self):
+        """Daily sales, as ``data_preprocessing.sales_data``."""
+        return pd.DataFrame({'sales': self.daily_sales.sort_index().rename_axis('Order Date')})
+
+    def customer_purchases(self, ref_date=REF_DATE):
+        """Per-customer lifecycle table, as ``data_preprocessing.customer_table``."""
+        customers = self.customers.sort_index().rename_axis('Customer ID')
+        return lifecycle(customers.astype({'No of purchases': 'int64'}), ref_date)
+
+    def baskets(self):
+        """Per-day baskets as a ``BasketStore`` in ``items_data`` order; items keep file order.
+
+        Only the per-basket keys are read into memory. The item codes are merged
+        block by block into a memory-mapped file in the spill directory.
+        """
+        parts = []
+        for i in range(self.basket_chunks):
+            with np.load(self._spilled(f'{i}.npz')) as part:
+                parts.append((part['dates'], part['customer'], part['sizes']))
+        dates, customer, sizes = (np.concatenate(arrays) for arrays in zip(*parts))
+        # Codes were handed out in order of appearance; recode to the sorted labels
+        customers = np.sort(np.array(list(self.customer_codes), dtype=str))
+        items = pd.Index(np.sort(np.array(list(self.item_codes), dtype=str)), name='Item')
+        customer = np.searchsorted(customers, np.array(list(self.customer_codes), dtype=str))[customer]
+        recode = np.searchsorted(items, np.array(list(self.item_codes), dtype=str)).astype(np.int32)
+        starts = np.zeros(len(sizes) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=starts[1:])
+        # The sort is stable, so the parts of a basket split across chunks stay in file order
+        order = np.lexsort((customer, dates))
+        dates, customer, sizes = dates[order], customer[order], sizes[order]
+        indptr = np.zeros(len(order) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=indptr[1:])
+        spilled = np.memmap(self._spilled('codes.i32'), dtype=np.int32, mode='r') if self.lines else np.zeros(0, dtype=np.int32)
+        fd, path = tempfile.mkstemp(suffix='.npy', dir=self.spill.name)
+        os.close(fd)
+        codes = np.lib.format.open_memmap(path, mode='w+', dtype=np.int32, shape=(self.lines,))
+        for block in range(0, len(order), MERGE_BLOCK):
+            rows = order[block:block + MERGE_BLOCK]
+            begin, end = indptr[block], indptr[block + len(rows)]
+            lines = np.repeat(starts[rows] - indptr[block:block + len(rows)], sizes[block:block + len(rows)]) + np.arange(begin, end)
+            codes[begin:end] = recode[spilled[lines]]
+        codes.flush()
+        new_basket = np.ones(len(order), dtype=bool)
+        new_basket[1:] = (dates[1:] != dates[:-1]) | (customer[1:] != customer[:-1])
+        first = np.flatnonzero(new_basket)
+        keys = pd.DataFrame({'Order Date': pd.DatetimeIndex(dates[first]), 'Customer Name': pd.Categorical.from_codes(customer[first], customers)})
+        return BasketStore(keys, np.append(indptr[first], indptr[-1]), codes, items)
+
+    def items_data(self):
+        """Per-day baskets, as ``data_preprocessing.items_data``; items keep file order."""
+        return self.baskets().to_frame()
+
+    def category_summary(self):
+        """``(summary, category_totals)`` as returned by ``sales_analysis.analyze_categories``."""
+        summary = self.category_sales.sort_index().astype({'Count': 'int64'}).reset_index()
+        category_totals = summary.groupby('Category').agg(Total_Sales=('Total_Sales', 'sum'), Count=('Count', 'sum')).reset_index()
+        return summary, category_totals
+
+def _codes(vocabulary, labels):
+    """Integer codes of ``labels``, adding unseen labels to the ``vocabulary`` dict."""
+    for label in pd.unique(labels):
+        vocabulary.setdefault(label, len(vocabulary))
+    return labels.map(vocabulary).to_numpy(dtype=np.int32)
+
+def stream_aggregates(file_path, chunksize=100_000, spill_dir=None):
+    aggregates = StreamingAggregates(spill_dir)
+    for chunk in read_chunks(file_path, chunksize):
+        aggregates.update(chunk)
+    return aggregates
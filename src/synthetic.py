@@ -0,0 +1,166 @@
+"""Synthetic order data in the Superstore ``train.csv`` schema, at any scale.
+
+Marginals follow the real file: sub-category mix and price levels, segment,
+region and ship-mode shares, the monthly seasonality and yearly growth, and
+the lines-per-order distribution. Each customer favours a few sub-categories,
+so baskets carry enough structure for the rule miner and the CF engine to find
+something. Generation is vectorized; high-cardinality strings are built once per
+customer/product/day and written as categoricals. Usage::
+
+    python -m src.synthetic data/synthetic/orders.csv --orders 500000 --customers 80000
+"""
+import argparse
+import os
+import numpy as np
+import pandas as pd
+
+COLUMNS = ['Row ID', 'Order ID', 'Order Date', 'Ship Date', 'Ship Mode', 'Customer ID', 'Customer Name', 'Segment', 'Country',
+           'City', 'State', 'Postal Code', 'Region', 'Product ID', 'Category', 'Sub-Category', 'Product Name', 'Sales']
+# Sub-category -> (category, order lines in train.csv, median line sales)
+SUB_CATEGORIES = {
+    'Bookcases': ('Furniture', 226, 304.5), 'Chairs': ('Furniture', 607, 359.8), 'Furnishings': ('Furniture', 931, 42.0),
+    'Tables': ('Furniture', 314, 450.4), 'Appliances': ('Office Supplies', 459, 83.4), 'Art': ('Office Supplies', 785, 15.5),
+    'Binders': ('Office Supplies', 1492, 18.5), 'Envelopes': ('Office Supplies', 248, 28.6), 'Fasteners': ('Office Supplies', 214, 10.6),
+    'Labels': ('Office Supplies', 357, 14.9), 'Paper': ('Office Supplies', 1338, 26.7), 'Storage': ('Office Supplies', 832, 112.6),
+    'Supplies': ('Office Supplies', 184, 27.6), 'Accessories': ('Technology', 756, 100.0), 'Copiers': ('Technology', 66, 1100.0),
+    'Machines': ('Technology', 115, 600.0), 'Phones': ('Technology', 876, 210.9),
+}
+SEGMENTS = {'Consumer': 0.521, 'Corporate': 0.301, 'Home Office': 0.178}
+SHIP_MODES = {'Standard Class': 0.598, 'Second Class': 0.194, 'First Class': 0.153, 'Same Day': 0.055}
+# (City, State, Postal Code, Region); cities are drawn so that regions keep their train.csv shares
+LOCATIONS = [
+    ('Los Angeles', 'California', 90036, 'West'), ('Seattle', 'Washington', 98103, 'West'), ('West Jordan', 'Utah', 84084, 'West'),
+    ('New York City', 'New York', 10024, 'East'), ('Philadelphia', 'Pennsylvania', 19140, 'East'), ('Dover', 'Delaware', 19901, 'East'),
+    ('Fort Worth', 'Texas', 76106, 'Central'), ('Madison', 'Wisconsin', 53711, 'Central'), ('Fremont', 'Nebraska', 68025, 'Central'),
+    ('Henderson', 'Kentucky', 42420, 'South'), ('Fort Lauderdale', 'Florida', 33311, 'South'), ('Concord', 'North Carolina', 28027, 'South'),
+]
+REGIONS = {'West': 0.32, 'East': 0.284, 'Central': 0.232, 'South': 0.163}
+MONTHS = [0.037, 0.03, 0.069, 0.067, 0.074, 0.071, 0.071, 0.071, 0.138, 0.083, 0.148, 0.141]
+YEARS = {2015: 1953, 2016: 2055, 2017: 2534, 2018: 3258}
+# P(order has n lines) for n = 1, 2, ...
+BASKET_SIZES = [0.5077, 0.2434, 0.1199, 0.0677, 0.0311, 0.014, 0.0098, 0.003, 0.002, 0.0006, 0.0004, 0.0002, 0.0002, 0.0002]
+FIRST_NAMES = ['Claire', 'Darrin', 'Sean', 'Brosina', 'Andrew', 'Irene', 'Harold', 'Pete', 'Alejandro', 'Zuschuss',
+               'Ken', 'Sandra', 'Emily', 'Eric', 'Tracy', 'Matt', 'Gene', 'Steve', 'Linda', 'Ruben']
+LAST_NAMES = ['Gute', 'Hoffman', 'Van Huff', "O'Donnell", 'Allen', 'Maddox', 'Pawlan', 'Kriz', 'Grove', 'Carroll',
+              'Black', 'Flathers', 'Grady', 'Hoffmann', 'Blumstein', 'Abelman', 'Hale', 'Nguyen', 'Cazamias', 'Ausman']
+
+def _probabilities(weights):
+    weights = np.asarray(weights, dtype=np.float64)
+    return weights / weights.sum()
+
+def _customer_names(n):
+    first, last = np.array(FIRST_NAMES), np.array(LAST_NAMES)
+    i = np.arange(n)
+    names = pd.Series(first[i % len(first)]).str.cat(last[(i // len(first)) % len(last)], sep=' ')
+    repeat = i // (len(first) * len(last))
+    names[repeat > 0] = names[repeat > 0] + ' ' + (repeat[repeat > 0] + 1).astype(str)
+    initials = pd.Series(first[i % len(first)]).str[0] + pd.Series(last[(i // len(first)) % len(last)]).str[0]
+    return names.to_numpy(), (initials + '-' + pd.Series(10000 + i).astype(str)).to_numpy()
+
+def generate_orders(orders=5000, customers=800, products=1800, basket_sizes=BASKET_SIZES, seed=0):
+    """Order lines for ``orders`` orders by ``customers`` customers over ``products`` products.
+
+    ``basket_sizes[n - 1]`` is the probability that an order has ``n`` lines.
+    The result has the columns and string formats of ``train.csv``.
+    """
+    rng = np.random.default_rng(seed)
+    subs = list(SUB_CATEGORIES)
+    categories = np.array([SUB_CATEGORIES[s][0] for s in subs])
+    sub_weights = _probabilities([SUB_CATEGORIES[s][1] for s in subs])
+    median_sales = np.array([SUB_CATEGORIES[s][2] for s in subs])
+
+    # Products: every sub-category gets at least one, popularity is heavy-tailed within a sub-category
+    product_sub = rng.choice(len(subs), products, p=sub_weights)
+    product_sub[:min(products, len(subs))] = np.arange(min(products, len(subs)))
+    product_price = median_sales[product_sub] * rng.lognormal(0, 0.6, products) / 2
+    product_popularity = rng.pareto(1.2, products) + 1
+
+    # Customers: segment, location, activity level and three favourite sub-categories
+    customer_segment = rng.choice(len(SEGMENTS), customers, p=_probabilities(list(SEGMENTS.values())))
+    location_weights = _probabilities([REGIONS[location[3]] for location in LOCATIONS])
+    customer_location = rng.choice(len(LOCATIONS), customers, p=location_weights)
+    customer_activity = _probabilities(rng.lognormal(0, 0.5, customers))
+    favourites = rng.choice(len(subs), (customers, 3), p=sub_weights)
+
+    # Orders: customer, date with the real seasonality and growth, number of lines
+    order_customer = rng.choice(customers, orders, p=customer_activity)
+    years = np.array(list(YEARS))
+    order_year = rng.choice(years, orders, p=_probabilities(list(YEARS.values())))
+    order_month = rng.choice(12, orders, p=_probabilities(MONTHS)) + 1
+    month_start = pd.to_datetime(pd.DataFrame({'year': order_year, 'month': order_month, 'day': 1})).to_numpy()
+    days_in_month = pd.DatetimeIndex(month_start).days_in_month.to_numpy()
+    first_day = np.datetime64(f'{years.min()}-01-01')
+    day = (month_start - first_day) // np.timedelta64(1, 'D') + (rng.random(orders) * days_in_month).astype(np.int64)
+    sizes = rng.choice(len(basket_sizes), orders, p=_probabilities(basket_sizes)) + 1
+
+    # Lines: half from the customer's favourites, half from the overall mix
+    line_order = np.repeat(np.arange(orders), sizes)
+    line_customer = order_customer[line_order]
+    line_sub = np.where(rng.random(len(line_order)) < 0.5, favourites[line_customer, rng.integers(0, 3, len(line_order))],
+                        rng.choice(len(subs), len(line_order), p=sub_weights))
+    line_product = np.empty(len(line_order), dtype=np.int64)
+    for sub in range(len(subs)):
+        rows = np.flatnonzero(line_sub == sub)
+        candidates = np.flatnonzero(product_sub == sub)
+        line_product[rows] = rng.choice(candidates, len(rows), p=_probabilities(product_popularity[candidates]))
+    sales = np.round(product_price[line_product] * rng.integers(1, 6, len(line_order)), 3)
+
+    # Strings, built once per day/customer/product/order and indexed by code
+    ship_day = day[line_order] + rng.integers(0, 8, len(line_order))
+    day_labels = pd.date_range(first_day, periods=ship_day.max() + 1, freq='D').strftime('%d/%m/%Y')
+    names, ids = _customer_names(customers)
+    product_labels = pd.Series(np.array(subs)[product_sub]) + ' ' + pd.Series(np.arange(products) + 1).astype(str).str.zfill(6)
+    product_ids = (pd.Series(categories[product_sub]).str[:3].str.upper() + '-' + pd.Series(np.array(subs)[product_sub]).str[:2].str.upper()
+                   + '-' + pd.Series(10000000 + np.arange(products)).astype(str))
+    order_ids = 'CA-' + pd.Series(order_year).astype(str) + '-' + pd.Series(100000 + np.arange(orders)).astype(str)
+    location = customer_location[line_customer]
+    city, state, postal, region = (np.array([l[i] for l in LOCATIONS]) for i in range(4))
+    ship_modes = rng.choice(len(SHIP_MODES), orders, p=_probabilities(list(SHIP_MODES.values())))[line_order]
+
+    def labels(codes, values):
+        return pd.Categorical.from_codes(codes, pd.Index(values))
+
+    return pd.DataFrame({
+        'Row ID': np.arange(1, len(line_order) + 1),
+        'Order ID': labels(line_order, order_ids),
+        'Order Date': labels(day[line_order], day_labels),
+        'Ship Date': labels(ship_day, day_labels),
+        'Ship Mode': labels(ship_modes, list(SHIP_MODES)),
+        'Customer ID': labels(line_customer, ids),
+        'Customer Name': labels(line_customer, names),
+        'Segment': labels(customer_segment[line_customer], list(SEGMENTS)),
+        'Country': 'United States',
+        'City': city[location],
+        'State': state[location],
+        'Postal Code': postal[location].astype(np.int64),
+        'Region': region[location],
+        'Product ID': labels(line_product, product_ids),
+        'Category': categories[line_sub],
+        'Sub-Category': labels(line_sub, subs),
+        'Product Name': labels(line_product, product_labels),
+        'Sales': sales,
+    }, columns=COLUMNS)
+
+def write_orders(path, **params):
+    """Generate orders (see ``generate_orders``) and write them as a ``train.csv``-style CSV."""
+    df = generate_orders(**params)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    df.to_csv(path, index=False)
+    return df
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic Superstore-schema order CSV.")
+    parser.add_argument('path')
+    parser.add_argument('--orders', type=int, default=5000)
+    parser.add_argument('--customers', type=int, default=800)
+    parser.add_argument('--products', type=int, default=1800)
+    parser.add_argument('--basket-sizes', type=lambda s: [float(p) for p in s.split(',')], default=BASKET_SIZES,
+                        help="comma-separated P(order has 1, 2, ... lines)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    df = write_orders(args.path, orders=args.orders, customers=args.customers, products=args.products,
+                      basket_sizes=args.basket_sizes, seed=args.seed)
+    print(f"Wrote {len(df)} order lines ({args.orders} orders, {args.customers} customers) to {args.path}")
+
+if __name__ == "__main__":
+    main()
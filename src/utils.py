@@ -1,12 +1,62 @@
-from mlxtend.preprocessing import TransactionEncoder
+from contextlib import contextmanager
 from itertools import chain, combinations
-import pandas as pd
+import fcntl
+import hashlib
+import os
+import shutil
+import tempfile
+from .mining import encode_transactions as encode_sparse
+
 def encode_transactions(transactions):
-    """Encode transactions into a binary matrix."""
-    te = TransactionEncoder()
-    te_ary = te.fit(transactions).transform(transactions)
-    return pd.DataFrame(te_ary, columns=te.columns_)
+    """Encode transactions into a sparse binary matrix."""
+    return encode_sparse(transactions).to_frame()
 
 def all_non_empty_subsets(s):
     """Generate all non-empty subsets of a set."""
-    return [tuple(subset) for subset in chain.from_iterable(combinations(s, r) for r in range(1, len(s) + 1))]
\ No newline at end of file
+    return [tuple(subset) for subset in chain.from_iterable(combinations(s, r) for r in range(1, len(s) + 1))]
+
+def data_fingerprint(file_path, block_size=1 << 20):
+    """Content hash of a data file, used to tell whether derived state is stale."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+@contextmanager
+def replacing_dir(path):
+    """Yield a new, uniquely named directory that replaces ``path`` atomically once the block succeeds.
+
+    ``path`` becomes a symlink to a hidden sibling (``.<name>.<random>``) and is
+    swapped with ``os.replace`` on a new link, so concurrent writers never share
+    a temporary directory and readers always find a complete old or new version.
+    Swaps are serialised by a lock file and each removes the version it
+    replaced; a failed block leaves ``path`` untouched.
+    """
+    parent, name = os.path.split(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    target = tempfile.mkdtemp(prefix=f'.{name}.', dir=parent)
+    os.chmod(target, 0o755)
+    try:
+        yield target
+    except BaseException:
+        shutil.rmtree(target, ignore_errors=True)
+        raise
+    # Writers build in parallel but swap one at a time, so each removes exactly the version it replaced
+    with open(os.path.join(parent, f'.{name}.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        previous = None
+        if os.path.islink(path):
+            previous = os.path.join(parent, os.readlink(path))
+            # Only clean up what this helper created, never an arbitrary link target
+            if os.path.dirname(previous) != parent or not os.path.basename(previous).startswith(f'.{name}.'):
+                previous = None
+        elif os.path.isdir(path):
+            # A plain directory from before the switch to links; moving it aside is a one-off gap
+            previous = target + '.old'
+            os.rename(path, previous)
+        link = target + '.link'
+        os.symlink(os.path.basename(target), link)
+        os.replace(link, path)
+        if previous is not None:
+            shutil.rmtree(previous, ignore_errors=True)
@@ -3,12 +3,16 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from fastapi.testclient import TestClient
 from api.main import app
+import numpy as np
 import pytest
 
 @pytest.fixture(scope="module")
-def test_client():
-    with TestClient(app) as client:
-        yield client
+def test_client(tmp_path_factory):
+    # Fitted forecasts go to a scratch registry, not the repository's artifacts/forecast
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr("api.main.FORECAST_DIR", str(tmp_path_factory.mktemp("forecast")))
+        with TestClient(app) as client:
+            yield client
 
 @pytest.fixture
 def sample_request():
@@ -52,3 +56,183 @@ def test_recommend_endpoint_category(test_client):
     })
     assert response.status_code == 200
     assert isinstance(response.json()["recommendations"], list)
+
+def test_recommend_endpoint_per_category(test_client):
+    response = test_client.post("/recommend", json={
+        "customer_name": "Unknown",
+        "cart": None,
+        "category": "Binders",
+        "per_category": 4
+    })
+    assert response.status_code == 200
+    assert len(response.json()["recommendations"]) == 4
+
+def test_model_reload_swaps_to_new_bundle(test_client, tmp_path, monkeypatch):
+    import api.main
+    from src.artifacts import build_model, save_bundle
+    before = test_client.get("/model").json()
+    save_bundle(build_model(api.main.DATA_PATH), str(tmp_path))
+    monkeypatch.setattr(api.main, "ARTIFACTS_DIR", str(tmp_path))
+    after = test_client.post("/model/reload").json()
+    assert after["version"] != before["version"]
+    assert after["path"] is not None
+    assert test_client.post("/model/reload").json()["version"] == after["version"]
+    response = test_client.post("/recommend", json={"customer_name": "Unknown", "cart": None, "category": "Binders"})
+    assert response.status_code == 200
+
+def test_recommend_batch_matches_single(test_client):
+    requests = [
+        {"customer_name": "Claire Gute", "cart": None, "category": None},
+        {"customer_name": "Claire Gute", "cart": ["Paper"], "category": None},
+        {"customer_name": "Unknown", "cart": None, "category": "Binders"},
+        {"customer_name": "Unknown", "cart": None, "category": None},
+    ]
+    response = test_client.post("/recommend/batch", json={"requests": requests})
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert len(results) == len(requests)
+    for request, result in zip(requests, results):
+        assert result == test_client.post("/recommend", json=request).json()
+    # A known customer without cart or category gets the top products of their top CF sub-categories
+    import api.main
+    from src.recommendation import recommend_cf
+    catalogue = api.main.model.catalogue.with_top_n(2)
+    top = list(recommend_cf("Claire Gute", api.main.model.engine))[:4]
+    assert results[0]["recommendations"] == [product for sub_category in top for product in catalogue[sub_category]]
+    assert all(len(product) > 1 for product in results[0]["recommendations"])
+
+def test_recommend_reports_server_timing(test_client):
+    import api.main
+    api.main.response_cache.clear()
+    response = test_client.post("/recommend", json={"customer_name": "Unknown", "category": "Binders"})
+    assert "queue;dur=" in response.headers["Server-Timing"]
+    assert "compute;dur=" in response.headers["Server-Timing"]
+
+def test_saturated_executor_rejects_with_429(test_client, monkeypatch):
+    import asyncio
+    import time
+    import api.main
+    from api.executor import ScoringExecutor, ExecutorSaturated
+    saturated = ScoringExecutor(workers=1, max_queue=0)
+    saturated.in_flight = saturated.capacity
+    monkeypatch.setattr(api.main, "executor", saturated)
+    api.main.response_cache.clear()
+    response = test_client.post("/recommend", json={"customer_name": "Unknown"})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
+    saturated.in_flight = 0
+
+    async def overload():
+        executor = ScoringExecutor(workers=1, max_queue=1)
+        jobs = [asyncio.ensure_future(executor.run(time.sleep, 0.2)) for _ in range(3)]
+        return await asyncio.gather(*jobs, return_exceptions=True)
+    results = asyncio.run(overload())
+    assert sum(isinstance(r, ExecutorSaturated) for r in results) == 1
+
+def test_forecast_endpoint_serves_cached_models(test_client, monkeypatch):
+    import api.main
+    api.main.refit_forecasts()
+    fitted = api.main.forecasts
+    monkeypatch.setattr(api.main, "build_forecast_models", None)  # answering must not refit
+    response = test_client.get("/forecast", params={"months": 6})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["series"] == "Total" and body["version"] == fitted.version and not body["stale"] and not body["fallback"]
+    assert [row["month"] for row in body["forecast"]] == ["2019-01", "2019-02", "2019-03", "2019-04", "2019-05", "2019-06"]
+    response = test_client.get("/forecast", params={"months": 3, "series": "Technology/Phones"})
+    assert len(response.json()["forecast"]) == 3
+    assert test_client.get("/forecast", params={"series": "Nope"}).status_code == 404
+    assert test_client.get("/forecast", params={"months": 0}).status_code == 422
+
+def test_forecast_registry_version_and_staleness(test_client, monkeypatch, tmp_path):
+    import api.main
+    from src.forecast_registry import load_forecast_models, save_forecast_models
+    api.main.refit_forecasts()
+    save_forecast_models(api.main.forecasts, str(tmp_path))
+    loaded = load_forecast_models(str(tmp_path), api.main.forecasts.version)
+    assert loaded.series() == api.main.forecasts.series()
+    assert load_forecast_models(str(tmp_path), 'other-version') is None
+    monkeypatch.setattr(api.main, "data_version", "newer-data")
+    monkeypatch.setattr(api.main, "schedule_forecast_refit", lambda: None)
+    assert test_client.get("/forecast").json()["stale"] is True
+
+def test_forecast_registry_concurrent_saves(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+    from src.forecast_registry import ForecastModels, load_forecast_models, save_forecast_models
+    saves = [ForecastModels({'Total': i}, 'v1', fitted_at=str(i)) for i in range(16)]
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(lambda models: save_forecast_models(models, str(tmp_path)), saves))
+    loaded = load_forecast_models(str(tmp_path))
+    assert loaded.version == 'v1' and loaded.models == {'Total': int(loaded.fitted_at)}
+    # The live version's link, its one target and the swap lock; no temp directories leak
+    assert sorted(name for name in os.listdir(tmp_path) if not name.startswith('.')) == ['LATEST', 'v1']
+    assert sorted(name for name in os.listdir(tmp_path) if name.startswith('.')) == sorted(['.v1.lock', os.readlink(tmp_path / 'v1')])
+
+def test_forecast_registry_falls_back_per_series(tmp_path, monkeypatch):
+    import api.main
+    import src.forecast_registry
+    from src.data_preprocessing import decompose_monthly, load_data
+    from src.forecast_registry import DIMENSIONS, fit_forecast_models, load_forecast_models, save_forecast_models
+    calls = []
+    def fail_first(sales):
+        calls.append(sales)
+        if len(calls) == 1:
+            raise ValueError("cannot decompose")
+        return decompose_monthly(sales)
+    monkeypatch.setattr(src.forecast_registry, "decompose_monthly", fail_first)
+    df = load_data(api.main.DATA_PATH, columns=DIMENSIONS + ['Sales'])
+    # The first series (Total) fails; the refit still fits the categories and repeats Total's last year
+    models = fit_forecast_models(df, 'v1', levels=[(), ('Category',)])
+    assert models.series() == ['Total', 'Furniture', 'Office Supplies', 'Technology'] and models.fallback == {'Total': 'ValueError'}
+    assert (models.forecast('Total', 24).to_numpy() == np.tile(calls[0].to_numpy()[-12:], 2)).all()
+    assert models.forecast('Total', 3).index.equals(models.forecast('Technology', 3).index)
+    save_forecast_models(models, str(tmp_path))
+    assert load_forecast_models(str(tmp_path)).fallback == {'Total': 'ValueError'}
+
+def test_recommend_cache_hits_and_invalidation(test_client, tmp_path, monkeypatch):
+    import api.main
+    from api.cache import ResponseCache
+    from src.artifacts import build_model, save_bundle
+    monkeypatch.setattr(api.main, "response_cache", ResponseCache(max_size=2, ttl=300))
+    request = {"customer_name": "Claire Gute", "cart": ["Paper", "Binders"], "category": None}
+    first = test_client.post("/recommend", json=request)
+    again = test_client.post("/recommend", json={**request, "cart": ["Binders", "Paper", "Paper"]})
+    assert again.json() == first.json()
+    assert again.headers["Server-Timing"] == 'cache;desc="hit"'
+    for name in ["Unknown", "Micky"]:
+        test_client.post("/recommend", json={"customer_name": name, "category": "Binders"})
+    stats = test_client.get("/recommend/cache").json()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["size"]) == (1, 3, 1, 2)
+    save_bundle(build_model(api.main.DATA_PATH), str(tmp_path))
+    monkeypatch.setattr(api.main, "ARTIFACTS_DIR", str(tmp_path))
+    test_client.post("/model/reload")
+    stats = test_client.get("/recommend/cache").json()
+    assert stats["size"] == 0 and stats["clears"] == 1
+
+def test_response_cache_expires_entries():
+    from api.cache import ResponseCache
+    now = [0.0]
+    cache = ResponseCache(max_size=10, ttl=5, clock=lambda: now[0])
+    cache.put("key", ("a",))
+    assert cache.get("key") == ("a",)
+    now[0] = 5.0
+    assert cache.get("key") is None
+    assert (cache.hits, cache.misses, cache.expirations, len(cache)) == (1, 1, 1, 0)
+    assert ResponseCache(max_size=0).put("key", 1) is None and len(ResponseCache(max_size=0)) == 0
+
+def test_metrics_report_latency_per_request_type(test_client, tmp_path, monkeypatch):
+    import api.main
+    monkeypatch.setattr(api.main, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr(api.main, "PROFILE_MIN_SECONDS", 0)
+    api.main.response_cache.clear()
+    for _ in range(2):
+        test_client.post("/recommend", json={"customer_name": "Unknown", "category": "Phones"})
+    metrics = test_client.get("/metrics")
+    assert metrics.status_code == 200 and metrics.headers["content-type"].startswith("text/plain")
+    assert 'recommend_request_seconds_count{type="category_unknown",cache="miss"}' in metrics.text
+    assert 'recommend_request_seconds_count{type="category_unknown",cache="hit"}' in metrics.text
+    assert 'span_seconds_count{span="recommend.category_unknown"}' in metrics.text
+    assert 'span_seconds_count{span="lifespan.model"}' in metrics.text
+    assert "recommend_cache_hits_total" in metrics.text
+    # Only the miss went through scoring, so only it was profiled
+    assert [name.split('-')[1] for name in os.listdir(tmp_path)] == ["category_unknown"]
@@ -0,0 +1,78 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.artifacts import build_model, save_bundle, load_bundle, load_or_build_model, current_bundle
+from src.recommendation import recommend
+import pytest
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'raw', 'train.csv')
+
+@pytest.fixture(scope="module")
+def model():
+    return build_model(DATA_PATH)
+
+def test_bundle_round_trip(model, tmp_path):
+    bundle_dir = save_bundle(model, str(tmp_path))
+    assert current_bundle(str(tmp_path)) == bundle_dir
+    loaded = load_bundle(bundle_dir, fingerprint=model.version)
+    assert loaded is not None
+    for name, array in model.rules.to_arrays().items():
+        assert (loaded.rules.to_arrays()[name] == array).all()
+    assert dict(loaded.catalogue) == dict(model.catalogue)
+    for name in list(model.engine.users[:20]) + ["Unknown"]:
+        for cart, category in [(None, None), (None, 'Binders'), (['Paper', 'Binders'], None)]:
+            assert recommend(name, loaded.rules, cart, category, loaded.engine, loaded.catalogue) == \
+                recommend(name, model.rules, cart, category, model.engine, model.catalogue)
+
+def test_stale_bundle_is_rejected(model, tmp_path):
+    bundle_dir = save_bundle(model, str(tmp_path))
+    assert load_bundle(bundle_dir, fingerprint='not-the-data') is None
+    assert load_or_build_model(str(tmp_path / 'missing'), DATA_PATH).version == model.version
+
+def test_bundles_saved_in_the_same_second_do_not_collide(model, tmp_path, monkeypatch):
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    monkeypatch.setattr(time, "strftime", lambda fmt, *args: "20190101000000")
+    with ThreadPoolExecutor(4) as pool:
+        bundle_dirs = list(pool.map(lambda _: save_bundle(model, str(tmp_path)), range(4)))
+    assert len(set(bundle_dirs)) == 4
+    assert current_bundle(str(tmp_path)) in bundle_dirs
+    assert all(load_bundle(bundle_dir, fingerprint=model.version) is not None for bundle_dir in bundle_dirs)
+    assert sorted(os.listdir(tmp_path)) == sorted(['CURRENT'] + [os.path.basename(d) for d in bundle_dirs])
+
+def test_batch_scoring_streams_input_in_order(model, tmp_path):
+    import io
+    import json
+    from src.batch_scoring import score_file
+    names = list(model.engine.users[:30]) + ["Unknown"]
+    lines = [json.dumps({"customer_name": name, "category": "Binders" if i % 3 else None}) + '\n' for i, name in enumerate(names)]
+    read = []
+    def source():
+        for line in lines:
+            read.append(line)
+            yield line
+
+    class Out(io.StringIO):
+        # Lines read ahead of the first written result, which a bounded window of chunks keeps small
+        lead = None
+        def write(self, text):
+            if self.lead is None:
+                self.lead = len(read)
+            return super().write(text)
+
+    serial, parallel = io.StringIO(), Out()
+    assert score_file(lines, serial, model, chunk_size=2) == len(lines)
+    assert score_file(source(), parallel, model, workers=2, chunk_size=2) == len(lines)
+    assert parallel.getvalue() == serial.getvalue()
+    assert parallel.lead <= 2 * (2 * 2 + 1)
+
+def test_bundle_built_with_other_settings_is_not_served(model, tmp_path):
+    from src.artifacts import reload_if_changed
+    save_bundle(model, str(tmp_path))
+    assert load_or_build_model(str(tmp_path), DATA_PATH, k=50, block_size=256).path is not None
+    with pytest.warns(UserWarning, match="other settings"):
+        rebuilt = load_or_build_model(str(tmp_path), DATA_PATH, k=50, method='minhash')
+    assert rebuilt.path is None and rebuilt.params['method'] == 'minhash'
+    with pytest.warns(UserWarning, match="other settings"):
+        assert reload_if_changed(rebuilt, str(tmp_path), DATA_PATH, k=50, method='minhash') is None
+    assert reload_if_changed(None, str(tmp_path), DATA_PATH, k=50, method='exact').path is not None
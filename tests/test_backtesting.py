@@ -0,0 +1,53 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.data_preprocessing import load_data, monthly_sales
+from src.backtesting import backtest_job, default_cutoffs, leaderboard, run_backtests
+import numpy as np
+import pandas as pd
+import pytest
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'raw', 'train.csv')
+
+@pytest.fixture(scope="module")
+def series():
+    return monthly_sales(load_data(DATA_PATH, columns=['Sales']))
+
+def test_cutoffs_leave_a_full_horizon(series):
+    cutoffs = default_cutoffs(series, n_cutoffs=3, horizon=6)
+    assert cutoffs == sorted(cutoffs) and len(cutoffs) == 3
+    assert cutoffs[-1] == series.index[-7]
+    assert (series.index <= cutoffs[0]).sum() >= 24
+
+def test_grid_leaderboard_and_model_cache(series, tmp_path):
+    grid = dict(orders=[(1, 0, 0), (2, 0, 0)], trend_degs=[1, 2], cutoffs=default_cutoffs(series, 2, 6), cache_dir=str(tmp_path))
+    scores, skipped = run_backtests(series, **grid)
+    assert skipped == [] and len(scores) == 2 * 2 * 2
+    assert not scores['cached'].any()
+    assert len(os.listdir(tmp_path)) == 2 * 2
+    board = leaderboard(scores)
+    assert list(board.columns) == ['order', 'trend_deg', 'r2', 'mape', 'rmse', 'cutoffs']
+    assert board['rmse'].is_monotonic_increasing and (board['cutoffs'] == 2).all()
+
+    cached, _ = run_backtests(series, workers=2, **grid)
+    assert cached['cached'].all()
+    key = ['order', 'trend_deg', 'cutoff']
+    pd.testing.assert_frame_equal(cached.sort_values(key)[key + ['r2', 'mape', 'rmse']].reset_index(drop=True),
+                                  scores.sort_values(key)[key + ['r2', 'mape', 'rmse']].reset_index(drop=True))
+
+def test_time_budget_skips_remaining_jobs(series):
+    scores, skipped = run_backtests(series, orders=[(1, 0, 0)], trend_degs=[1], cache_dir=None, max_seconds=0)
+    assert scores.empty and len(skipped) == 3
+
+def test_predictions_line_up_with_the_actual_months(tmp_path):
+    # Linear trend plus a yearly cycle is forecast exactly; a one-month shift would cost an RMSE near 78
+    months = pd.date_range('2015-01-31', periods=48, freq='ME')
+    t = np.arange(48)
+    series = pd.Series(1000 + 10 * t + 200 * np.sin(2 * np.pi * t / 12), index=months)
+    [row] = backtest_job(series, months[35], (1, 0, 0), [1], horizon=6, cache_dir=str(tmp_path))
+    assert row['rmse'] < 1e-6 and row['r2'] > 0.999999
+
+    # The cache key covers the training window only, so appending months reuses the fit
+    longer = pd.concat([series, pd.Series([5000.0], index=pd.date_range('2019-01-31', periods=1, freq='ME'))])
+    [again] = backtest_job(longer, months[35], (1, 0, 0), [1], horizon=6, cache_dir=str(tmp_path))
+    assert again['cached'] and again['rmse'] == row['rmse']
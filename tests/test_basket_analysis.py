@@ -0,0 +1,55 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.data_preprocessing import load_data, customer_data
+from src.baskets import BasketStore
+from src.basket_analysis import basket_trend_analysis, segment_basket_trends, load_basket_trends, write_partitioned
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import pytest
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'raw', 'train.csv')
+
+@pytest.fixture(scope="module")
+def df():
+    return load_data(DATA_PATH)
+
+@pytest.fixture(scope="module")
+def customer_df(df):
+    return customer_data(df)
+
+def test_segments_match_single_segment_runs(df, customer_df, tmp_path):
+    baskets = BasketStore.from_orders(df)
+    itemsets, rules = segment_basket_trends(customer_df, baskets, output_path=str(tmp_path / 'trends'))
+    assert sorted(rules['Customer Segment'].unique()) == sorted(customer_df['Customer Segment'].unique())
+    for segment in ['Active (0-3 months)', 'Lost (>12 months)']:
+        expected_itemsets, expected_rules = basket_trend_analysis(customer_df, baskets, segment=segment, output_path=str(tmp_path / 'csv'))
+        got = rules[rules['Customer Segment'] == segment].drop(columns='Customer Segment').reset_index(drop=True)
+        pd.testing.assert_frame_equal(got, expected_rules.reset_index(drop=True))
+        assert (itemsets['Customer Segment'] == segment).sum() == len(expected_itemsets)
+    stored = load_basket_trends(str(tmp_path / 'trends'), filters=[('Customer Segment', '=', 'Active (0-3 months)')])
+    active = rules[rules['Customer Segment'] == 'Active (0-3 months)']
+    assert len(stored) == len(active) and set(stored['antecedents']) == set(active['antecedents'])
+
+def test_region_segment_groups_in_a_pool(df, customer_df, tmp_path):
+    baskets = BasketStore.from_orders(df, key_cols=['Region'])
+    assert len(baskets) == len(BasketStore.from_orders(df)) and baskets.keys['Region'].notna().all()
+    by = ['Region', 'Customer Segment']
+    serial = segment_basket_trends(customer_df, baskets, by=by, output_path=str(tmp_path / 'serial'))
+    parallel = segment_basket_trends(customer_df, baskets, by=by, output_path=str(tmp_path / 'parallel'), workers=2)
+    for expected, got in zip(serial, parallel):
+        pd.testing.assert_frame_equal(got, expected)
+    assert sorted(os.listdir(tmp_path / 'parallel' / 'rules')) == [f"Region={region}" for region in sorted(df['Region'].unique())]
+    stored = load_basket_trends(str(tmp_path / 'parallel'), 'frequent_itemsets')
+    assert len(stored) == len(serial[0])
+
+def test_partitioned_writes_replace_the_dataset_atomically(tmp_path):
+    path = str(tmp_path / 'trends' / 'rules')
+    os.makedirs(os.path.join(path, 'Customer Segment=Old'))  # a plain directory from an earlier run
+    frames = [pd.DataFrame({'Customer Segment': ['A', 'B'], 'support': [i, i]}) for i in range(8)]
+    with ThreadPoolExecutor(4) as pool:
+        list(pool.map(lambda frame: write_partitioned(frame, path, ['Customer Segment']), frames))
+    stored = pd.read_parquet(path)
+    assert sorted(stored['Customer Segment'].unique()) == ['A', 'B'] and stored['support'].nunique() == 1
+    # Just the dataset link, its target and the swap lock; no temporary or replaced copies are left behind
+    assert len(os.listdir(tmp_path / 'trends')) == 3
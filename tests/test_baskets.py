@@ -0,0 +1,52 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.data_preprocessing import load_data
+from src.baskets import BasketStore, as_baskets
+from src.mining import encode_transactions
+from mlxtend.preprocessing import TransactionEncoder
+import numpy as np
+import pytest
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'raw', 'train.csv')
+
+@pytest.fixture(scope="module")
+def df():
+    return load_data(DATA_PATH)
+
+@pytest.fixture(scope="module")
+def legacy(df):
+    items_df = df.groupby([df.index, 'Customer Name'])['Sub-Category'].agg(list).reset_index()
+    return items_df.rename(columns={'Sub-Category': 'Items'})
+
+def test_store_matches_groupby_baskets(df, legacy):
+    baskets = BasketStore.from_orders(df)
+    assert len(baskets) == len(legacy)
+    assert baskets.sizes().tolist() == legacy['Items'].apply(len).tolist()
+    assert baskets.keys['Customer Name'].astype(object).tolist() == legacy['Customer Name'].tolist()
+    assert [sorted(b) for b in baskets.lists()] == legacy['Items'].apply(sorted).tolist()
+    assert as_baskets(legacy).lists() == legacy['Items'].tolist()
+
+def test_encoding_and_customer_rollup_match_list_encoders(df, legacy):
+    baskets = BasketStore.from_orders(df)
+    codes = baskets.codes.copy()
+    expected = encode_transactions(legacy['Items'].tolist())
+    encoding = baskets.to_encoding()
+    assert encoding.columns == expected.columns and (encoding.matrix != expected.matrix).nnz == 0
+    customers, owned = baskets.customer_matrix()
+    per_customer = legacy.groupby('Customer Name')['Items'].sum()
+    te = TransactionEncoder().fit(per_customer.tolist())
+    assert customers.tolist() == per_customer.index.tolist() and list(te.columns_) == list(baskets.items)
+    assert (owned.toarray() == te.transform(per_customer.tolist())).all()
+    assert (baskets.codes == codes).all()
+
+def test_subset_and_shared_vocabulary(df):
+    baskets = BasketStore.from_orders(df)
+    rows = np.flatnonzero(baskets.sizes() > 2)
+    subset = baskets.subset(rows)
+    assert subset.lists() == [baskets.basket(i) for i in rows]
+    recent = BasketStore.from_orders(df[df.index >= '2018-12-01'], items=baskets.items)
+    assert recent.items.equals(baskets.items) and recent.to_encoding().columns == baskets.to_encoding().columns
+    products = BasketStore.from_orders(df, item_col='Product Name')
+    assert products.sizes().sum() == len(df) and len(products.items) == df['Product Name'].nunique()
+    assert products.to_sparse(binary=False).sum() == len(df)
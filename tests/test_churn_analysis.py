@@ -0,0 +1,22 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.data_preprocessing import load_data, order_data, customer_table
+from src.churn_analysis import LOST, churn_rate_by_segment, churn_trend
+import pytest
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'raw', 'train.csv')
+
+def test_churn_metrics_match_row_level_filters():
+    df = load_data(DATA_PATH)
+    customers = customer_table(df)
+    order_df = order_data(df, customers=customers)
+    total = order_df.groupby('Segment', observed=True)['Customer ID'].nunique()
+    lost = order_df[order_df['Customer Segment'] == LOST].groupby('Segment', observed=True)['Customer ID'].nunique()
+    rate = churn_rate_by_segment(customers)
+    assert rate.index.tolist() == total.index.tolist()
+    assert rate.to_numpy() == pytest.approx((lost / total * 100).to_numpy())
+    trend = churn_trend(customers)
+    expected = customers[customers['Customer Segment'] == LOST].groupby('Last Purchase').size()
+    assert trend.index.is_monotonic_increasing and trend.sum() == expected.sum()
+    assert (trend[trend > 0] == expected).all()
@@ -0,0 +1,86 @@
+import sys
+import os
+import shutil
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.data_preprocessing import load_data, order_data, customer_data, customer_table, cohort_data, CATEGORICAL_COLUMNS
+import pandas as pd
+import pytest
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'raw', 'train.csv')
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / 'train.csv'
+    shutil.copy(DATA_PATH, path)
+    return str(path)
+
+def test_load_data_schema(csv_path):
+    df = load_data(csv_path, use_cache=False)
+    assert df.index.name == 'Order Date' and df.index.is_monotonic_increasing
+    assert all(df[column].dtype == 'category' for column in CATEGORICAL_COLUMNS)
+    assert df['Sales'].dtype == 'float32'
+
+def test_parquet_cache_matches_csv_and_is_reused(csv_path):
+    direct = load_data(csv_path, use_cache=False)
+    first = load_data(csv_path)
+    cached = os.listdir(os.path.join(os.path.dirname(csv_path), '.cache'))
+    assert len(cached) == 1
+    second = load_data(csv_path)
+    pd.testing.assert_frame_equal(first, direct)
+    pd.testing.assert_frame_equal(second, direct)
+    assert os.listdir(os.path.join(os.path.dirname(csv_path), '.cache')) == cached
+
+def test_column_pruning(csv_path):
+    columns = ['Customer Name', 'Sub-Category']
+    for use_cache in (False, True, True):
+        df = load_data(csv_path, columns=columns, use_cache=use_cache)
+        assert list(df.columns) == columns
+        assert df.index.name == 'Order Date'
+
+def test_changed_csv_invalidates_cache(csv_path):
+    load_data(csv_path)
+    df = pd.read_csv(csv_path).iloc[:100]
+    df.to_csv(csv_path, index=False)
+    assert len(load_data(csv_path)) == 100
+    assert len(os.listdir(os.path.join(os.path.dirname(csv_path), '.cache'))) == 1
+
+def test_order_data_joins_customer_table_without_mutating():
+    df = load_data(DATA_PATH)
+    columns = list(df.columns)
+    order_df = order_data(df)
+    assert list(df.columns) == columns
+    assert order_df.index.equals(df.index)
+    customers = customer_table(df)
+    first = order_df.drop_duplicates('Customer ID').set_index('Customer ID').sort_index()
+    for column in ['First Purchase Year', 'Last Purchase', 'Time passed', 'No of purchases', 'Customer Segment']:
+        assert first[column].tolist() == customers[column].tolist()
+    assert customers['No of purchases'].tolist() == df.groupby('Customer ID').size().tolist()
+
+def test_customer_data_rows_belong_to_their_customer():
+    df = load_data(DATA_PATH)
+    customer_df = customer_data(order_data(df))
+    names = df.drop_duplicates('Customer ID').set_index('Customer ID')['Customer Name']
+    assert customer_df['Customer Name'].tolist() == names.reindex(customer_df.index).tolist()
+    assert customer_df['Sub-Category'].apply(len).tolist() == customer_df['No of Purchases'].tolist()
+
+def test_reference_date_is_configurable():
+    df = load_data(DATA_PATH)
+    default = customer_table(df)
+    later = customer_table(df, ref_date='2019-07')
+    assert (later['Time passed'] - default['Time passed'] == 6).all()
+    assert (later['Customer Segment'] != 'Active (0-3 months)').sum() >= (default['Customer Segment'] != 'Active (0-3 months)').sum()
+    # Customers who bought in the reference month itself are 0 months out, still Active
+    latest = customer_table(df, ref_date=str(df.index.max().to_period('M')))
+    assert (latest['Time passed'] == 0).any() and latest['Customer Segment'].notna().all()
+    assert (latest.loc[latest['Time passed'] == 0, 'Customer Segment'] == 'Active (0-3 months)').all()
+
+def test_cohort_data_matches_distinct_customer_counts():
+    df = load_data(DATA_PATH)
+    order_df = order_data(df)
+    expected = order_df.groupby(['First Purchase Year', order_df['Order Year'].dt.year - order_df['First Purchase Year'].dt.year])['Customer ID'].nunique().unstack(fill_value=0)
+    yearly = cohort_data(df)
+    assert yearly.index.equals(expected.index) and (yearly.to_numpy() == expected.to_numpy()).all()
+    monthly = cohort_data(df, freq='M')
+    assert monthly.index.freqstr == 'M' and monthly.columns.name == 'Month Offset'
+    assert monthly[0].sum() == df['Customer ID'].nunique()
+    assert (monthly.groupby(monthly.index.year)[0].sum().to_numpy() == yearly[0].to_numpy()).all()
@@ -0,0 +1,38 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.data_preprocessing import load_data, monthly_sales
+from src.hierarchical import DIMENSIONS, bottom_series, forecast_hierarchy, summing_matrix
+import numpy as np
+import pytest
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'raw', 'train.csv')
+
+@pytest.fixture(scope="module")
+def df():
+    df = load_data(DATA_PATH, columns=DIMENSIONS + ['Sales'])
+    return df[df['Category'] == 'Furniture']
+
+def test_summing_matrix_builds_every_level(df):
+    bottom = bottom_series(df)
+    keys, S = summing_matrix(bottom.columns)
+    series = bottom.to_numpy() @ S.T
+    np.testing.assert_allclose(series[:, 0], monthly_sales(df).to_numpy())
+    assert S.shape == (len(keys), bottom.shape[1])
+    assert (keys['level'] == '/'.join(DIMENSIONS)).sum() == bottom.shape[1]
+    assert set(keys.loc[keys['level'] == 'Region', 'Region']) == set(df['Region'].astype(str))
+
+@pytest.mark.parametrize('method', ['ols', 'bottom_up'])
+def test_reconciled_forecasts_are_coherent(df, method):
+    forecasts, timing = forecast_hierarchy(df, months_ahead=3, method=method)
+    assert not forecasts[['Base', 'Forecast']].isna().any().any()
+    assert len(timing) * 3 == len(forecasts)
+    total = forecasts[forecasts['level'] == 'Total'].set_index('Month')['Forecast']
+    for level in ['Category/Sub-Category', 'Region', 'Region/Segment', '/'.join(DIMENSIONS)]:
+        children = forecasts[forecasts['level'] == level].groupby('Month')['Forecast'].sum()
+        np.testing.assert_allclose(children.to_numpy(), total.to_numpy())
+    assert total.index[0] > df.index.max()
+
+def test_unknown_reconciliation_method(df):
+    with pytest.raises(ValueError):
+        forecast_hierarchy(df, months_ahead=1, method='top_down')
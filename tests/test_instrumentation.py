@@ -0,0 +1,62 @@
+import sys
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.instrumentation import Registry, SPAN_SECONDS, profiled, span, write_metrics
+from src.pipeline import Node, Pipeline, STAGE_SECONDS
+
+def numbers(n):
+    return list(range(n))
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    histogram = registry.histogram('latency_seconds', 'Test latency.', ['type'], buckets=(0.1, 1))
+    for value in [0.05, 0.1, 0.5, 3]:
+        histogram.observe(value, type='cf')
+    assert registry.histogram('latency_seconds', 'ignored') is histogram
+    assert histogram.count(type='cf') == 4 and histogram.count(type='fallback') == 0
+    lines = registry.render().splitlines()
+    assert lines[:2] == ['# HELP latency_seconds Test latency.', '# TYPE latency_seconds histogram']
+    assert lines[2:] == ['latency_seconds_bucket{type="cf",le="0.1"} 2', 'latency_seconds_bucket{type="cf",le="1"} 3',
+                         'latency_seconds_bucket{type="cf",le="+Inf"} 4', 'latency_seconds_sum{type="cf"} 3.65',
+                         'latency_seconds_count{type="cf"} 4']
+
+def test_span_and_pipeline_stages_are_recorded(tmp_path):
+    before = SPAN_SECONDS.count(span='test.block')
+    try:
+        with span('test.block'):
+            raise ValueError
+    except ValueError:
+        pass
+    assert SPAN_SECONDS.count(span='test.block') == before + 1
+    runs = STAGE_SECONDS.count(stage='test_stage')
+    Pipeline([Node('test_stage', numbers, params={'n': 3})], cache_dir=str(tmp_path)).run()
+    assert STAGE_SECONDS.count(stage='test_stage') == runs + 1
+    write_metrics(str(tmp_path / 'metrics' / 'main.prom'))
+    assert 'pipeline_stage_seconds_count{stage="test_stage"}' in (tmp_path / 'metrics' / 'main.prom').read_text()
+
+def test_profiled_dumps_only_slow_blocks(tmp_path):
+    with profiled(None, 'off'):
+        pass
+    with profiled(str(tmp_path), 'fast', min_seconds=60):
+        sum(range(1000))
+    assert os.listdir(tmp_path) == []
+    with profiled(str(tmp_path), 'slow', min_seconds=0):
+        sum(range(1000))
+    dumps = os.listdir(tmp_path)
+    assert len(dumps) == 1 and '-slow-' in dumps[0] and dumps[0].endswith('.prof')
+
+def test_profiled_is_safe_under_concurrent_calls(tmp_path):
+    # Every call is inside profiled() at once; only one may hold the profiler and none may fail
+    inside = threading.Barrier(4)
+    def call(i):
+        with profiled(str(tmp_path), f'call{i}', min_seconds=0):
+            inside.wait(timeout=10)
+            return sum(range(1000))
+    with ThreadPoolExecutor(4) as pool:
+        assert list(pool.map(call, range(4))) == [sum(range(1000))] * 4
+    assert len(os.listdir(tmp_path)) == 1
+    with profiled(str(tmp_path), 'after', min_seconds=0):
+        pass
+    assert len(os.listdir(tmp_path)) == 2
@@ -0,0 +1,61 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.data_preprocessing import load_data, items_data
+from src.mining import encode_transactions, mine_frequent_itemsets, IncrementalItemsets
+from src.recommendation import build_market_basket_rules, build_incremental_rules, update_market_basket_rules
+import pytest
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'raw', 'train.csv')
+
+@pytest.fixture(scope="module")
+def items_df():
+    return items_data(load_data(DATA_PATH))
+
+def supports(frequent_itemsets):
+    return dict(zip(frequent_itemsets['itemsets'], frequent_itemsets['support']))
+
+@pytest.mark.parametrize("algorithm", ["apriori", "fpgrowth"])
+def test_sparse_encoding_mines_same_itemsets(items_df, algorithm):
+    from mlxtend.frequent_patterns import apriori
+    from mlxtend.preprocessing import TransactionEncoder
+    import pandas as pd
+    transactions = items_df['Items'].tolist()
+    te = TransactionEncoder()
+    dense = pd.DataFrame(te.fit(transactions).transform(transactions), columns=te.columns_)
+    expected = supports(apriori(dense, min_support=0.002, use_colnames=True))
+    result = supports(mine_frequent_itemsets(encode_transactions(transactions), 0.002, algorithm))
+    assert result.keys() == expected.keys()
+    assert [result[k] for k in expected] == pytest.approx(list(expected.values()))
+
+def test_itemset_cache_is_per_algorithm(items_df, monkeypatch):
+    import src.mining
+    encoding = encode_transactions(items_df['Items'].tolist())
+    calls = []
+    for name, miner in list(src.mining.ALGORITHMS.items()):
+        monkeypatch.setitem(src.mining.ALGORITHMS, name, lambda *args, _name=name, _miner=miner, **kwargs: calls.append(_name) or _miner(*args, **kwargs))
+    for algorithm in ['apriori', 'fpgrowth', 'apriori', 'fpgrowth']:
+        mine_frequent_itemsets(encoding, 0.01, algorithm)
+    assert calls == ['apriori', 'fpgrowth']
+
+@pytest.mark.parametrize("min_support", [0.001, 0.005])
+def test_incremental_update_matches_full_rebuild(items_df, min_support):
+    dates = items_df['Order Date']
+    history = items_df[dates < '2018-01-01']
+    state = build_incremental_rules(history, min_support=min_support)
+    for month in ['2018-01', '2018-02', '2018-03', '2018-04', '2018-05', '2018-06', '2018-07', '2018-08', '2018-09', '2018-10', '2018-11', '2018-12']:
+        new_items = items_df[dates.dt.strftime('%Y-%m') == month]
+        state, rules = update_market_basket_rules(state, new_items)
+    full = mine_frequent_itemsets(encode_transactions(items_df['Items'].tolist()), min_support, algorithm='apriori')
+    assert len(state.encoding) == len(items_df)
+    assert supports(state.frequent_itemsets()) == pytest.approx(supports(full))
+    expected = build_market_basket_rules(items_df, min_support=min_support, algorithm='apriori')
+    for cart in [['Paper'], ['Binders', 'Art'], ['Phones', 'Chairs', 'Storage']]:
+        assert rules.score_cart(cart) == pytest.approx(expected.score_cart(cart))
+
+def test_incremental_state_round_trip(items_df, tmp_path):
+    state = build_incremental_rules(items_df, min_support=0.005)
+    state.save(tmp_path / 'itemsets.npz')
+    loaded = IncrementalItemsets.load(tmp_path / 'itemsets.npz')
+    assert supports(loaded.frequent_itemsets()) == supports(state.frequent_itemsets())
+    assert loaded.encoding.version == state.encoding.version
@@ -0,0 +1,58 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.pipeline import Node, Pipeline
+import pytest
+
+def numbers(n):
+    return list(range(n))
+
+def total(values):
+    return sum(values)
+
+def squares(values):
+    return [v * v for v in values]
+
+def combine(total, squares):
+    return total, sum(squares)
+
+def build(tmp_path, n=10, version='1'):
+    return Pipeline([
+        Node('numbers', numbers, params={'n': n}),
+        Node('total', total, ['numbers']),
+        Node('squares', squares, ['numbers']),
+        Node('combine', combine, ['total', 'squares']),
+    ], cache_dir=str(tmp_path), version=version)
+
+def test_runs_then_serves_from_cache(tmp_path):
+    pipeline = build(tmp_path)
+    assert pipeline.run(['combine']) == {'combine': (45, 285)}
+    assert set(pipeline.status) == {'numbers', 'total', 'squares', 'combine'}
+    again = build(tmp_path)
+    assert again.stale(['combine']) == []
+    assert again.run(['combine']) == {'combine': (45, 285)}
+    # Nothing upstream of a cached target is loaded
+    assert again.status == {'combine': 'cached'}
+
+def test_changed_input_reruns_downstream_only(tmp_path):
+    build(tmp_path).run()
+    assert build(tmp_path, n=4).stale() == ['numbers', 'total', 'squares', 'combine']
+    assert build(tmp_path, version='2').stale(['total']) == ['numbers', 'total']
+    pipeline = build(tmp_path, n=4)
+    assert pipeline.run(['total']) == {'total': 6}
+    assert len(os.listdir(tmp_path)) == 4
+
+def test_parallel_matches_serial(tmp_path):
+    serial = build(tmp_path / 'serial').run()
+    parallel = build(tmp_path / 'parallel').run(workers=2)
+    assert parallel == serial
+
+def test_force_reruns_everything(tmp_path):
+    build(tmp_path).run()
+    pipeline = build(tmp_path)
+    pipeline.run(['combine'], force=True)
+    assert all(seconds != 'cached' for seconds in pipeline.status.values())
+
+def test_inputs_must_be_defined_first():
+    with pytest.raises(ValueError):
+        Pipeline([Node('total', total, ['numbers']), Node('numbers', numbers, params={'n': 1})])
@@ -0,0 +1,133 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.data_preprocessing import load_data, items_data
+from src.recommendation import build_similarity_matrix, build_popular_catalogue, build_cf_engine, CFEngine, RuleIndex, recommend_cf, recommend_cf_batch
+from src.neighbours import build_neighbour_index, build_minhash_neighbour_index, recall_at_k
+import numpy as np
+import pytest
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'raw', 'train.csv')
+
+def legacy_recommend_cf(target_user, similarity_df, tedf, top_n=6):
+    similar_users = similarity_df[target_user].drop(target_user)
+    recommendations = {}
+    for similar_user in similar_users.index:
+        similarity_score = similar_users.loc[similar_user]
+        for item in tedf.columns:
+            if not tedf.loc[target_user, item] and tedf.loc[similar_user, item]:
+                recommendations[item] = recommendations.get(item, 0) + similarity_score
+    sorted_recommendations = sorted(recommendations.items(), key=lambda x: x[1], reverse=True)
+    return {item[0]: float(item[1]) for item in sorted_recommendations[:top_n]}
+
+@pytest.fixture(scope="module")
+def frames():
+    items_df = items_data(load_data(DATA_PATH))
+    return build_similarity_matrix(items_df)
+
+@pytest.fixture(scope="module")
+def engine(frames):
+    return CFEngine.from_frames(*frames)
+
+def test_recommend_cf_matches_legacy_ranking(frames, engine):
+    similarity_df, tedf = frames
+    for user in tedf.index[::160]:
+        expected = legacy_recommend_cf(user, similarity_df, tedf)
+        result = recommend_cf(user, engine)
+        assert list(result) == list(expected)
+        assert list(result.values()) == pytest.approx(list(expected.values()))
+
+def test_recommend_cf_unknown_user(engine):
+    assert recommend_cf("Unknown", engine) == {}
+
+def test_recommend_cf_batch_matches_single(frames, engine):
+    users = list(frames[1].index[:50]) + ["Unknown"]
+    batch = recommend_cf_batch(users, engine)
+    assert batch == {user: recommend_cf(user, engine) for user in users}
+
+def test_neighbour_index_keeps_top_k(frames):
+    _, tedf = frames
+    neighbours = build_neighbour_index(tedf.to_numpy(), tedf.index, k=10, block_size=100)
+    assert neighbours.k <= 10
+    assert neighbours.indices.dtype == np.int32 and neighbours.data.dtype == np.float32
+    user = tedf.index[0]
+    assert user not in neighbours.neighbours(user).index
+
+def test_full_neighbour_index_matches_dense(frames, engine):
+    similarity_df, tedf = frames
+    neighbours = build_neighbour_index(tedf.to_numpy(), tedf.index, k=len(tedf), block_size=128)
+    np.testing.assert_allclose(neighbours.matrix.toarray(), similarity_df.to_numpy() - np.eye(len(tedf)), atol=1e-6)
+    sparse_engine = CFEngine.from_neighbours(neighbours, tedf)
+    for user in tedf.index[::40]:
+        assert list(recommend_cf(user, sparse_engine)) == list(recommend_cf(user, engine))
+
+def test_minhash_neighbours_are_exact_scores_with_high_recall(frames):
+    similarity_df, tedf = frames
+    exact = build_neighbour_index(tedf.to_numpy(), tedf.index, k=10)
+    approx = build_minhash_neighbour_index(tedf.to_numpy(), tedf.index, k=10, block_size=100)
+    assert approx.k <= 10 and approx.indices.dtype == np.int32 and approx.data.dtype == np.float32
+    rows = np.repeat(np.arange(len(approx)), np.diff(approx.indptr))
+    assert (rows != approx.indices).all()
+    # Candidates are re-scored exactly, in descending order per customer
+    np.testing.assert_allclose(approx.data, similarity_df.to_numpy()[rows, approx.indices], atol=1e-6)
+    assert all((np.diff(approx.data[approx.indptr[i]:approx.indptr[i + 1]]) <= 0).all() for i in range(len(approx)))
+    assert recall_at_k(exact, exact) == 1.0
+    assert recall_at_k(approx, exact) > 0.95
+
+def test_minhash_index_equals_exact_when_every_candidate_is_scored(frames):
+    _, tedf = frames
+    # Single-value bands and a window wider than any bucket find every true neighbour here,
+    # so only the scoring kernel and tie-breaking could make the two indexes differ
+    exact = build_neighbour_index(tedf.to_numpy(), tedf.index, k=10, block_size=100)
+    approx = build_minhash_neighbour_index(tedf.to_numpy(), tedf.index, k=10, bands=64, per_bucket=len(tedf))
+    np.testing.assert_array_equal(approx.indptr, exact.indptr)
+    np.testing.assert_array_equal(approx.indices, exact.indices)
+    np.testing.assert_array_equal(approx.data, exact.data)
+
+def test_minhash_engine_is_a_drop_in(frames):
+    _, tedf = frames
+    items_df = items_data(load_data(DATA_PATH))
+    engine = build_cf_engine(items_df, k=10, method='minhash')
+    reference = CFEngine.from_neighbours(build_minhash_neighbour_index(tedf.to_numpy(), tedf.index, k=10), tedf)
+    for user in tedf.index[::80]:
+        assert recommend_cf(user, engine) == recommend_cf(user, reference)
+    with pytest.raises(ValueError):
+        build_cf_engine(items_df, method='annoy')
+
+def test_popular_catalogue_matches_legacy():
+    df = load_data(DATA_PATH)
+    legacy = {}
+    for sub_cat in df['Sub-Category'].value_counts().index:
+        legacy[sub_cat] = df[df['Sub-Category'] == sub_cat].groupby('Product Name').size().nlargest(2).index.to_list()
+    catalogue = build_popular_catalogue(df)
+    assert dict(catalogue) == legacy
+    assert list(catalogue) == list(legacy)
+    assert catalogue.top('Binders', 5)[:2] == legacy['Binders']
+    assert len(catalogue.with_top_n(3)['Binders']) == 3
+
+def test_rule_index_matches_brute_force_scoring():
+    from mlxtend.frequent_patterns import apriori, association_rules
+    from src.utils import encode_transactions
+    items_df = items_data(load_data(DATA_PATH))
+    frequent_itemsets = apriori(encode_transactions(items_df['Items'].tolist()), min_support=0.001, use_colnames=True)
+    rules_df = association_rules(frequent_itemsets, metric='lift', min_threshold=1.5)
+    index = RuleIndex.from_frame(rules_df)
+    assert index.max_antecedent_len == rules_df['antecedents'].apply(len).max()
+    carts = [['Paper'], ['Binders', 'Paper', 'Art'], ['Phones', 'Chairs', 'Unknown item'], list(index.items) + ['Other']]
+    for cart in carts:
+        expected = {}
+        for antecedents, consequents, c, l in rules_df[['antecedents', 'consequents', 'confidence', 'lift']].itertuples(index=False):
+            if antecedents <= set(cart):
+                for item in consequents - set(cart):
+                    expected[item] = expected.get(item, 0) + c * l
+        result = index.score_cart(cart)
+        assert result.keys() == expected.keys()
+        assert [result[k] for k in expected] == pytest.approx(list(expected.values()))
+
+def test_cart_recommendation_with_zero_cf_scores(frames, engine):
+    from src.recommendation import build_market_basket_rules, recommend
+    df = load_data(DATA_PATH)
+    rules = build_market_basket_rules(items_data(df))
+    user = frames[1].index[0]
+    result = recommend(user, rules, cart=['Paper'], engine=engine, catalogue=build_popular_catalogue(df), cf={'Art': 0.0})
+    assert len(result) > 0
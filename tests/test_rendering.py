@@ -0,0 +1,30 @@
+import sys
+import os
+import pickle
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.data_preprocessing import load_data, sales_data
+from src.sales_analysis import analyze_categories, analyze_time_trends
+from src.rendering import render
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'raw', 'train.csv')
+
+def test_analyses_return_plot_specs_without_rendering(tmp_path):
+    df = load_data(DATA_PATH)
+    plots = []
+    summary, _ = analyze_categories(df, output_dir=str(tmp_path), plots=plots)
+    analyze_time_trends(sales_data(df), output_dir=str(tmp_path), plots=plots)
+    assert len(plots) == 1 + summary['Category'].nunique() + 4
+    assert os.listdir(tmp_path) == []
+    assert [plot.path for plot in pickle.loads(pickle.dumps(plots))] == [plot.path for plot in plots]
+
+def test_render_in_process_pool(tmp_path):
+    df = load_data(DATA_PATH)
+    plots = []
+    analyze_categories(df, output_dir=str(tmp_path / 'out'), plots=plots)
+    paths = render(plots, workers=2, style='dark_background')
+    assert paths == [plot.path for plot in plots]
+    assert all(os.path.getsize(path) > 0 for path in paths)
+
+def test_without_collector_renders_inline(tmp_path):
+    analyze_categories(load_data(DATA_PATH), output_dir=str(tmp_path))
+    assert 'sales_by_category.png' in os.listdir(tmp_path)
@@ -0,0 +1,44 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.data_preprocessing import load_data, sales_data, customer_table, items_data
+from src.sales_analysis import summarize_categories
+from src.streaming import read_chunks, stream_aggregates
+from src.baskets import BasketStore
+import numpy as np
+import pandas as pd
+import pytest
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'raw', 'train.csv')
+
+@pytest.fixture(scope="module")
+def df():
+    return load_data(DATA_PATH)
+
+@pytest.fixture(scope="module")
+def aggregates():
+    # Small chunks so that days, customers and baskets are split across chunks
+    return stream_aggregates(DATA_PATH, chunksize=997)
+
+def test_streamed_daily_sales_match(df, aggregates):
+    assert aggregates.rows == len(df)
+    pd.testing.assert_frame_equal(aggregates.sales_data(), sales_data(df))
+
+def test_streamed_category_totals_match(df, aggregates):
+    for streamed, expected in zip(aggregates.category_summary(), summarize_categories(df)):
+        pd.testing.assert_frame_equal(streamed, expected, check_categorical=False, check_dtype=False)
+
+def test_streamed_customer_purchases_match(df, aggregates):
+    pd.testing.assert_frame_equal(aggregates.customer_purchases(), customer_table(df), check_categorical=False, check_dtype=False)
+
+def test_streamed_baskets_match(df, aggregates):
+    streamed, expected = aggregates.items_data(), items_data(df)
+    pd.testing.assert_frame_equal(streamed[['Order Date', 'Customer Name', 'Count']], expected[['Order Date', 'Customer Name', 'Count']])
+    # Within a day the in-memory path orders items by an unstable date sort
+    assert streamed['Items'].apply(sorted).tolist() == expected['Items'].apply(sorted).tolist()
+    # Baskets split across chunks are merged back with their lines in file order, as from one unsorted chunk
+    [whole] = read_chunks(DATA_PATH, chunksize=len(df))
+    baskets = aggregates.baskets()
+    assert baskets.codes.dtype == np.int32 and baskets.lists() == BasketStore.from_orders(whole.set_index('Order Date')).lists()
+    # Item codes were spilled during ingestion and come back memory-mapped
+    assert aggregates.lines == len(df) and isinstance(baskets.codes, np.memmap)
@@ -0,0 +1,26 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.synthetic import generate_orders, write_orders, COLUMNS
+from src.data_preprocessing import load_data
+import pandas as pd
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'raw', 'train.csv')
+
+def test_synthetic_csv_loads_like_train_csv(tmp_path):
+    path = str(tmp_path / 'orders.csv')
+    write_orders(path, orders=2000, customers=300, products=400)
+    assert list(pd.read_csv(path, nrows=1).columns) == list(pd.read_csv(DATA_PATH, nrows=1).columns) == COLUMNS
+    df = load_data(path, use_cache=False)
+    real = load_data(DATA_PATH)
+    assert df.index.min().year == 2015 and df.index.max().year == 2018
+    assert set(df['Sub-Category'].cat.categories) == set(real['Sub-Category'].cat.categories)
+    assert df.groupby('Sub-Category', observed=True)['Category'].nunique().max() == 1
+    assert df['Customer Name'].nunique() <= 300 and df['Product Name'].nunique() <= 400
+    assert df.groupby('Customer ID')['Customer Name'].nunique().max() == 1
+
+def test_scale_and_basket_sizes_are_configurable():
+    df = generate_orders(orders=1000, customers=50, basket_sizes=[0, 0, 1], seed=1)
+    assert len(df) == 3000 and df['Order ID'].nunique() == 1000
+    assert (df.groupby('Order ID', observed=True).size() == 3).all()
+    assert generate_orders(orders=100, seed=1).equals(generate_orders(orders=100, seed=1))